@@ -8,14 +8,32 @@ import threading
 import time
 from dotenv import load_dotenv
 from typing import Optional, Union
+from urllib.parse import urlsplit
 import socket
+from requests.adapters import HTTPAdapter
+from health import breakers
+from logger import get_logger, log_http, register_secret, setup_logging
+from stream_json import CHUNK_SIZE, RecordStream
+from validation import (BROKER_ORDER_ID, CANDLES, EXIT_BRACKET, MARGIN, MODIFY_GTT, MODIFY_ORDER, PLACE_GTT,
+                        PLACE_ORDER, POSITION_CONVERSION, QUOTE, SQUARE_OFF, validated)
 
 load_dotenv()
 
-BASE_URL = "https://a3.aliceblueonline.com"
+log = get_logger("client")
+
+BASE_URL = os.getenv("ALICE_BASE_URL", "https://a3.aliceblueonline.com")
 LOGIN_URL = "https://ant.aliceblueonline.com/?appcode="
 REDIRECT_PORT = 8080
 LOGIN_TIMEOUT = 60 
+# (connect, read) seconds for every broker call; a hung socket otherwise blocks a tool forever.
+HTTP_TIMEOUT = (float(os.getenv("ALICE_CONNECT_TIMEOUT", "3.05")), float(os.getenv("ALICE_READ_TIMEOUT", "15")))
+HTTP_POOL_SIZE = int(os.getenv("ALICE_HTTP_POOL_SIZE", "10"))
+
+# One keep-alive connection pool shared by every client, so re-login or a new client
+# reuses warm TLS connections.
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE))
+http_session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE))
 
 user_id = os.getenv("ALICE_USER_ID")
 app_key = os.getenv("ALICE_APP_KEY")
@@ -40,10 +58,28 @@ class RedirectHandler(http.server.SimpleHTTPRequestHandler):
         RedirectHandler.login_received.set()
     
 
+def _split_list_response(data, count: int):
+    """Split a multi-order (checkMargin, modify) response into per-order responses of the same shape.
+
+    Returns None when no list with one entry per order can be found.
+    """
+    if count == 1:
+        return [data]
+    if isinstance(data, list):
+        return [[row] for row in data] if len(data) == count else None
+    if isinstance(data, dict):
+        for key in ("result", "data"):
+            rows = data.get(key)
+            if isinstance(rows, list) and len(rows) == count:
+                return [{**data, key: [row]} for row in rows]
+    return None
+
+
 class AliceBlue:
     def __init__(self, app_key: str, api_secret: str):
         self.app_key = app_key
         self.api_secret = api_secret
+        register_secret(api_secret)
         self.user_id = None
         self.auth_code = None
         self.user_session = None
@@ -80,9 +116,9 @@ class AliceBlue:
             try:
                 RedirectHandler.current_server.shutdown()
                 RedirectHandler.current_server.server_close()
-                print("Previous login attempt closed")
+                log.info("Previous login attempt closed")
             except Exception as e:
-                print(f"Error closing previous server: {e}")
+                log.warning("Error closing previous server: %s", e)
             finally:
                 RedirectHandler.current_server = None
                 RedirectHandler.login_received.clear()
@@ -101,7 +137,7 @@ class AliceBlue:
     def login_and_get_auth_code(self):
         self._close_previous_login()
         if not self._is_port_available(REDIRECT_PORT):
-            print("Port 8080 is busy, forcing closure...")
+            log.warning("Port %s is busy, forcing closure...", REDIRECT_PORT)
             self._force_close_port(REDIRECT_PORT)
             time.sleep(1)
         
@@ -121,11 +157,10 @@ class AliceBlue:
             self.server_thread.start()
             
             login_url = f"{LOGIN_URL}{self.app_key}&redirect_uri=http://localhost:{REDIRECT_PORT}"
-            print(f"Opening browser for login: {login_url}")
+            log.info("Opening browser for login: %s", login_url)
             webbrowser.open(login_url)
             
-            print(f"Waiting for login (timeout: {self.login_timeout} seconds)...")
-            print("Please complete the login in the browser window...")
+            log.info("Waiting for login in the browser window (timeout: %s seconds)...", self.login_timeout)
             
             login_success = RedirectHandler.login_received.wait(timeout=self.login_timeout)
             
@@ -140,7 +175,7 @@ class AliceBlue:
                 self._close_previous_login()
                 raise ValueError("Login failed: Missing authCode or userId")
                 
-            print(f"Auth Code received, User ID: {self.user_id}")
+            log.info("Auth Code received, User ID: %s", self.user_id)
             self._close_previous_login()
             
         except OSError as e:
@@ -163,25 +198,63 @@ class AliceBlue:
             checksum = hashlib.sha256(raw_string.encode()).hexdigest()
             url = f"{BASE_URL}/open-api/od/v1/vendor/getUserDetails"
             payload = {"checkSum": checksum}
-            res = requests.post(url, json=payload)
+            res = self._request("POST", url, json=payload)
             
             if res.status_code != 200:
                 raise Exception(f"API Error: {res.text}")
                 
             data = res.json()
             if data.get("stat") == "Ok":
-                self.user_session = data["userSession"]
-                self.headers = {"Authorization": f"Bearer {self.user_session}"}
-                print("Authentication Successful")
+                self.set_session(self.user_id, data["userSession"])
+                log.info("Authentication Successful")
             else:
                 raise Exception(f"Authentication failed: {data}")
         except Exception as e:
             self._close_previous_login()
             raise e
 
+    def _request(self, method: str, url: str, **kwargs):
+        """Send a broker call through the pooled session, guarded by the endpoint's circuit breaker.
+
+        Network errors, timeouts, 429 and 5xx responses count as failures; while the breaker is
+        open calls fail fast with CircuitOpenError instead of waiting on the broker.
+        """
+        breaker = breakers.get(urlsplit(url).path.replace("/open-api/od/v1/", ""))
+        breaker.before_call()
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            res = http_session.request(method, url, headers=self.headers, **kwargs)
+        except requests.exceptions.RequestException as e:
+            breaker.record(time.perf_counter() - started, False, f"{type(e).__name__}: {e}")
+            raise
+        except BaseException:
+            # Failed before the broker could answer (e.g. a bad argument): free a half-open trial.
+            breaker.release()
+            raise
+        failed = res.status_code == 429 or res.status_code >= 500
+        breaker.record(time.perf_counter() - started, not failed, f"HTTP {res.status_code}" if failed else None)
+        if not kwargs.get("stream"):
+            log_http(method, url, res, started)
+        return res
+
+    def _stream(self, url: str, label: str) -> RecordStream:
+        """GET a list endpoint and iterate its records as they arrive instead of decoding the whole body."""
+        res = self._request("GET", url, stream=True)
+        if res.status_code != 200:
+            raise Exception(f"{label} Error {res.status_code}: {res.text}")
+        return RecordStream(res.iter_content(CHUNK_SIZE))
+
     def get_session(self):
         return self.user_session
 
+    def set_session(self, user_id: str, user_session: str):
+        """Adopt an existing session (e.g. one created by another worker) without logging in."""
+        self.user_id = user_id
+        self.user_session = user_session
+        self.headers = {"Authorization": f"Bearer {user_session}"}
+        register_secret(user_session)
+
     def close(self):
         """Cleanup method to close any ongoing login attempts"""
         self._close_previous_login()
@@ -189,7 +262,7 @@ class AliceBlue:
 
     def get_profile(self):
         url = f"{BASE_URL}/open-api/od/v1/profile"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Profile Error {res.status_code}: {res.text}")
@@ -200,7 +273,7 @@ class AliceBlue:
     
     def get_holdings(self):
         url = f"{BASE_URL}/open-api/od/v1/holdings/CNC"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Holding Error {res.status_code}: {res.text}")
@@ -209,9 +282,12 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    def iter_holdings(self) -> RecordStream:
+        return self._stream(f"{BASE_URL}/open-api/od/v1/holdings/CNC", "Holding")
+
     def get_positions(self):
         url = f"{BASE_URL}/open-api/od/v1/positions"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Position Error {res.status_code}: {res.text}")
@@ -220,16 +296,18 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(SQUARE_OFF)
     def get_positions_sqroff(self, exch, symbol, qty, product, transaction_type):
         url = f"{BASE_URL}/open-api/od/v1/orders/positions/sqroff"
         payload = {
             "exch": exch,
             "symbol": symbol,
-            "qty": qty,
+            # Validated as a whole number, but the endpoint takes the quantity as a string.
+            "qty": str(qty),
             "product": product,
             "transaction_type": transaction_type
         }
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"Position Square Off Error {res.status_code}: {res.text}")
@@ -238,6 +316,7 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
 
+    @validated(POSITION_CONVERSION)
     def get_position_conversion(self, exchange, validity, prevProduct, product, quantity, tradingSymbol, transactionType,orderSource):
         url = f"{BASE_URL}/open-api/od/v1/conversion"
         payload = {
@@ -250,7 +329,7 @@ class AliceBlue:
             "transactionType": transactionType,
             "orderSource":orderSource
         }
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"Position Conversion Error {res.status_code}: {res.text}")
@@ -259,6 +338,7 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(PLACE_ORDER)
     def get_place_order(self,instrument_id: str, exchange: str, transaction_type: str, quantity: int, order_type: str, product: str,
                     order_complexity: str, price: float, validity: str, sl_leg_price: Optional[float] = None,
                     target_leg_price: Optional[float] = None, sl_trigger_price: Optional[float] = None, trailing_sl_amount: Optional[float] = None,
@@ -290,7 +370,7 @@ class AliceBlue:
         if trailing_sl_amount is not None:
             payload[0]["trailingSlAmount"] = trailing_sl_amount
 
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
 
         if res.status_code != 200:
             raise Exception(f"Order Place Error {res.status_code}: {res.text}")
@@ -301,7 +381,7 @@ class AliceBlue:
     
     def get_order_book(self):
         url = f"{BASE_URL}/open-api/od/v1/orders/book"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Order Book Error {res.status_code}: {res.text}")
@@ -310,10 +390,14 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    def iter_order_book(self) -> RecordStream:
+        return self._stream(f"{BASE_URL}/open-api/od/v1/orders/book", "Order Book")
+
+    @validated(BROKER_ORDER_ID)
     def get_order_history(self, brokerOrderId: str):
         url = f"{BASE_URL}/open-api/od/v1/orders/history"
         payload = {"brokerOrderId": brokerOrderId}
-        res = requests.post(url, headers=self.headers, json = payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"Order History Error {res.status_code}: {res.text}")
@@ -322,18 +406,40 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
-    def get_modify_order(self, brokerOrderId:str, validity: str , quantity: Optional[int] = None,price: Optional[Union[int, float]] = None, 
-                         triggerPrice: Optional[float] = None
-                         ):
-        url = f"{BASE_URL}/open-api/od/v1/orders/modify"
-        payload = [{
+    @staticmethod
+    @validated(MODIFY_ORDER)
+    def modify_item(brokerOrderId: str, validity: str, quantity: Optional[int] = None,
+                    price: Optional[Union[int, float]] = None, triggerPrice: Optional[float] = None):
+        """Normalized orders/modify element; empty fields are left unchanged by the broker."""
+        return {
             "brokerOrderId": brokerOrderId,
             "quantity": quantity if quantity else "",
             "price": price if price else "",
             "triggerPrice": triggerPrice if triggerPrice else "",
             "validity": validity.upper()
-        }]
-        res = requests.post(url, headers=self.headers, json=payload)
+        }
+
+    def get_modify_order(self, brokerOrderId:str, validity: str , quantity: Optional[int] = None,price: Optional[Union[int, float]] = None, 
+                         triggerPrice: Optional[float] = None
+                         ):
+        return self._modify([self.modify_item(brokerOrderId, validity, quantity, price, triggerPrice)])
+
+    def modify_orders(self, items: list) -> list:
+        """Modify several orders in one POST; returns one response per item.
+
+        Modifies set absolute values, so re-sending them one by one after an unrecognised
+        response shape is safe.
+        """
+        data = self._modify(items)
+        per_item = _split_list_response(data, len(items))
+        if per_item is None:
+            log.warning("Unrecognised orders/modify response shape, falling back to one call per order")
+            return [self._modify([item]) for item in items]
+        return per_item
+
+    def _modify(self, payload: list):
+        url = f"{BASE_URL}/open-api/od/v1/orders/modify"
+        res = self._request("POST", url, json=payload)
         if res.status_code != 200:
             raise Exception(f"Order Modify Error {res.status_code}: {res.text}")
 
@@ -342,11 +448,12 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(BROKER_ORDER_ID)
     def get_cancel_order(self, brokerOrderId):
         """Cancel an order."""
         url = f"{BASE_URL}/open-api/od/v1/orders/cancel"
         payload = {"brokerOrderId":brokerOrderId}
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"Order Cancel Error {res.status_code}: {res.text}")
@@ -357,7 +464,7 @@ class AliceBlue:
     
     def get_trade_book(self):
         url = f"{BASE_URL}/open-api/od/v1/orders/trades"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Order Cancel Error {res.status_code}: {res.text}")
@@ -366,10 +473,15 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
-    def get_order_margin(self, exchange:str, instrumentId:str, transactionType:str, quantity:int, product:str, 
-                         orderComplexity:str, orderType:str, validity:str, price=0.0, slTriggerPrice: Optional[Union[int, float]] = None):
-        url = f"{BASE_URL}/open-api/od/v1/orders/checkMargin"
-        payload = [{
+    def iter_trade_book(self) -> RecordStream:
+        return self._stream(f"{BASE_URL}/open-api/od/v1/orders/trades", "Trade Book")
+
+    @staticmethod
+    @validated(MARGIN)
+    def margin_item(exchange:str, instrumentId:str, transactionType:str, quantity:int, product:str, 
+                    orderComplexity:str, orderType:str, validity:str, price=0.0, slTriggerPrice: Optional[Union[int, float]] = None):
+        """Normalized checkMargin element; also used as the batching/memo key."""
+        return {
             "exchange": exchange.upper(),
             "instrumentId": instrumentId.upper(),
             "transactionType": transactionType.upper(),
@@ -379,24 +491,43 @@ class AliceBlue:
             "orderType": orderType.upper(),
             "price": price,
             "validity": validity.upper(),
-            "slTriggerPrice": slTriggerPrice if slTriggerPrice is not None else ""
-        }]
-        res = requests.post(url, headers=self.headers, json=payload)
+            "slTriggerPrice": slTriggerPrice if slTriggerPrice not in (None, "") else ""
+        }
+
+    @validated(MARGIN)
+    def get_order_margin(self, exchange:str, instrumentId:str, transactionType:str, quantity:int, product:str, 
+                         orderComplexity:str, orderType:str, validity:str, price=0.0, slTriggerPrice: Optional[Union[int, float]] = None):
+        return self._check_margin([self.margin_item(exchange, instrumentId, transactionType, quantity, product,
+                                                    orderComplexity, orderType, validity, price, slTriggerPrice)])
+
+    def get_order_margins(self, items: list) -> list:
+        """Check margin for several orders in one POST; returns one response per item."""
+        data = self._check_margin(items)
+        per_item = _split_list_response(data, len(items))
+        if per_item is None:
+            log.warning("Unrecognised checkMargin response shape, falling back to one call per order")
+            return [self._check_margin([item]) for item in items]
+        return per_item
+
+    def _check_margin(self, payload: list):
+        url = f"{BASE_URL}/open-api/od/v1/orders/checkMargin"
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
-            raise Exception(f"Order Cancel Error {res.status_code}: {res.text}")
+            raise Exception(f"Order Margin Error {res.status_code}: {res.text}")
         try:
             return res.json()
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(EXIT_BRACKET)
     def get_exit_bracket_order(self, brokerOrderId: str, orderComplexity: str):
         url = f"{BASE_URL}/open-api/od/v1/orders/exit/sno"
         payload = [{
             "brokerOrderId": brokerOrderId,
             "orderComplexity": orderComplexity.upper()
         }]
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"Exit Bracket Order Error {res.status_code}: {res.text}")
@@ -406,6 +537,7 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(PLACE_GTT)
     def get_place_gtt_order(self, tradingSymbol: str, exchange: str, transactionType: str, orderType: str,
                             product: str, validity: str, quantity: int, price: float, orderComplexity: str, 
                             instrumentId: str, gttType: str, gttValue: float):
@@ -427,7 +559,7 @@ class AliceBlue:
             "gttValue": gttValue 
         }
         try:
-            res = requests.post(url, headers=self.headers, json=payload)
+            res = self._request("POST", url, json=payload)
             res.raise_for_status()
             return res.json()
         except requests.exceptions.HTTPError as e:
@@ -442,7 +574,7 @@ class AliceBlue:
     
     def get_gtt_order_book(self):
         url = f"{BASE_URL}/open-api/od/v1/orders/gtt/orderbook"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"GTT Order Book Error {res.status_code}: {res.text}")
@@ -452,6 +584,7 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(MODIFY_GTT)
     def get_modify_gtt_order(self, brokerOrderId: str, instrumentId: str, tradingSymbol: str, 
                             exchange: str, orderType: str, product: str, validity: str, 
                             quantity: int, price: float, orderComplexity: str, 
@@ -475,7 +608,7 @@ class AliceBlue:
         }
         
         try:
-            res = requests.post(url, headers=self.headers, json=payload)
+            res = self._request("POST", url, json=payload)
             res.raise_for_status()
             return res.json()
             
@@ -489,10 +622,11 @@ class AliceBlue:
         except requests.exceptions.RequestException as e:
             raise Exception(f"Network error: {str(e)}")
     
+    @validated(BROKER_ORDER_ID)
     def get_cancel_gtt_order(self, brokerOrderId):
         url = f"{BASE_URL}/open-api/od/v1/orders/gtt/cancel"
         payload = {"brokerOrderId": brokerOrderId}
-        res = requests.post(url, headers=self.headers, json=payload)
+        res = self._request("POST", url, json=payload)
         
         if res.status_code != 200:
             raise Exception(f"GTT Cancel Order Error {res.status_code}: {res.text}")
@@ -501,9 +635,42 @@ class AliceBlue:
         except Exception:
             raise Exception(f"Non-JSON response: {res.text}")
     
+    @validated(CANDLES)
+    def get_historical_candles(self, exchange: str, instrumentId: str, resolution: str, from_ms: int, to_ms: int):
+        """OHLCV candles between two epoch-millisecond bounds; resolution "1" (minute) or "D" (day)."""
+        url = f"{BASE_URL}/open-api/od/v1/chart/history"
+        payload = {
+            "exchange": exchange.upper(),
+            "token": str(instrumentId),
+            "resolution": str(resolution).upper(),
+            "from": str(from_ms),
+            "to": str(to_ms)
+        }
+        res = self._request("POST", url, json=payload)
+
+        if res.status_code != 200:
+            raise Exception(f"Historical Data Error {res.status_code}: {res.text}")
+        try:
+            return res.json()
+        except Exception:
+            raise Exception(f"Non-JSON response: {res.text}")
+
+    @validated(QUOTE)
+    def get_quote(self, exchange: str, instrumentId: str):
+        url = f"{BASE_URL}/open-api/od/v1/marketdata/quote"
+        payload = {"exchange": exchange.upper(), "token": str(instrumentId)}
+        res = self._request("POST", url, json=payload)
+
+        if res.status_code != 200:
+            raise Exception(f"Quote Error {res.status_code}: {res.text}")
+        try:
+            return res.json()
+        except Exception:
+            raise Exception(f"Non-JSON response: {res.text}")
+
     def get_limits(self):
         url = f"{BASE_URL}/open-api/od/v1/limits"
-        res = requests.get(url, headers=self.headers)
+        res = self._request("GET", url)
         
         if res.status_code != 200:
             raise Exception(f"Exit Bracket Order Error {res.status_code}: {res.text}")   
@@ -513,7 +680,8 @@ class AliceBlue:
             raise Exception(f"Non-JSON response: {res.text}")
 
 if __name__ == "__main__":
+    setup_logging()
     alice = AliceBlue(app_key, api_secret)
     alice.authenticate()
-    print("User Session:", alice.get_session())
+    log.info("Authenticated", extra={"user_id": alice.user_id})
     
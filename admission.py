@@ -0,0 +1,183 @@
+"""Admission control for tool calls.
+
+Calls run only while both a global and a per-tool concurrency slot are free. Otherwise they
+wait in one bounded queue ordered by priority class (risk-reducing first), each with a
+deadline for its class. A full queue makes room for an urgent call by shedding the least
+urgent waiter; if nothing can be shed, the new call is rejected immediately. Either way a
+shed call gets a fast "busy" response instead of adding to the broker's backlog.
+"""
+import os
+import time
+import asyncio
+import bisect
+import itertools
+from collections import Counter, defaultdict, deque
+from typing import Dict, Optional
+
+from fastmcp.server.middleware import Middleware
+from fastmcp.tools.tool import ToolResult
+
+from logger import get_logger
+
+RISK, TRADE, READ, BULK = 0, 1, 2, 3
+CLASS_NAMES = {RISK: "risk", TRADE: "trade", READ: "read", BULK: "bulk"}
+# Longest a call of each class may wait for a slot before it is shed.
+MAX_WAIT = {RISK: 30.0, TRADE: 10.0, READ: 5.0, BULK: 2.0}
+
+GLOBAL_LIMIT = int(os.getenv("ALICE_MAX_CONCURRENT_TOOLS", "16"))
+TOOL_LIMIT = int(os.getenv("ALICE_MAX_CONCURRENT_PER_TOOL", "4"))
+MAX_QUEUED = int(os.getenv("ALICE_MAX_QUEUED_TOOLS", "64"))
+
+log = get_logger("admission")
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"tool=limit,tool=limit" (e.g. ALICE_TOOL_LIMITS) as a dict."""
+    limits = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("key", "tool", "priority", "future", "enqueued")
+
+    def __init__(self, key, tool, priority, future):
+        self.key = key
+        self.tool = tool
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class AdmissionControl(Middleware):
+    """Concurrency limits, priority queueing and load shedding around every tool call.
+
+    `priorities` maps tool names to a class (RISK, TRADE, READ, BULK; default READ);
+    tools in `exempt` bypass admission.
+    """
+
+    def __init__(self, priorities: Dict[str, int], exempt=(), global_limit: int = GLOBAL_LIMIT,
+                 tool_limit: int = TOOL_LIMIT, tool_limits: Optional[Dict[str, int]] = None,
+                 max_queued: int = MAX_QUEUED, max_wait: Optional[Dict[int, float]] = None):
+        self.priorities = priorities
+        self.exempt = frozenset(exempt)
+        self.global_limit = global_limit
+        self.tool_limit = tool_limit
+        self.tool_limits = dict(tool_limits or {})
+        self.max_queued = max_queued
+        self.max_wait = {**MAX_WAIT, **(max_wait or {})}
+        self.running = 0
+        self.running_by_tool = Counter()
+        self._queue = []
+        self._seq = itertools.count()
+        self.counts = defaultdict(Counter)
+        self.waits = defaultdict(lambda: deque(maxlen=1000))
+        self.max_depth = 0
+
+    def _has_slot(self, tool: str) -> bool:
+        return self.running < self.global_limit and \
+            self.running_by_tool[tool] < self.tool_limits.get(tool, self.tool_limit)
+
+    def _start(self, tool: str):
+        self.running += 1
+        self.running_by_tool[tool] += 1
+
+    def _dispatch(self):
+        """Hand freed slots to the most urgent waiters whose tool has room."""
+        i = 0
+        while i < len(self._queue) and self.running < self.global_limit:
+            waiter = self._queue[i]
+            if waiter.future.done():
+                self._queue.pop(i)
+            elif self._has_slot(waiter.tool):
+                self._queue.pop(i)
+                self._start(waiter.tool)
+                waiter.future.set_result(True)
+            else:
+                i += 1
+
+    async def acquire(self, tool: str, priority: int):
+        if self._has_slot(tool):
+            self._start(tool)
+            self.waits[tool].append(0.0)
+            return
+        if len(self._queue) >= self.max_queued:
+            victim = self._queue[-1] if self._queue else None
+            if victim is None or victim.priority <= priority:
+                raise Shed("queue full", self.max_wait[priority] / 2)
+            self._queue.pop()
+            victim.future.set_exception(Shed(f"displaced by a higher-priority {CLASS_NAMES[priority]} call", 1.0))
+        waiter = _Waiter((priority, next(self._seq)), tool, priority, asyncio.get_running_loop().create_future())
+        bisect.insort(self._queue, waiter)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait[priority])
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.exception():
+                # Admitted just as the deadline passed: keep the slot.
+                self.waits[tool].append(time.perf_counter() - waiter.enqueued)
+                return
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+            raise Shed(f"waited over {self.max_wait[priority]}s for a slot", self.max_wait[priority])
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self.release(tool)
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+            raise
+        self.waits[tool].append(time.perf_counter() - waiter.enqueued)
+
+    def release(self, tool: str):
+        self.running -= 1
+        self.running_by_tool[tool] -= 1
+        self._dispatch()
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        if tool in self.exempt:
+            return await call_next(context)
+        priority = self.priorities.get(tool, READ)
+        try:
+            await self.acquire(tool, priority)
+        except Shed as e:
+            self.counts[tool]["shed"] += 1
+            log.debug("tool call shed", extra={"tool": tool, "reason": e.reason, "queued": len(self._queue)})
+            return ToolResult(structured_content={
+                "status": "error", "message": f"Server busy ({e.reason}); retry in {e.retry_after:.1f}s",
+                "retry_after_s": e.retry_after})
+        self.counts[tool]["admitted"] += 1
+        try:
+            return await call_next(context)
+        finally:
+            self.release(tool)
+
+    def metrics(self) -> dict:
+        def pct(values, p):
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2) if ordered else None
+
+        queued = Counter(w.tool for w in self._queue)
+        tools = {}
+        for tool in sorted(set(self.counts) | set(queued) | {t for t, n in self.running_by_tool.items() if n}):
+            waits = self.waits[tool]
+            tools[tool] = {
+                "class": CLASS_NAMES[self.priorities.get(tool, READ)], "running": self.running_by_tool[tool],
+                "queued": queued[tool], "admitted": self.counts[tool]["admitted"], "shed": self.counts[tool]["shed"],
+                "wait_p50_ms": pct(waits, 0.5), "wait_p99_ms": pct(waits, 0.99),
+            }
+        return {"running": self.running, "global_limit": self.global_limit, "queued": len(self._queue),
+                "max_queued": self.max_queued, "max_queue_depth_seen": self.max_depth, "tools": tools}
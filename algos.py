@@ -0,0 +1,355 @@
+"""Execution algorithms that slice a parent order into child orders inside the server.
+
+TWAP spreads the quantity evenly over the duration, VWAP weights the slices by an intraday
+volume profile, and ICEBERG keeps one child of the display size working until the parent is
+done. Every parent is a task on the server's event loop, and slice times are absolute loop
+times, so timers do not drift. A single order-book poller tracks the fills of all children.
+While a child is still working, the next slice raises its quantity through get_modify_order
+instead of adding another order.
+
+Algos live in the event loop of the worker process that started them, so algo_status and
+cancel_algo only see them from that process; the server refuses start_algo with several workers.
+"""
+import os
+import asyncio
+import itertools
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from logger import get_logger
+from market_data import IST
+from validation import PLACE_ORDER, ValidationError, instruments
+from workflows import ORDER_ID_KEYS, TERMINAL_STATUSES, find_key
+
+ALGOS = ("TWAP", "VWAP", "ICEBERG")
+END_ACTIONS = ("cancel", "market", "leave")
+POLL_SECONDS = float(os.getenv("ALICE_ALGO_POLL_SECONDS", "1"))
+MAX_REJECTIONS = 3
+
+# Share of NSE cash-market volume in each 30-minute bucket from 09:15 (the last bucket is 15 minutes).
+VOLUME_PROFILE = (0.125, 0.09, 0.075, 0.065, 0.06, 0.055, 0.055, 0.06, 0.065, 0.075, 0.09, 0.115, 0.07)
+SESSION_OPEN_MINUTE = 9 * 60 + 15
+
+log = get_logger("algos")
+
+
+def _rows(payload) -> list:
+    rows = payload.get("result", payload.get("data")) if isinstance(payload, dict) else payload
+    return rows if isinstance(rows, list) else []
+
+
+def lot_size(exchange: str, instrument_id: str) -> int:
+    spec = instruments.get((exchange, str(instrument_id)))
+    return spec[0] if spec else 1
+
+
+def slice_targets(quantity: int, weights: List[float], lot: int = 1) -> List[int]:
+    """Cumulative quantity due after each slice, in whole lots, ending at `quantity`."""
+    total = sum(weights)
+    targets, cumulative = [], 0.0
+    for weight in weights:
+        cumulative += weight
+        targets.append(int(round(quantity * cumulative / total / lot)) * lot)
+    targets[-1] = quantity
+    return targets
+
+
+def profile_weights(start: datetime, duration: float, slices: int, profile=VOLUME_PROFILE) -> List[float]:
+    """Volume-profile weight of each slice, by the 30-minute bucket its start falls in."""
+    weights = []
+    for i in range(slices):
+        at = start.timestamp() + duration * i / slices
+        local = datetime.fromtimestamp(at, IST)
+        bucket = (local.hour * 60 + local.minute - SESSION_OPEN_MINUTE) // 30
+        weights.append(profile[min(max(bucket, 0), len(profile) - 1)])
+    return weights
+
+
+class AlgoOrder:
+    """A parent order and its children; `children` hold broker ids, quantities and fills."""
+
+    def __init__(self, algo_id: str, algo: str, order: dict, duration: float, slices: int,
+                 display_quantity: Optional[int], targets: List[int], on_end: str):
+        self.id = algo_id
+        self.algo = algo
+        self.order = order
+        self.duration = duration
+        self.slices = slices
+        self.display_quantity = display_quantity
+        self.targets = targets
+        self.on_end = on_end
+        self.status = "running"
+        self.message = None
+        self.children: List[dict] = []
+        self.slices_sent = 0
+        self.max_lateness_ms = 0.0
+        self.rejections = 0
+        self.started_at = datetime.now(IST)
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.placing: Set[asyncio.Task] = set()
+
+    @property
+    def quantity(self) -> int:
+        return self.order["quantity"]
+
+    @property
+    def filled(self) -> int:
+        return sum(child["filled"] for child in self.children)
+
+    def working(self) -> Optional[dict]:
+        for child in reversed(self.children):
+            if child["status"] not in TERMINAL_STATUSES:
+                return child
+        return None
+
+    def to_dict(self) -> dict:
+        filled = self.filled
+        value = sum(child["filled"] * child["average_price"] for child in self.children)
+        return {
+            "algo_id": self.id, "algo": self.algo, "status": self.status, "message": self.message,
+            "instrument_id": self.order["instrument_id"], "exchange": self.order["exchange"],
+            "transaction_type": self.order["transaction_type"], "quantity": self.quantity,
+            "filled_quantity": filled, "average_price": round(value / filled, 4) if filled else None,
+            "working_quantity": sum(c["quantity"] - c["filled"] for c in self.children if c["status"] not in TERMINAL_STATUSES),
+            "slices_sent": self.slices_sent, "slices": self.slices, "max_timer_lateness_ms": round(self.max_lateness_ms, 2),
+            "started_at": self.started_at.isoformat(timespec="seconds"), "children": self.children,
+        }
+
+
+class AlgoScheduler:
+    """Runs parent orders concurrently on the event loop; broker calls go to worker threads."""
+
+    def __init__(self, get_client: Callable, on_orders_changed: Optional[Callable] = None):
+        self._get_client = get_client
+        self._on_orders_changed = on_orders_changed
+        self.algos: Dict[str, AlgoOrder] = {}
+        self._working: Dict[str, tuple] = {}
+        self._tracker: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+
+    async def _call(self, method: str, **kwargs):
+        alice = await asyncio.to_thread(self._get_client)
+        result = await asyncio.to_thread(getattr(alice, method), **kwargs)
+        if self._on_orders_changed and method != "get_order_book":
+            self._on_orders_changed()
+        return result
+
+    async def start(self, algo: str, instrument_id: str, exchange: str, transaction_type: str, quantity: int,
+                    product: str, price: Optional[float] = None, duration: float = 1800.0,
+                    slices: Optional[int] = None, display_quantity: Optional[int] = None,
+                    profile: Optional[List[float]] = None, on_end: str = "cancel", validity: str = "DAY") -> dict:
+        algo = algo.upper()
+        if algo not in ALGOS:
+            raise ValidationError(f"algo must be one of {', '.join(ALGOS)}; got {algo!r}")
+        if on_end not in END_ACTIONS:
+            raise ValidationError(f"on_end must be one of {', '.join(END_ACTIONS)}; got {on_end!r}")
+        order = PLACE_ORDER({
+            "instrument_id": instrument_id, "exchange": exchange, "transaction_type": transaction_type,
+            "quantity": quantity, "order_type": "LIMIT" if price else "MARKET", "product": product,
+            "order_complexity": "REGULAR", "price": price or 0.0, "validity": validity,
+        })
+        lot = lot_size(order["exchange"], order["instrument_id"])
+        if algo == "ICEBERG":
+            if not display_quantity or display_quantity <= 0:
+                raise ValidationError("display_quantity is required for ICEBERG")
+            display_quantity = max(lot, display_quantity // lot * lot)
+            slices, targets = -(-order["quantity"] // display_quantity), []
+        else:
+            if duration <= 0:
+                raise ValidationError("duration must be positive")
+            slices = max(1, min(slices or max(1, int(duration // 60)), order["quantity"] // lot))
+            weights = ([1.0] * slices if algo == "TWAP"
+                       else profile_weights(datetime.now(IST), duration, slices, tuple(profile or VOLUME_PROFILE)))
+            targets = slice_targets(order["quantity"], weights, lot)
+        parent = AlgoOrder(f"ALGO-{next(self._ids)}", algo, order, duration, slices, display_quantity, targets, on_end)
+        self.algos[parent.id] = parent
+        parent.task = asyncio.get_running_loop().create_task(self._run(parent))
+        log.info("algo started", extra={"algo_id": parent.id, "algo": algo, "quantity": quantity, "slices": slices})
+        return parent.to_dict()
+
+    async def cancel(self, algo_id: str) -> dict:
+        parent = self.algos.get(algo_id)
+        if parent is None:
+            raise ValueError(f"Unknown algo {algo_id}")
+        if parent.status == "running":
+            parent.status = "cancelled"
+            parent.task.cancel()
+            # Placements already sent finish in their threads; their children are cancelled as they land.
+            await asyncio.gather(*list(parent.placing), return_exceptions=True)
+            await self._cancel_working(parent)
+        return parent.to_dict()
+
+    def status(self, algo_id: Optional[str] = None) -> dict:
+        if algo_id is None:
+            return {"algos": [parent.to_dict() for parent in self.algos.values()]}
+        parent = self.algos.get(algo_id)
+        if parent is None:
+            raise ValueError(f"Unknown algo {algo_id}")
+        return parent.to_dict()
+
+    # -- child orders --------------------------------------------------------
+
+    async def _place(self, parent: AlgoOrder, quantity: int, market: bool = False):
+        order = dict(parent.order, quantity=quantity)
+        if market:
+            order.update(order_type="MARKET", price=0.0)
+        send = asyncio.get_running_loop().create_task(self._send_child(parent, order))
+        parent.placing.add(send)
+        send.add_done_callback(parent.placing.discard)
+        # Cancelling the parent must not abandon an order that is already on its way to the broker.
+        return await asyncio.shield(send)
+
+    async def _send_child(self, parent: AlgoOrder, order: dict) -> Optional[dict]:
+        placed = await self._call("get_place_order", **order)
+        broker_order_id = find_key(placed, ORDER_ID_KEYS)
+        if broker_order_id is None:
+            parent.rejections += 1
+            parent.message = f"Child order not accepted: {placed}"
+            return None
+        child = {"brokerOrderId": str(broker_order_id), "quantity": order["quantity"], "filled": 0,
+                 "average_price": 0.0, "status": "open",
+                 "placed_at": datetime.now(IST).isoformat(timespec="milliseconds")}
+        parent.children.append(child)
+        self._working[child["brokerOrderId"]] = (parent, child)
+        self._ensure_tracker()
+        if parent.status != "running":
+            # The parent was cancelled while this placement was in flight.
+            await self._cancel_child(parent, child)
+        return child
+
+    async def _top_up(self, parent: AlgoOrder, target: int):
+        """Bring filled plus working quantity up to `target`, growing the working child if possible."""
+        working = parent.working()
+        outstanding = parent.filled + (working["quantity"] - working["filled"] if working else 0)
+        missing = target - outstanding
+        if missing <= 0:
+            return
+        if working is not None:
+            try:
+                modified = await self._call("get_modify_order", brokerOrderId=working["brokerOrderId"],
+                                            validity=parent.order["validity"], quantity=working["quantity"] + missing,
+                                            price=parent.order["price"] or None)
+                if find_key(modified, ORDER_ID_KEYS) is not None:
+                    working["quantity"] += missing
+                    return
+            except Exception as e:
+                log.warning("child modify failed", extra={"algo_id": parent.id, "error": str(e)})
+        await self._place(parent, missing)
+
+    async def _cancel_child(self, parent: AlgoOrder, child: dict):
+        try:
+            await self._call("get_cancel_order", brokerOrderId=child["brokerOrderId"])
+            child["cancel_requested"] = True
+        except Exception as e:
+            log.warning("child cancel failed", extra={"algo_id": parent.id, "error": str(e)})
+
+    async def _cancel_working(self, parent: AlgoOrder):
+        for child in parent.children:
+            if child["status"] not in TERMINAL_STATUSES and not child.get("cancel_requested"):
+                await self._cancel_child(parent, child)
+        await self._refresh_fills()
+
+    # -- fill tracking -------------------------------------------------------
+
+    def _ensure_tracker(self):
+        if self._tracker is None or self._tracker.done():
+            self._tracker = asyncio.get_running_loop().create_task(self._track())
+
+    async def _track(self):
+        while self._working:
+            await asyncio.sleep(POLL_SECONDS)
+            try:
+                await self._refresh_fills()
+            except Exception as e:
+                log.warning("order book poll failed", extra={"error": str(e)})
+
+    async def _refresh_fills(self):
+        """One order-book read updates every working child of every parent."""
+        if not self._working:
+            return
+        book = await self._call("get_order_book")
+        for row in _rows(book):
+            entry = self._working.get(str(find_key(row, ORDER_ID_KEYS)))
+            if entry is None:
+                continue
+            parent, child = entry
+            filled = int(float(find_key(row, ("filledQuantity", "filledQty", "tradedQuantity")) or 0))
+            status = str(find_key(row, ("orderStatus", "status")) or child["status"]).lower()
+            if filled != child["filled"] or status != child["status"]:
+                child["filled"] = filled
+                child["average_price"] = float(find_key(row, ("averageTradedPrice", "averagePrice")) or 0)
+                child["status"] = status
+                if status == "rejected":
+                    parent.rejections += 1
+                    parent.message = find_key(row, ("rejectionReason", "remarks")) or "Child order rejected"
+                parent.changed.set()
+            if status in TERMINAL_STATUSES:
+                del self._working[child["brokerOrderId"]]
+
+    # -- algorithms ----------------------------------------------------------
+
+    async def _wait(self, parent: AlgoOrder, until: float):
+        """Sleep until loop time `until` or the next fill update; records timer lateness."""
+        loop = asyncio.get_running_loop()
+        parent.changed.clear()
+        try:
+            await asyncio.wait_for(parent.changed.wait(), max(until - loop.time(), 0))
+        except asyncio.TimeoutError:
+            parent.max_lateness_ms = max(parent.max_lateness_ms, (loop.time() - until) * 1000)
+
+    async def _run(self, parent: AlgoOrder):
+        try:
+            if parent.algo == "ICEBERG":
+                await self._run_iceberg(parent)
+            else:
+                await self._run_scheduled(parent)
+            if parent.status == "running":
+                parent.status = "completed" if parent.filled >= parent.quantity else "expired"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            parent.status, parent.message = "failed", str(e)
+            log.exception("algo failed", extra={"algo_id": parent.id})
+            await self._cancel_working(parent)
+        log.info("algo finished", extra={"algo_id": parent.id, "status": parent.status, "filled": parent.filled})
+
+    def _check_rejections(self, parent: AlgoOrder):
+        if parent.rejections >= MAX_REJECTIONS:
+            raise RuntimeError(f"{parent.rejections} child orders rejected: {parent.message}")
+
+    async def _run_scheduled(self, parent: AlgoOrder):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        interval = parent.duration / parent.slices
+        for i, target in enumerate(parent.targets):
+            due = start + i * interval
+            while loop.time() < due:
+                await self._wait(parent, due)
+            self._check_rejections(parent)
+            await self._top_up(parent, target)
+            parent.slices_sent = i + 1
+        end = start + parent.duration
+        while loop.time() < end and parent.filled < parent.quantity:
+            await self._wait(parent, end)
+        await self._refresh_fills()
+        remaining = parent.quantity - parent.filled
+        if remaining <= 0 or parent.on_end == "leave":
+            return
+        await self._cancel_working(parent)
+        remaining = parent.quantity - parent.filled
+        if parent.on_end == "market" and remaining > 0:
+            await self._place(parent, remaining, market=True)
+            deadline = loop.time() + 30
+            while parent.working() is not None and loop.time() < deadline:
+                await self._wait(parent, deadline)
+
+    async def _run_iceberg(self, parent: AlgoOrder):
+        loop = asyncio.get_running_loop()
+        while parent.filled < parent.quantity:
+            self._check_rejections(parent)
+            if parent.working() is None:
+                show = min(parent.display_quantity, parent.quantity - parent.filled)
+                if await self._place(parent, show) is not None:
+                    parent.slices_sent += 1
+            await self._wait(parent, loop.time() + 5 * POLL_SECONDS)
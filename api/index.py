@@ -5,10 +5,15 @@ import sys
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from logger import get_logger, setup_logging
+
+setup_logging()
+log = get_logger("api")
+
 try:
     from server import handle_request
 except Exception as e:
-    print(f"Import error: {e}")
+    log.error("Import error: %s", e)
     # Create a fallback handler
     def handle_request(body):
         return {"status": "error", "message": "Server not initialized"}
@@ -16,7 +21,7 @@ except Exception as e:
 def handler(event, context):
     """Vercel serverless function handler"""
     try:
-        print(f"Received event: {event['httpMethod']} {event.get('path', '/')}")
+        log.info("Received event: %s %s", event['httpMethod'], event.get('path', '/'))
         
         # Handle CORS preflight
         if event['httpMethod'] == 'OPTIONS':
@@ -91,7 +96,7 @@ def handler(event, context):
         }
             
     except Exception as e:
-        print(f"Error in handler: {e}")
+        log.exception("Error in handler: %s", e)
         return {
             'statusCode': 500,
             'headers': {
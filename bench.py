@@ -0,0 +1,317 @@
+"""Local benchmarks. Run `python bench.py <name>`; none of them touch the live broker."""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise TimeoutError(f"server on port {port} did not start")
+
+
+def bench_workers(worker_counts=(1, 2, 4), total: int = 2000, concurrency: int = 32):
+    """Streamable-HTTP tool-call throughput for 1/2/4 worker processes."""
+    from server import get_free_port
+    body = {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+            "params": {"name": "check_and_authenticate", "arguments": {}}}
+    headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+    results = {}
+    for workers in worker_counts:
+        port = get_free_port()
+        env = dict(os.environ, ALICE_APP_KEY=os.getenv("ALICE_APP_KEY", "bench"),
+                   ALICE_API_SECRET=os.getenv("ALICE_API_SECRET", "bench"), ALICE_LOG_LEVEL="WARNING")
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--transport", "http",
+                                 "--port", str(port), "--workers", str(workers)],
+                                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_for_port(port)
+            url = f"http://127.0.0.1:{port}/mcp"
+            session = requests.Session()
+            session.post(url, json=body, headers=headers).raise_for_status()
+
+            def call(_):
+                session.post(url, json=body, headers=headers).raise_for_status()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(call, range(total)))
+            elapsed = time.perf_counter() - started
+            results[workers] = total / elapsed
+            print(f"workers={workers}: {results[workers]:.0f} calls/s ({total} calls, concurrency {concurrency})")
+        finally:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+def bench_paper(total: int = 200_000, instruments: int = 20, orders_per_tick: int = 5):
+    """Simulated orders per second through the paper-trading matching engine."""
+    import random
+    from paper_trading import PaperAliceBlue, Tick
+
+    rng = random.Random(7)
+    alice = PaperAliceBlue(tick_file=None)
+    prices = [100.0 + 10 * i for i in range(instruments)]
+    placed = []
+    started = time.perf_counter()
+    for n in range(total):
+        i = rng.randrange(instruments)
+        if n % orders_per_tick == 0:
+            prices[i] = max(1.0, prices[i] + rng.choice((-0.05, 0.05)))
+            alice.feed(Tick(n, "NSE", str(i), prices[i], prices[i] - 0.05, prices[i] + 0.05, 500))
+        buy = rng.random() < 0.5
+        price = round(prices[i] + rng.uniform(-0.5, 0.5), 2)
+        res = alice.get_place_order(str(i), "NSE", "BUY" if buy else "SELL", rng.randint(1, 100), "LIMIT", "MIS",
+                                    "REGULAR", price, "DAY")
+        placed.append(res["result"][0]["brokerOrderId"])
+        roll = rng.random()
+        if roll < 0.1:
+            alice.get_cancel_order(placed[rng.randrange(len(placed))])
+        elif roll < 0.2:
+            alice.get_modify_order(placed[rng.randrange(len(placed))], "DAY", price=round(price + 0.05, 2))
+    elapsed = time.perf_counter() - started
+    print(f"paper: {total / elapsed:.0f} orders/s ({total} orders, {len(alice.trades)} fills, "
+          f"{total // orders_per_tick} ticks, {elapsed:.2f}s)")
+    return total / elapsed
+
+
+def bench_stream(orders: int = 20_000):
+    """Full json decode vs streaming filter/projection over a synthetic multi-megabyte order book."""
+    import json
+    import tracemalloc
+    from stream_json import BACKEND, CHUNK_SIZE, RecordStream, select
+
+    statuses = ("complete", "open", "rejected", "cancelled")
+    book = {"status": "Ok", "result": [{
+        "brokerOrderId": str(10_000_000 + i), "instrumentId": str(i % 500), "exchange": "NSE",
+        "tradingSymbol": f"SYMBOL{i % 500}-EQ", "transactionType": "BUY" if i % 2 else "SELL",
+        "quantity": 10 + i % 90, "filledQuantity": i % 10, "price": 100 + i % 400 * 0.05,
+        "averageTradedPrice": 100 + i % 400 * 0.05, "orderType": "LIMIT", "product": "MIS",
+        "orderComplexity": "REGULAR", "validity": "DAY", "orderStatus": statuses[i % 4],
+        "rejectionReason": "" if i % 4 != 2 else "RMS: margin exceeds, required 1234.50, available 10.00",
+        "orderTime": "2026-10-19 10:15:00", "exchangeOrderId": f"1100000{i:08d}", "remarks": "placed by agent",
+    } for i in range(orders)]}
+    body = json.dumps(book).encode()
+    del book
+
+    def chunks():
+        for i in range(0, len(body), CHUNK_SIZE):
+            yield body[i:i + CHUNK_SIZE]
+
+    def full_decode():
+        rows = [r for r in json.loads(body)["result"] if r["orderStatus"] == "open"]
+        return len(rows)
+
+    def stream_count():
+        return select(RecordStream(chunks()), {"orderStatus": "open"}, limit=0)[1]
+
+    def stream_project():
+        return len(select(RecordStream(chunks()), {"orderStatus": "open"}, ["brokerOrderId", "quantity", "price"])[0])
+
+    print(f"order book: {orders} orders, {len(body) / 1e6:.1f} MB, decoder backend {BACKEND}")
+    for name, fn in (("json.loads + filter", full_decode), ("stream count", stream_count),
+                     ("stream filter + project", stream_project)):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        started = time.perf_counter()
+        fn()
+        untraced = time.perf_counter() - started
+        print(f"{name:26s} {untraced * 1000:8.1f} ms  peak {peak / 1e6:6.1f} MB  matched {result}")
+
+
+def bench_pnl(fills: int = 1_000_000, instruments: int = 500, new_fills: int = 1000):
+    """P&L engine throughput on synthetic fills, and the cost of an incremental update."""
+    import random
+    from pnl import PnLEngine
+
+    rng = random.Random(11)
+    book = [{
+        "brokerOrderId": str(n), "exchange": "NSE", "instrumentId": str(rng.randrange(instruments)),
+        "product": "MIS", "transactionType": "BUY" if rng.random() < 0.5 else "SELL",
+        "filledQuantity": rng.randint(1, 100), "tradedPrice": round(rng.uniform(90, 110), 2), "tradeTime": n,
+    } for n in range(fills + new_fills)]
+    history, latest = book[:fills], book
+
+    engine = PnLEngine()
+    started = time.perf_counter()
+    for fill in history:
+        engine.apply("NSE", fill["instrumentId"], "MIS",
+                     fill["filledQuantity"] if fill["transactionType"] == "BUY" else -fill["filledQuantity"],
+                     fill["tradedPrice"])
+    apply_s = time.perf_counter() - started
+
+    engine = PnLEngine()
+    started = time.perf_counter()
+    engine.ingest(history)
+    ingest_s = time.perf_counter() - started
+    started = time.perf_counter()
+    added = engine.ingest(latest)
+    incremental_s = time.perf_counter() - started
+    started = time.perf_counter()
+    PnLEngine().ingest(latest)
+    recompute_s = time.perf_counter() - started
+    summary = engine.summary()
+
+    print(f"pnl: {fills} fills over {instruments} instruments")
+    print(f"apply (lot matching only)  {fills / apply_s:10.0f} fills/s  {apply_s:6.2f}s")
+    print(f"ingest (parse + dedup)     {fills / ingest_s:10.0f} fills/s  {ingest_s:6.2f}s")
+    print(f"incremental +{added} fills   {incremental_s * 1000:8.1f} ms (re-reading the {fills + new_fills}-fill book)")
+    print(f"full recompute             {recompute_s * 1000:8.1f} ms")
+    print(f"realized {summary['totals']['realized']:.2f}, charges {summary['totals']['charges']:.2f}")
+
+
+def bench_admission(rate: float = 300.0, seconds: float = 3.0, service_ms: float = 50.0, broker_capacity: int = 8):
+    """Open-loop overload (reads arriving faster than a throttled broker serves them, plus a
+    cancel every 100 ms): tool latency with and without admission control."""
+    import asyncio
+    import threading
+    from fastmcp import Client, FastMCP
+    from admission import READ, RISK, AdmissionControl
+
+    broker = threading.Semaphore(broker_capacity)
+    threads = ThreadPoolExecutor(int(rate * seconds) + 64)
+
+    def broker_call():
+        with broker:
+            time.sleep(service_ms / 1000)
+
+    def build(admit: bool) -> FastMCP:
+        app = FastMCP("load")
+
+        async def call_broker() -> dict:
+            await asyncio.get_running_loop().run_in_executor(threads, broker_call)
+            return {"status": "success"}
+
+        app.tool(name="get_order_book")(call_broker)
+        app.tool(name="get_cancel_order")(call_broker)
+        if admit:
+            app.add_middleware(AdmissionControl({"get_cancel_order": RISK}, global_limit=broker_capacity,
+                                                tool_limit=broker_capacity, max_queued=4 * broker_capacity,
+                                                max_wait={READ: 0.25}))
+        return app
+
+    def pct(values, p):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(p * len(values)))] * 1000 if values else float("nan")
+
+    async def run(app):
+        latencies = {"get_order_book": [], "get_cancel_order": []}
+        shed = 0
+
+        async def one(name):
+            nonlocal shed
+            started = time.perf_counter()
+            result = await client.call_tool(name, {})
+            latencies[name].append(time.perf_counter() - started)
+            shed += result.structured_content.get("status") == "error"
+
+        async with Client(app) as client:
+            loop = asyncio.get_running_loop()
+            start, tasks, n = loop.time(), [], 0
+            while n < rate * seconds:
+                due = start + n / rate
+                await asyncio.sleep(max(due - loop.time(), 0))
+                tasks.append(loop.create_task(one("get_order_book")))
+                if n % int(rate / 10) == 0:
+                    tasks.append(loop.create_task(one("get_cancel_order")))
+                n += 1
+            await asyncio.gather(*tasks)
+        return latencies, shed
+
+    print(f"{rate:.0f} reads/s for {seconds:.0f}s + 10 cancels/s; broker serves {broker_capacity} at a time, "
+          f"{service_ms:.0f} ms each ({broker_capacity * 1000 / service_ms:.0f}/s)")
+    for admit in (False, True):
+        latencies, shed = asyncio.run(run(build(admit)))
+        reads_ms, cancels_ms = latencies["get_order_book"], latencies["get_cancel_order"]
+        print(f"admission {'on ' if admit else 'off'}: read p50 {pct(reads_ms, 0.5):7.1f} ms  p99 {pct(reads_ms, 0.99):7.1f} ms"
+              f"  cancel p99 {pct(cancels_ms, 0.99):7.1f} ms  shed {shed}/{len(reads_ms) + len(cancels_ms)}")
+
+
+def bench_greeks(legs: int = 5000, prices: int = 100, vols: int = 10, days: int = 10):
+    """Greeks/IV for a synthetic F&O book and its P&L over a price x vol x time scenario grid,
+    against pricing every scenario separately."""
+    import random
+    from datetime import datetime, timedelta
+    import numpy as np
+    from greeks import IST, OptionBook, option_price
+
+    rng = random.Random(5)
+    now = datetime.now(IST)
+    spots = {"NIFTY": 25000.0, "BANKNIFTY": 56000.0, "FINNIFTY": 26000.0, "SENSEX": 82000.0, "MIDCPNIFTY": 13000.0}
+    rows = []
+    for _ in range(legs):
+        underlying = rng.choice(list(spots))
+        spot, expiry = spots[underlying], now.date() + timedelta(days=rng.choice([2, 9, 16, 30, 58, 86]))
+        strike = round(spot * rng.uniform(0.85, 1.15) / 50) * 50
+        kind = rng.choice(["CE", "PE"])
+        years = ((expiry - now.date()).days + 0.25) / 365
+        smile = 0.14 + 0.6 * (strike / spot - 1) ** 2
+        price = option_price(spot, float(strike), years, smile, kind == "PE")
+        rows.append({"tradingSymbol": f"{underlying}{expiry:%y}{'123456789OND'[expiry.month - 1]}{expiry:%d}{strike}{kind}",
+                     "netQuantity": rng.choice([-1, 1]) * rng.randint(1, 20) * 25,
+                     "ltp": max(round(float(price) * 20) / 20, 0.05)})
+
+    started = time.perf_counter()
+    book = OptionBook(rows, spots)
+    build_s = time.perf_counter() - started
+    started = time.perf_counter()
+    book.summary()
+    greeks_s = time.perf_counter() - started
+    price_shifts, vol_shifts, day_shifts = np.linspace(-0.1, 0.1, prices), np.linspace(-0.05, 0.05, vols), range(days)
+    started = time.perf_counter()
+    grid = book.scenarios(price_shifts, vol_shifts, day_shifts)
+    grid_s = time.perf_counter() - started
+    scenarios = prices * vols * days
+
+    # Baseline: every leg repriced scenario by scenario (a sample, scaled up).
+    sample = 200
+    spot, opt = book.spot[book.underlying], ~book.is_future
+    started = time.perf_counter()
+    for n in range(sample):
+        shift, vol_shift, forward = price_shifts[n % prices], vol_shifts[n // prices % vols], n // (prices * vols)
+        years = np.maximum(book.years - forward / 365, 1e-8)
+        value = option_price(spot[opt] * (1 + shift), book.strike[opt], years[opt], book.vol[opt] + vol_shift,
+                             book.is_put[opt])
+        np.bincount(book.underlying[opt], book.qty[opt] * (value - book.ltp[opt]), len(book.underlyings))
+    naive_s = (time.perf_counter() - started) * scenarios / sample
+
+    print(f"greeks: {len(book)} legs over {len(book.underlyings)} underlyings, {scenarios} scenarios "
+          f"({prices} prices x {vols} vols x {days} days), {int(book.vol_fallback.sum())} IV fallbacks")
+    print(f"parse + implied vol        {build_s * 1000:8.1f} ms")
+    print(f"book greeks                {greeks_s * 1000:8.1f} ms")
+    print(f"scenario grid              {grid_s * 1000:8.1f} ms  {len(book) * scenarios / grid_s / 1e6:6.1f} M leg-scenarios/s")
+    print(f"per-scenario repricing     {naive_s * 1000:8.1f} ms (estimated from {sample} scenarios)")
+    print(f"worst scenario P&L {grid.sum(axis=0).min():,.0f}, best {grid.sum(axis=0).max():,.0f}")
+
+
+BENCHMARKS = {
+    "workers": bench_workers,
+    "paper": bench_paper,
+    "stream": bench_stream,
+    "pnl": bench_pnl,
+    "admission": bench_admission,
+    "greeks": bench_greeks,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    BENCHMARKS[parser.parse_args().name]()
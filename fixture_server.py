@@ -0,0 +1,158 @@
+"""Local stand-in for the AliceBlue open API, for offline development and benchmarks.
+
+    python fixture_server.py --port 9000
+    ALICE_BASE_URL=http://127.0.0.1:9000 python server.py
+
+Market data is synthetic but deterministic: the same instrument and minute always produce
+the same candle. Orders live in memory: MARKET orders complete at once, others stay open.
+"""
+import json
+import math
+import argparse
+import threading
+import http.server
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+IST = timezone(timedelta(hours=5, minutes=30))
+API = "/open-api/od/v1"
+
+ROUTES = {}
+hits = Counter()
+
+
+def route(method: str, path: str):
+    def register(fn):
+        ROUTES[(method, API + path)] = fn
+        return fn
+    return register
+
+
+def _price(token: str, minute: int) -> float:
+    base = 100 + (sum(map(ord, str(token))) % 50) * 10
+    return round(base * (1 + 0.02 * math.sin(minute / 97.0) + 0.005 * math.sin(minute / 7.0)), 2)
+
+
+def _market_minutes(start: int, end: int, resolution: str):
+    """Session timestamps (09:15-15:29 IST, weekdays) between two epoch seconds."""
+    step = 86400 if resolution == "D" else 60
+    t = start - start % step
+    while t <= end:
+        local = datetime.fromtimestamp(t, IST)
+        minutes = local.hour * 60 + local.minute
+        if local.weekday() < 5 and (resolution == "D" or 555 <= minutes < 930):
+            yield t
+        t += step
+
+
+@route("POST", "/chart/history")
+def chart_history(body):
+    token, resolution = body["token"], body.get("resolution", "1")
+    start, end = int(body["from"]) // 1000, int(body["to"]) // 1000
+    result = []
+    for t in _market_minutes(start, end, resolution):
+        minute = t // 60
+        open_, close = _price(token, minute), _price(token, minute + 1)
+        result.append({
+            "time": datetime.fromtimestamp(t, IST).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": open_, "high": round(max(open_, close) * 1.001, 2),
+            "low": round(min(open_, close) * 0.999, 2), "close": close,
+            "volume": 1000 + minute % 500,
+        })
+    return {"stat": "Ok", "result": result}
+
+
+@route("POST", "/marketdata/quote")
+def quote(body):
+    token = body["token"]
+    ltp = _price(token, int(datetime.now(IST).timestamp()) // 60)
+    return {"stat": "Ok", "result": [{"exchange": body["exchange"], "token": token, "ltp": ltp,
+                                      "bid": round(ltp - 0.05, 2), "ask": round(ltp + 0.05, 2)}]}
+
+
+orders = {}
+
+
+@route("POST", "/orders/checkMargin")
+def check_margin(body):
+    return {"status": "Ok", "result": [{"requiredMargin": round(float(o.get("price") or 100) * int(o["quantity"]) * 0.2, 2),
+                                        "shortfall": 0} for o in body]}
+
+
+@route("POST", "/orders/placeorder")
+def place_order(body):
+    result = []
+    for order in body:
+        broker_order_id = str(len(orders) + 1).zfill(8)
+        status = "complete" if order["orderType"] == "MARKET" else "open"
+        orders[broker_order_id] = dict(order, brokerOrderId=broker_order_id, orderStatus=status)
+        result.append({"brokerOrderId": broker_order_id})
+    return {"status": "Ok", "result": result}
+
+
+@route("POST", "/orders/history")
+def order_history(body):
+    order = orders.get(body["brokerOrderId"])
+    if order is None:
+        return {"status": "Not_Ok", "message": "Order not found"}
+    return {"status": "Ok", "result": [{"brokerOrderId": order["brokerOrderId"], "orderStatus": order["orderStatus"]}]}
+
+
+@route("POST", "/orders/cancel")
+def cancel_order(body):
+    order = orders.get(body["brokerOrderId"])
+    if order is None or order["orderStatus"] != "open":
+        return {"status": "Not_Ok", "message": "Order not open"}
+    order["orderStatus"] = "cancelled"
+    return {"status": "Ok", "result": [{"brokerOrderId": order["brokerOrderId"]}]}
+
+
+@route("GET", "/orders/book")
+def order_book(body):
+    return {"status": "Ok", "result": list(orders.values())}
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _dispatch(self, method):
+        path = urlparse(self.path).path
+        handler = ROUTES.get((method, path))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") if length else None
+        hits[path] += 1
+        if handler is None:
+            status, payload = 404, {"stat": "Not_Ok", "emsg": f"No fixture for {method} {path}"}
+        else:
+            status, payload = 200, handler(body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 0):
+    """Start the fixture server on a daemon thread; returns (server, base_url)."""
+    server = http.server.ThreadingHTTPServer((host, port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AliceBlue fixture server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    http.server.ThreadingHTTPServer((args.host, args.port), FixtureHandler).serve_forever()
@@ -0,0 +1,456 @@
+"""Black-Scholes Greeks, implied volatility and scenario P&L for F&O positions.
+
+Option legs are parsed from position rows (strike, expiry and CE/PE from explicit fields when
+present, otherwise from the trading symbol) into parallel NumPy arrays, so pricing, Greeks
+and implied volatility run over the whole book at once. Scenario grids (price shift x vol
+shift x days forward) are evaluated as leg-by-price matrices per (days, vol) pair and reduced
+per underlying with one matrix product; puts are valued from calls by put-call parity, so the
+inner loop prices calls only.
+"""
+import os
+import re
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from refresh import HOLIDAYS, IST
+
+try:
+    from scipy.special import ndtr as norm_cdf
+except ImportError:  # pragma: no cover - depends on the environment
+    norm_cdf = None
+
+RISK_FREE_RATE = float(os.getenv("ALICE_RISK_FREE_RATE", "0.065"))
+DEFAULT_VOL = float(os.getenv("ALICE_DEFAULT_VOL", "0.2"))
+MONTHLY_EXPIRY_WEEKDAY = int(os.getenv("ALICE_MONTHLY_EXPIRY_WEEKDAY", "1"))  # Tuesday
+EXPIRY_TIME = (15, 30)  # IST
+DAYS_PER_YEAR = 365.0
+MIN_YEARS = 1e-8
+IV_BOUNDS = (1e-4, 5.0)
+IV_ITERATIONS = 60
+IV_TOLERANCE = 1e-6
+MAX_SCENARIOS = 100_000
+# Largest contract x price-point block evaluated at once in scenario grids (sized to stay in cache).
+CHUNK_ELEMENTS = 1 << 13
+
+SYMBOL_FIELDS = ("tradingSymbol", "tradingsymbol", "symbol", "instrumentId")
+QTY_FIELDS = ("netQuantity", "netQty", "netqty", "quantity")
+LTP_FIELDS = ("ltp", "lastTradedPrice", "LTP", "lastPrice")
+AVG_FIELDS = ("averagePrice", "netAveragePrice", "netAvgPrice", "avgPrice")
+STRIKE_FIELDS = ("strikePrice", "strike")
+EXPIRY_FIELDS = ("expiry", "expiryDate")
+OPTION_TYPE_FIELDS = ("optionType",)
+
+MONTHS = {m: i for i, m in enumerate(("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), 1)}
+WEEKLY_MONTHS = {**{str(i): i for i in range(1, 10)}, "O": 10, "N": 11, "D": 12}
+
+# NIFTY28NOV24C24000 (broker style), NIFTY24N2824000CE (exchange weekly), NIFTY24NOV24000CE (monthly), NIFTY24NOVFUT
+_BROKER = re.compile(r"^(?P<u>[A-Z&-]+?)(?P<d>\d{2})(?P<m>[A-Z]{3})(?P<y>\d{2})(?P<k>[CP])(?P<s>\d+(?:\.\d+)?)$")
+_WEEKLY = re.compile(r"^(?P<u>[A-Z&-]+?)(?P<y>\d{2})(?P<m>[1-9OND])(?P<d>\d{2})(?P<s>\d+(?:\.\d+)?)(?P<k>CE|PE)$")
+_MONTHLY = re.compile(r"^(?P<u>[A-Z&-]+?)(?P<y>\d{2})(?P<m>[A-Z]{3})(?P<s>\d+(?:\.\d+)?)(?P<k>CE|PE)$")
+_FUTURE = re.compile(r"^(?P<u>[A-Z&-]+?)(?:(?P<d>\d{2})(?P<m>[A-Z]{3})(?P<y>\d{2})|(?P<y2>\d{2})(?P<m2>[A-Z]{3}))FUT$")
+
+SQRT1_2 = math.sqrt(0.5)
+INV_SQRT_2PI = 1.0 / math.sqrt(2 * math.pi)
+
+
+def _erf_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF via Abramowitz-Stegun 7.1.26 (|error| < 1.5e-7)."""
+    z = np.abs(x) * SQRT1_2
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = ((((1.061405429 * t - 1.453152027) * t + 1.421413741) * t - 0.284496736) * t + 0.254829592) * t
+    y = poly * np.exp(-z * z)
+    return np.where(x >= 0, 1.0 - 0.5 * y, 0.5 * y)
+
+
+if norm_cdf is None:
+    norm_cdf = _erf_cdf
+
+
+def _cdf_into(x: np.ndarray, out: np.ndarray, z: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """_erf_cdf(x) written into `out` using preallocated buffers (the scenario-grid hot loop)."""
+    if norm_cdf is not _erf_cdf:
+        out[...] = norm_cdf(x)
+        return out
+    np.abs(x, out=z)
+    z *= SQRT1_2
+    np.multiply(z, 0.3275911, out=out)
+    out += 1.0
+    np.reciprocal(out, out=out)
+    np.multiply(out, 1.061405429, out=scratch)
+    scratch -= 1.453152027
+    scratch *= out
+    scratch += 1.421413741
+    scratch *= out
+    scratch -= 0.284496736
+    scratch *= out
+    scratch += 0.254829592
+    scratch *= out
+    np.square(z, out=z)
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    scratch *= z
+    # 0.5 + sign(x) * (0.5 - 0.5 * y)
+    np.multiply(scratch, -0.5, out=out)
+    out += 0.5
+    np.copysign(out, x, out=out)
+    out += 0.5
+    return out
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+class Contract(NamedTuple):
+    underlying: str
+    expiry: datetime
+    strike: float  # 0.0 for futures
+    kind: str  # "CE", "PE" or "FUT"
+
+
+def monthly_expiry(year: int, month: int) -> date:
+    """Last MONTHLY_EXPIRY_WEEKDAY of the month, moved earlier past exchange holidays."""
+    day = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1))
+    day -= timedelta(days=(day.weekday() - MONTHLY_EXPIRY_WEEKDAY) % 7)
+    while day.weekday() >= 5 or day.isoformat() in HOLIDAYS:
+        day -= timedelta(days=1)
+    return day
+
+
+def _expiry(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, *EXPIRY_TIME, tzinfo=IST)
+
+
+def _parse_date(value) -> Optional[date]:
+    """Date of an expiry given as epoch seconds/milliseconds, ISO text or exchange-style text (28-NOV-2024)."""
+    text = str(value).strip()
+    if text.replace(".", "", 1).isdigit():
+        seconds = float(text)
+        return datetime.fromtimestamp(seconds / 1000 if seconds > 1e11 else seconds, IST).date()
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+    for fmt in ("%d-%b-%Y", "%d%b%Y", "%d-%m-%Y", "%d %b %Y", "%d-%b-%Y %H:%M:%S", "%d%b%y"):
+        try:
+            return datetime.strptime(text.title(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_contract(symbol: str, row: Optional[dict] = None) -> Optional[Contract]:
+    """Contract of an F&O trading symbol (or of a row's strike/expiry/optionType fields), else None."""
+    symbol = str(symbol or "").upper().replace(" ", "")
+    if row:
+        strike, expiry, kind = (_first(row, STRIKE_FIELDS), _first(row, EXPIRY_FIELDS),
+                                str(_first(row, OPTION_TYPE_FIELDS) or "").upper())
+        day = _parse_date(expiry) if expiry not in (None, "") else None
+        if day is not None and kind in ("CE", "PE") and strike not in (None, ""):
+            underlying = str(row.get("underlying") or row.get("name") or re.match(r"[A-Z&-]*", symbol).group())
+            return Contract(underlying, _expiry(day), float(strike), kind)
+    match = _BROKER.match(symbol)
+    if match and match["m"] in MONTHS:
+        day = date(2000 + int(match["y"]), MONTHS[match["m"]], int(match["d"]))
+        return Contract(match["u"], _expiry(day), float(match["s"]), match["k"] + "E")
+    match = _WEEKLY.match(symbol)
+    if match:
+        day = date(2000 + int(match["y"]), WEEKLY_MONTHS[match["m"]], int(match["d"]))
+        return Contract(match["u"], _expiry(day), float(match["s"]), match["k"])
+    match = _MONTHLY.match(symbol)
+    if match and match["m"] in MONTHS:
+        day = monthly_expiry(2000 + int(match["y"]), MONTHS[match["m"]])
+        return Contract(match["u"], _expiry(day), float(match["s"]), match["k"])
+    match = _FUTURE.match(symbol)
+    if match:
+        if match["d"] and match["m"] in MONTHS:
+            day = date(2000 + int(match["y"]), MONTHS[match["m"]], int(match["d"]))
+        elif match["m2"] in MONTHS:
+            day = monthly_expiry(2000 + int(match["y2"]), MONTHS[match["m2"]])
+        else:
+            return None
+        return Contract(match["u"], _expiry(day), 0.0, "FUT")
+    return None
+
+
+def _first(row: dict, names: Sequence[str]):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _d1(spot, strike, years, vol, rate):
+    vol_sqrt = vol * np.sqrt(years)
+    return (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / vol_sqrt, vol_sqrt
+
+
+def call_price(spot, strike, years, vol, rate: float = RISK_FREE_RATE) -> np.ndarray:
+    d1, vol_sqrt = _d1(spot, strike, years, vol, rate)
+    return spot * norm_cdf(d1) - strike * np.exp(-rate * years) * norm_cdf(d1 - vol_sqrt)
+
+
+def option_price(spot, strike, years, vol, is_put, rate: float = RISK_FREE_RATE) -> np.ndarray:
+    """Black-Scholes value; puts by put-call parity."""
+    return call_price(spot, strike, years, vol, rate) + is_put * (strike * np.exp(-rate * years) - spot)
+
+
+def greeks(spot, strike, years, vol, is_put, rate: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """Per-unit delta, gamma, vega (per vol point), theta (per calendar day) and rho (per rate point)."""
+    sqrt_t = np.sqrt(years)
+    d1, vol_sqrt = _d1(spot, strike, years, vol, rate)
+    cdf1, cdf2, pdf1 = norm_cdf(d1), norm_cdf(d1 - vol_sqrt), norm_pdf(d1)
+    discounted = strike * np.exp(-rate * years)
+    call_theta = -spot * pdf1 * vol / (2 * sqrt_t) - rate * discounted * cdf2
+    return {
+        "price": spot * cdf1 - discounted * cdf2 + is_put * (discounted - spot),
+        "delta": cdf1 - is_put,
+        "gamma": pdf1 / (spot * vol_sqrt),
+        "vega": spot * pdf1 * sqrt_t / 100,
+        "theta": (call_theta + is_put * rate * discounted) / DAYS_PER_YEAR,
+        "rho": (years * discounted * cdf2 - is_put * years * discounted) / 100,
+    }
+
+
+def implied_vol(price, spot, strike, years, is_put, rate: float = RISK_FREE_RATE) -> np.ndarray:
+    """Implied volatility by bracketed Newton iteration over all options at once; NaN where the
+    price is outside the no-arbitrage bounds."""
+    price, spot, strike, years = (np.asarray(a, dtype=float) for a in (price, spot, strike, years))
+    discounted = strike * np.exp(-rate * years)
+    target = price + is_put * (spot - discounted)  # as a call
+    valid = (target > np.maximum(spot - discounted, 0.0) + 1e-12) & (target < spot)
+    lo, hi = np.full(price.shape, IV_BOUNDS[0]), np.full(price.shape, IV_BOUNDS[1])
+    vol = np.clip(np.sqrt(2 * math.pi / years) * target / spot, lo, hi)  # Brenner-Subrahmanyam
+    for _ in range(IV_ITERATIONS):
+        d1, vol_sqrt = _d1(spot, strike, years, vol, rate)
+        diff = spot * norm_cdf(d1) - discounted * norm_cdf(d1 - vol_sqrt) - target
+        if np.all(np.abs(diff[valid]) < IV_TOLERANCE):
+            break
+        hi = np.where(diff > 0, vol, hi)
+        lo = np.where(diff > 0, lo, vol)
+        vega = spot * norm_pdf(d1) * np.sqrt(years)
+        step = vol - diff / np.maximum(vega, 1e-12)
+        vol = np.where((step > lo) & (step < hi), step, 0.5 * (lo + hi))
+    return np.where(valid, vol, np.nan)
+
+
+class OptionBook:
+    """F&O legs of a positions list as parallel arrays.
+
+    `spots` maps underlying to spot price; missing ones come from put-call parity on a call/put
+    pair of the same strike and expiry (nearest expiry first), else from the nearest future. Legs whose underlying has
+    no price, and rows that are not F&O contracts, are listed in `skipped`.
+    """
+
+    def __init__(self, rows: Iterable[dict], spots: Optional[Dict[str, float]] = None,
+                 now: Optional[datetime] = None, rate: float = RISK_FREE_RATE, default_vol: float = DEFAULT_VOL):
+        self.rate = rate
+        self.now = (now or datetime.now(IST)).astimezone(IST)
+        self.skipped: List[dict] = []
+        legs = []
+        for row in rows:
+            symbol = _first(row, SYMBOL_FIELDS)
+            qty = float(_first(row, QTY_FIELDS) or 0)
+            if not qty:
+                continue
+            contract = parse_contract(symbol, row)
+            if contract is None:
+                self.skipped.append({"symbol": symbol, "reason": "not an F&O contract"})
+                continue
+            ltp = float(_first(row, LTP_FIELDS) or 0)
+            avg = float(_first(row, AVG_FIELDS) or ltp)
+            legs.append((str(symbol), contract, qty, ltp, avg))
+        self.spots = self._spots(legs, dict(spots or {}))
+        priced = []
+        for leg in legs:
+            if leg[1].underlying in self.spots:
+                priced.append(leg)
+            else:
+                self.skipped.append({"symbol": leg[0], "reason": f"no spot price for {leg[1].underlying}"})
+        self.underlyings = sorted({leg[1].underlying for leg in priced})
+        index = {u: i for i, u in enumerate(self.underlyings)}
+        self.symbols = [leg[0] for leg in priced]
+        self.contracts = [leg[1] for leg in priced]
+        self.underlying = np.array([index[c.underlying] for c in self.contracts], dtype=np.intp)
+        self.spot = np.array([self.spots[u] for u in self.underlyings], dtype=float)
+        self.strike = np.array([c.strike for c in self.contracts], dtype=float)
+        self.years = np.array([max((c.expiry - self.now).total_seconds() / 86400 / DAYS_PER_YEAR, MIN_YEARS)
+                               for c in self.contracts], dtype=float)
+        self.is_put = np.array([c.kind == "PE" for c in self.contracts], dtype=float)
+        self.is_future = np.array([c.kind == "FUT" for c in self.contracts], dtype=bool)
+        self.qty = np.array([leg[2] for leg in priced], dtype=float)
+        self.ltp = np.array([leg[3] for leg in priced], dtype=float)
+        self.avg = np.array([leg[4] for leg in priced], dtype=float)
+        self.vol = np.full(len(priced), np.nan)
+        options = ~self.is_future
+        if options.any():
+            self.vol[options] = implied_vol(self.ltp[options], self.spot[self.underlying[options]],
+                                            self.strike[options], self.years[options], self.is_put[options], rate)
+        self.vol_fallback = options & np.isnan(self.vol)
+        self.vol[self.vol_fallback] = default_vol
+        # Futures track the underlying at their current basis.
+        self.basis = np.where(self.is_future, self.ltp / self.spot[self.underlying], 1.0)
+
+    def _spots(self, legs, given: Dict[str, float]) -> Dict[str, float]:
+        """`given` spots, then put-call parity on a CE/PE pair, then the nearest future discounted to spot."""
+        pairs: Dict[tuple, dict] = {}
+        futures: Dict[str, tuple] = {}
+        for _, contract, _, ltp, _ in legs:
+            if contract.underlying in given or not ltp:
+                continue
+            years = max((contract.expiry - self.now).total_seconds() / 86400 / DAYS_PER_YEAR, MIN_YEARS)
+            if contract.kind == "FUT":
+                futures[contract.underlying] = min(futures.get(contract.underlying, (years, ltp)), (years, ltp))
+            else:
+                pairs.setdefault((contract.underlying, years, contract.strike), {})[contract.kind] = ltp
+        spots = dict(given)
+        for (underlying, years, strike), prices in sorted(pairs.items()):
+            if underlying not in spots and len(prices) == 2:
+                spots[underlying] = prices["CE"] - prices["PE"] + strike * math.exp(-self.rate * years)
+        for underlying, (years, ltp) in futures.items():
+            spots.setdefault(underlying, ltp * math.exp(-self.rate * years))
+        return spots
+
+    def __len__(self):
+        return len(self.qty)
+
+    def leg_greeks(self) -> Dict[str, np.ndarray]:
+        """Per-unit Greeks of every leg (futures: price = ltp, delta = basis, others 0)."""
+        opt = ~self.is_future
+        values = {name: np.zeros(len(self)) for name in ("price", "delta", "gamma", "vega", "theta", "rho")}
+        for name, value in greeks(self.spot[self.underlying[opt]], self.strike[opt], self.years[opt], self.vol[opt],
+                                  self.is_put[opt], self.rate).items():
+            values[name][opt] = value
+        values["price"][self.is_future] = self.ltp[self.is_future]
+        values["delta"][self.is_future] = self.basis[self.is_future]
+        return values
+
+    def summary(self, include_legs: bool = False) -> dict:
+        values = self.leg_greeks()
+        spot = self.spot[self.underlying]
+        position = {name: self.qty * values[name] for name in ("delta", "gamma", "vega", "theta", "rho")}
+        position["delta_notional"] = position["delta"] * spot
+        position["gamma_1pct"] = position["gamma"] * (0.01 * spot) ** 2 / 2  # P&L from gamma on a 1% move
+        position["value"] = self.qty * self.ltp
+        position["unrealized"] = self.qty * (self.ltp - self.avg)
+        underlyings = {}
+        for i, underlying in enumerate(self.underlyings):
+            mask = self.underlying == i
+            underlyings[underlying] = {"spot": round(float(self.spot[i]), 4), "legs": int(mask.sum()),
+                                       **{name: round(float(v[mask].sum()), 4) for name, v in position.items()}}
+        data = {
+            "underlyings": underlyings,
+            "totals": {name: round(float(position[name].sum()), 4)
+                       for name in ("delta_notional", "vega", "theta", "rho", "value", "unrealized")},
+            "legs": len(self), "iv_fallback_legs": int(self.vol_fallback.sum()),
+            "as_of": self.now.isoformat(timespec="seconds"), "rate": self.rate, "skipped": self.skipped,
+        }
+        if include_legs:
+            data["leg_details"] = [{
+                "symbol": self.symbols[i], "underlying": self.contracts[i].underlying,
+                "kind": self.contracts[i].kind, "strike": self.contracts[i].strike,
+                "expiry": self.contracts[i].expiry.date().isoformat(), "days": round(float(self.years[i]) * DAYS_PER_YEAR, 3),
+                "qty": float(self.qty[i]), "ltp": float(self.ltp[i]),
+                "iv": None if self.is_future[i] else round(float(self.vol[i]), 5),
+                **{name: round(float(values[name][i]), 6) for name in ("price", "delta", "gamma", "vega", "theta")},
+            } for i in range(len(self))]
+        return data
+
+    def scenarios(self, price_shifts: Sequence[float], vol_shifts: Sequence[float] = (0.0,),
+                  days: Sequence[float] = (0.0,)) -> np.ndarray:
+        """Book P&L against current prices, shape (underlyings, days, vol shifts, price shifts).
+
+        `price_shifts` are fractional moves of every underlying (0.01 = +1%), `vol_shifts` absolute
+        changes of each leg's volatility (0.01 = +1 vol point), `days` calendar days forward.
+        """
+        shifts = 1.0 + np.asarray(price_shifts, dtype=float)
+        log_shifts = np.log(shifts)
+        n_under, n_price = len(self.underlyings), len(shifts)
+        result = np.zeros((n_under, len(days), len(vol_shifts), n_price))
+        if not len(self):
+            return result
+        legs = np.arange(len(self))
+        weights = np.zeros((n_under, len(self)))
+        weights[self.underlying, legs] = self.qty
+        spot = self.spot[self.underlying]
+        current = weights @ self.ltp
+        # Linear parts: futures at their basis, and the K*exp(-rT) - S parity term of puts.
+        futures_value = weights @ (self.basis * self.is_future * spot)
+        put_weights = weights * self.is_put
+        put_spot = put_weights @ spot
+
+        # Legs in the same contract (same strike, expiry and volatility) are priced once.
+        opt = ~self.is_future
+        keys = np.stack([self.underlying[opt], self.strike[opt], self.years[opt], self.vol[opt]], axis=1)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        under, strike, years_now, vol_now = unique[:, 0].astype(np.intp), unique[:, 1], unique[:, 2], unique[:, 3]
+        u_weights = np.zeros((n_under, len(unique)))
+        np.add.at(u_weights, (self.underlying[opt], inverse.ravel()), self.qty[opt])
+        u_spot = self.spot[under]
+        spot_weights = u_weights * u_spot
+        log_moneyness = np.log(u_spot / strike)
+
+        chunk = max(1, CHUNK_ELEMENTS // max(1, len(unique)))
+        d1 = np.empty((len(unique), min(chunk, n_price)))
+        buffers = (np.empty_like(d1), np.empty_like(d1), np.empty_like(d1))
+        for d, forward in enumerate(days):
+            years = np.maximum(self.years - forward / DAYS_PER_YEAR, MIN_YEARS)
+            linear = (put_weights @ (self.strike * np.exp(-self.rate * years)))[:, None] + \
+                (futures_value - put_spot)[:, None] * shifts - current[:, None]
+            u_years = np.maximum(years_now - forward / DAYS_PER_YEAR, MIN_YEARS)
+            discount_weights = u_weights * (strike * np.exp(-self.rate * u_years))
+            for v, shift in enumerate(vol_shifts):
+                vol = np.maximum(vol_now + shift, IV_BOUNDS[0])
+                vol_sqrt = (vol * np.sqrt(u_years))[:, None]
+                base = (log_moneyness + (self.rate + 0.5 * vol * vol) * u_years)[:, None]
+                out = result[:, d, v, :]
+                for start in range(0, n_price, chunk):
+                    stop = min(n_price, start + chunk)
+                    block = d1[:, :stop - start]
+                    np.add(base, log_shifts[start:stop], out=block)
+                    block /= vol_sqrt
+                    cdf1 = _cdf_into(block, *(b[:, :stop - start] for b in buffers))
+                    out[:, start:stop] = (spot_weights @ cdf1) * shifts[start:stop]
+                    block -= vol_sqrt
+                    out[:, start:stop] -= discount_weights @ _cdf_into(block, *(b[:, :stop - start] for b in buffers))
+                out += linear
+        return result
+
+    def scenario_report(self, price_shifts_pct: Sequence[float], vol_shifts: Sequence[float],
+                        days: Sequence[float]) -> dict:
+        """JSON-ready scenario P&L grids ([day][vol][price], shifts in % and vol points), their
+        worst and best cells across the book, and the expiry payoff over the same price moves."""
+        shifts = [p / 100 for p in price_shifts_pct]
+        grid = self.scenarios(shifts, [v / 100 for v in vol_shifts], days).round(2)
+        total = grid.sum(axis=0)
+
+        def cell(index):
+            d, v, p = np.unravel_index(index, total.shape)
+            return {"pnl": float(total[d, v, p]), "day": days[d], "vol_shift": vol_shifts[v],
+                    "price_shift_pct": price_shifts_pct[p]}
+
+        payoff = self.expiry_payoff(shifts).round(2)
+        return {
+            "scenarios": {
+                "price_shifts_pct": list(price_shifts_pct), "vol_shifts": list(vol_shifts), "days": list(days),
+                "pnl": {u: grid[i].tolist() for i, u in enumerate(self.underlyings)}, "total": total.tolist(),
+                "worst": cell(total.argmin()), "best": cell(total.argmax()),
+            },
+            "expiry_payoff": {u: payoff[i].tolist() for i, u in enumerate(self.underlyings)},
+        }
+
+    def expiry_payoff(self, price_shifts: Sequence[float]) -> np.ndarray:
+        """P&L at expiry against average cost per underlying, shape (underlyings, price shifts)."""
+        if not len(self):
+            return np.zeros((0, len(price_shifts)))
+        prices = self.spot[self.underlying][:, None] * (1.0 + np.asarray(price_shifts, dtype=float))
+        strike = self.strike[:, None]
+        intrinsic = np.where(self.is_put[:, None] > 0, np.maximum(strike - prices, 0.0), np.maximum(prices - strike, 0.0))
+        value = np.where(self.is_future[:, None], prices * self.basis[:, None], intrinsic)
+        weights = np.zeros((len(self.underlyings), len(self)))
+        weights[self.underlying, np.arange(len(self))] = self.qty
+        return weights @ (value - self.avg[:, None])
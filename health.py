@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from logger import get_logger
+
+FAILURE_THRESHOLD = int(os.getenv("ALICE_BREAKER_FAILURES", "5"))
+SLOW_CALL_SECONDS = float(os.getenv("ALICE_BREAKER_SLOW_SECONDS", "5"))
+COOLDOWN_SECONDS = float(os.getenv("ALICE_BREAKER_COOLDOWN", "30"))
+HEARTBEAT_SECONDS = float(os.getenv("ALICE_HEARTBEAT_SECONDS", "60"))
+PREWARM_CONNECTIONS = int(os.getenv("ALICE_PREWARM_CONNECTIONS", "4"))
+PREMARKET_WARMUP = (9, 0)  # IST, ahead of the 09:15 open
+IST = timezone(timedelta(hours=5, minutes=30))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+log = get_logger("health")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Trips after consecutive errors or slow calls; lets one trial call through after a cooldown."""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 slow_call_seconds: float = SLOW_CALL_SECONDS, cooldown: float = COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.errors = 0
+        self.last_error = None
+        self.opened_at = 0.0
+        self.latencies = deque(maxlen=100)
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError(f"Broker endpoint {self.name} is unavailable (circuit open, "
+                               f"retry in {self.retry_in():.0f}s): {self.last_error}")
+
+    def record(self, seconds: float, ok: bool, error: Optional[str] = None):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(seconds)
+            if ok and seconds <= self.slow_call_seconds:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    log.info("circuit closed", extra={"endpoint": self.name})
+                self.state = CLOSED
+                self._trial_in_flight = False
+                return
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.last_error = error or f"slow call {seconds:.2f}s"
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    log.warning("circuit opened", extra={"endpoint": self.name, "error": self.last_error})
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release(self):
+        """End a call that says nothing about the endpoint's health without recording it."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == OPEN else 0.0
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+        return {
+            "state": self.state, "calls": self.calls, "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures, "retry_in_s": round(self.retry_in(), 1),
+            "last_ms": round(self.latencies[-1] * 1000, 1) if self.latencies else None,
+            "p50_ms": pct(0.5), "p95_ms": pct(0.95), "last_error": self.last_error,
+        }
+
+
+class Breakers:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+        return breaker
+
+    def snapshot(self) -> dict:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+
+breakers = Breakers()
+
+
+def _next_premarket(now: datetime) -> datetime:
+    hour, minute = PREMARKET_WARMUP
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class HealthMonitor:
+    """Background thread that pre-warms pooled connections and keeps the broker session alive.
+
+    Connections are warmed at start and again before the market opens; a get_profile heartbeat
+    runs every `interval` seconds while a live session exists.
+    """
+
+    def __init__(self, get_client: Callable, session, base_url: str, is_live: Callable[[], bool] = lambda: True,
+                 interval: float = HEARTBEAT_SECONDS):
+        self._get_client = get_client
+        self._session = session
+        self._base_url = base_url
+        self._is_live = is_live
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.state = {"session": "unknown", "last_heartbeat": None, "last_heartbeat_ms": None,
+                      "last_prewarm": None, "heartbeat_error": None}
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="broker-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.prewarm()
+        premarket = _next_premarket(datetime.now(IST))
+        while True:
+            wait = min(self.interval, max((premarket - datetime.now(IST)).total_seconds(), 0))
+            if self._stop.wait(wait):
+                return
+            if datetime.now(IST) >= premarket:
+                self.prewarm()
+                premarket = _next_premarket(datetime.now(IST))
+            self.heartbeat()
+
+    def prewarm(self):
+        """Open PREWARM_CONNECTIONS pooled connections (DNS, TCP and TLS) ahead of real calls."""
+        if not self._is_live():
+            return
+
+        def touch(_):
+            try:
+                self._session.head(self._base_url, timeout=5)
+            except Exception as e:
+                return str(e)
+        with ThreadPoolExecutor(PREWARM_CONNECTIONS) as pool:
+            errors = [e for e in pool.map(touch, range(PREWARM_CONNECTIONS)) if e]
+        self.state["last_prewarm"] = time.time()
+        log.info("connections pre-warmed", extra={"connections": PREWARM_CONNECTIONS, "errors": len(errors)})
+
+    def heartbeat(self):
+        client = self._get_client()
+        if client is None or not client.headers:
+            self.state["session"] = "none"
+            return
+        started = time.perf_counter()
+        try:
+            client.get_profile()
+            self.state.update(session="active", heartbeat_error=None)
+        except CircuitOpenError as e:
+            self.state.update(session="unknown", heartbeat_error=str(e))
+        except Exception as e:
+            expired = " 401" in str(e) or " 403" in str(e)
+            self.state.update(session="expired" if expired else "error", heartbeat_error=str(e))
+            log.warning("heartbeat failed", extra={"error": str(e)})
+        self.state["last_heartbeat"] = time.time()
+        self.state["last_heartbeat_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def status(self) -> dict:
+        return dict(self.state, running=bool(self._thread and self._thread.is_alive()), interval_s=self.interval)
@@ -0,0 +1,133 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+import contextvars
+from typing import Optional
+
+LOGGER_NAME = "aliceblue"
+LOG_LEVEL = os.getenv("ALICE_LOG_LEVEL", "INFO").upper()
+DEBUG_SAMPLE_RATE = float(os.getenv("ALICE_LOG_SAMPLE_RATE", "0.1"))
+
+correlation_id = contextvars.ContextVar("correlation_id", default="-")
+
+_SECRET_PATTERNS = [
+    (re.compile(r"(Bearer\s+)[^\s'\",}]+", re.IGNORECASE), r"\1***"),
+    (re.compile(r"((?:api_secret|apiSecret|checkSum|userSession|authCode|session_id)['\"]?\s*[:=]\s*['\"]?)[^'\",\s}&]+",
+                re.IGNORECASE), r"\1***"),
+]
+# Replaced (never mutated) under the lock, so the log listener thread can iterate it safely.
+_known_secrets = frozenset()
+_secrets_lock = threading.Lock()
+_listener = None
+
+# Attributes every LogRecord carries; anything else was passed through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id"}
+
+
+def register_secret(value: Optional[str]):
+    """Redact this literal value (api secret, session token) from every log line."""
+    global _known_secrets
+    if value and len(value) >= 6 and value not in _known_secrets:
+        with _secrets_lock:
+            _known_secrets = _known_secrets | {value}
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    for secret in _known_secrets:
+        if secret in text:
+            text = text.replace(secret, "***")
+    return text
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamps the current tool call's correlation ID on the record."""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, secrets redacted after serialisation."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "cid": getattr(record, "correlation_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return redact(json.dumps(entry, default=str))
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """Route the `aliceblue` logger through a queue so callers never block on I/O.
+
+    Output goes to stderr: stdout belongs to the MCP stdio transport.
+    """
+    global _listener
+    log = logging.getLogger(LOGGER_NAME)
+    log.setLevel(level)
+    if _listener:
+        return log
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+    log.addHandler(queue_handler)
+    log.propagate = False
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return log
+
+
+def get_logger(name: str = "") -> logging.Logger:
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def new_correlation_id() -> contextvars.Token:
+    return correlation_id.set(uuid.uuid4().hex[:12])
+
+
+_http_log = get_logger("http")
+
+
+def log_http(method: str, url: str, res, started: float):
+    """Sampled debug line with request/response sizes and timing."""
+    if not _http_log.isEnabledFor(logging.DEBUG) or random.random() >= DEBUG_SAMPLE_RATE:
+        return
+    request_body = res.request.body if res.request is not None else None
+    _http_log.debug(
+        "http call",
+        extra={
+            "method": method,
+            "path": url.split("://", 1)[-1].split("/", 1)[-1],
+            "status": res.status_code,
+            "req_bytes": len(request_body) if request_body else 0,
+            "resp_bytes": len(res.content),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    )
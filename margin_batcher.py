@@ -0,0 +1,112 @@
+import os
+import copy
+import time
+import asyncio
+from typing import Callable, Dict, Hashable, List, Optional
+
+from logger import get_logger
+
+BATCH_WINDOW = float(os.getenv("ALICE_MARGIN_BATCH_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("ALICE_MARGIN_MAX_BATCH", "50"))
+MEMO_TTL = float(os.getenv("ALICE_MARGIN_MEMO_TTL", "2"))
+
+log = get_logger("margin")
+
+
+class MarginBatcher:
+    """Coalesces margin checks arriving within a few milliseconds into one checkMargin call.
+
+    `fetch` is a blocking callable taking a list of normalized checkMargin items and returning
+    one response per item; it runs in a worker thread. Identical items share one slot in the
+    batch and recent answers are memoized for `memo_ttl` seconds. `scope` returns what the
+    answer depends on besides the item (account, session, trading mode); it is part of every
+    key, so a memoized answer is never served across accounts or modes. Each caller gets its
+    own copy of the response.
+    """
+
+    def __init__(self, fetch: Callable[[List[dict]], List[dict]], window: float = BATCH_WINDOW,
+                 max_batch: int = MAX_BATCH, memo_ttl: float = MEMO_TTL,
+                 scope: Optional[Callable[[], Hashable]] = None):
+        self._fetch = fetch
+        self._scope = scope or (lambda: None)
+        self.window = window
+        self.max_batch = max_batch
+        self.memo_ttl = memo_ttl
+        self._pending: Dict[tuple, tuple] = {}
+        self._flush_handle = None
+        self._memo: Dict[tuple, tuple] = {}
+        self.stats = {"requests": 0, "memo_hits": 0, "coalesced": 0, "broker_calls": 0,
+                      "batched_items": 0, "broker_seconds": 0.0}
+
+    def key(self, item: dict) -> tuple:
+        return (self._scope(),) + tuple(sorted((k, str(v)) for k, v in item.items()))
+
+    async def submit(self, item: dict):
+        self.stats["requests"] += 1
+        key = self.key(item)
+        memo = self._memo.get(key)
+        if memo and memo[0] > time.monotonic():
+            self.stats["memo_hits"] += 1
+            return copy.deepcopy(memo[1])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+            self._pending[key][1].append(future)
+        else:
+            self._pending[key] = (item, [future])
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: Dict[tuple, tuple]):
+        keys = list(batch)
+        started = time.perf_counter()
+        try:
+            responses = await asyncio.to_thread(self._fetch, [batch[k][0] for k in keys])
+        except Exception as e:
+            for key in keys:
+                for future in batch[key][1]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        finally:
+            self.stats["broker_calls"] += 1
+            self.stats["batched_items"] += len(keys)
+            self.stats["broker_seconds"] += time.perf_counter() - started
+
+        expires = time.monotonic() + self.memo_ttl
+        for key, response in zip(keys, responses):
+            self._memo[key] = (expires, response)
+            for future in batch[key][1]:
+                if not future.done():
+                    future.set_result(copy.deepcopy(response))
+        if len(self._memo) > 10 * self.max_batch:
+            now = time.monotonic()
+            self._memo = {k: v for k, v in self._memo.items() if v[0] > now}
+        log.debug("margin batch", extra={"items": len(keys), "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+    def metrics(self) -> dict:
+        stats = self.stats
+        calls = stats["broker_calls"]
+        avg_call = stats["broker_seconds"] / calls if calls else 0.0
+        saved_calls = stats["requests"] - calls
+        return {
+            **{k: v for k, v in stats.items() if k != "broker_seconds"},
+            "batching_factor": round(stats["batched_items"] / calls, 2) if calls else 0.0,
+            "avg_broker_call_ms": round(avg_call * 1000, 2),
+            "broker_calls_saved": saved_calls,
+            "estimated_latency_saved_ms": round(saved_calls * avg_call * 1000, 2),
+        }
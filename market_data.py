@@ -0,0 +1,210 @@
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from logger import get_logger
+from validation import CANDLES, QUOTE, validated
+
+CACHE_DIR = os.getenv("ALICE_CANDLE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".candle_cache"))
+QUOTE_TTL = float(os.getenv("ALICE_QUOTE_TTL", "1"))
+IST = timezone(timedelta(hours=5, minutes=30))
+IST_OFFSET = 19800
+
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "volume")
+CANDLE_DTYPE = np.dtype([("time", "i8"), ("open", "f8"), ("high", "f8"), ("low", "f8"),
+                         ("close", "f8"), ("volume", "f8")])
+
+log = get_logger("market_data")
+
+
+def parse_time(value) -> int:
+    """Epoch seconds from an epoch number or an IST "YYYY-MM-DD[ HH:MM[:SS]]" string."""
+    if isinstance(value, (int, float)):
+        return int(value / 1000) if value > 1e11 else int(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return parse_time(int(text))
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(text, fmt).replace(tzinfo=IST).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {value}")
+
+
+def parse_candles(data) -> np.ndarray:
+    """Broker chart-history payload -> structured candle array sorted by time.
+
+    Raises on a broker error envelope, so a failed fetch is never mistaken for a day without candles.
+    """
+    rows = data
+    if isinstance(data, dict):
+        status = str(data.get("status", data.get("stat", "Ok"))).lower()
+        if status not in ("ok", "success"):
+            raise Exception(f"Candle fetch failed: {data.get('emsg') or data.get('message') or data}")
+        rows = data.get("result") or data.get("data") or []
+    if not isinstance(rows, list):
+        rows = []
+    candles = np.empty(len(rows), dtype=CANDLE_DTYPE)
+    for i, row in enumerate(rows):
+        if isinstance(row, dict):
+            candles[i] = (parse_time(row["time"]), row["open"], row["high"], row["low"], row["close"],
+                          row.get("volume", 0) or 0)
+        else:
+            candles[i] = (parse_time(row[0]), *row[1:6])
+    candles.sort(order="time")
+    return candles
+
+
+def day_of(ts: int) -> date:
+    return datetime.fromtimestamp(ts, IST).date()
+
+
+def day_start(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=IST).timestamp())
+
+
+class CandleCache:
+    """On-disk candle cache: one .npy file per instrument, resolution and IST trading day.
+
+    Files are memory-mapped on read, so repeated queries are served from the page cache.
+    Missing days are always fetched through to the end of the day (or now), and a day is only
+    written as complete once a fetch covered all of it; until then it lives in a ".part" file
+    that later queries top up from its last candle.
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+
+    def _path(self, exchange: str, token: str, resolution: str, day: date, complete: bool = True) -> str:
+        name = f"{day.isoformat()}.npy" if complete else f"{day.isoformat()}.part.npy"
+        return os.path.join(self.root, f"{exchange.upper()}_{token}", str(resolution).upper(), name)
+
+    def load_day(self, exchange: str, token: str, resolution: str, day: date) -> Tuple[Optional[np.ndarray], bool]:
+        """(candles, complete) for a cached day; (None, False) when nothing is cached."""
+        for complete in (True, False):
+            path = self._path(exchange, token, resolution, day, complete)
+            if not os.path.exists(path):
+                continue
+            try:
+                return np.load(path, mmap_mode="r"), complete
+            except ValueError:
+                # Empty partitions (holidays) cannot be memory-mapped.
+                return np.load(path), complete
+        return None, False
+
+    def save_day(self, exchange: str, token: str, resolution: str, day: date, candles: np.ndarray,
+                 complete: bool = True):
+        path = self._path(exchange, token, resolution, day, complete)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(candles, dtype=CANDLE_DTYPE))
+        os.replace(tmp, path)
+        if complete:
+            try:
+                os.remove(self._path(exchange, token, resolution, day, complete=False))
+            except FileNotFoundError:
+                pass
+
+    def get_candles(self, fetch: Callable[[str, str, str, int, int], np.ndarray], exchange: str, token: str,
+                    resolution: str, start: int, end: int) -> np.ndarray:
+        """Candles in [start, end] epoch seconds, fetching only the days missing from disk."""
+        now = int(time.time())
+        end = min(end, now)
+        if end < start:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        first, last = day_of(start), day_of(end)
+        days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+        frames: Dict[date, np.ndarray] = {}
+        missing: List[date] = []
+        for day in days:
+            cached, complete = self.load_day(exchange, token, resolution, day)
+            if cached is not None:
+                frames[day] = cached
+            if not complete:
+                missing.append(day)
+
+        for run in _consecutive_runs(missing):
+            run_start = day_start(run[0])
+            partial = frames.get(run[0])
+            if partial is not None and len(partial):
+                run_start = int(partial["time"][-1]) + 1
+            # Whole days, whatever the query asked for, so past days can be stored as complete.
+            run_end = min(day_start(run[-1]) + 86399, now)
+            fetched = fetch(exchange, token, resolution, run_start, run_end)
+            log.debug("candle fetch", extra={"token": token, "days": len(run), "rows": len(fetched)})
+            day_ids = (fetched["time"] + IST_OFFSET) // 86400
+            for day in run:
+                rows = fetched[day_ids == (day_start(day) + IST_OFFSET) // 86400]
+                if day in frames and len(frames[day]):
+                    rows = np.concatenate([np.asarray(frames[day]), rows])
+                    rows = rows[np.unique(rows["time"], return_index=True)[1]]
+                self.save_day(exchange, token, resolution, day, rows, complete=day_start(day) + 86399 <= run_end)
+                frames[day] = rows
+
+        candles = np.concatenate([frames[day] for day in days]) if days else np.empty(0, dtype=CANDLE_DTYPE)
+        lo = np.searchsorted(candles["time"], start, side="left")
+        hi = np.searchsorted(candles["time"], end, side="right")
+        return candles[lo:hi]
+
+
+def _consecutive_runs(days: List[date]) -> List[List[date]]:
+    runs: List[List[date]] = []
+    for day in days:
+        if runs and (day - runs[-1][-1]).days == 1:
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
+
+
+class MarketData:
+    """Historical/intraday candles and quotes for an AliceBlue client, backed by CandleCache.
+
+    The cache holds broker data only; while `is_live()` is false (paper trading) candles are
+    fetched without reading or writing it.
+    """
+
+    def __init__(self, get_client: Callable, cache: Optional[CandleCache] = None, quote_ttl: float = QUOTE_TTL,
+                 is_live: Callable[[], bool] = lambda: True):
+        self._get_client = get_client
+        self._is_live = is_live
+        self.cache = cache or CandleCache()
+        self.quote_ttl = quote_ttl
+        self._quotes: Dict[tuple, tuple] = {}
+
+    def _fetch(self, exchange: str, token: str, resolution: str, start: int, end: int) -> np.ndarray:
+        data = self._get_client().get_historical_candles(exchange, token, resolution, start * 1000, end * 1000)
+        return parse_candles(data)
+
+    @validated(CANDLES)
+    def get_candles(self, exchange: str, instrumentId: str, resolution: str, from_time, to_time) -> np.ndarray:
+        start = parse_time(from_time)
+        end = parse_time(to_time)
+        if isinstance(to_time, str) and len(to_time.strip()) == 10 and "-" in to_time:
+            end += 86399
+        exchange, token, resolution = exchange.upper(), str(instrumentId), str(resolution).upper()
+        if not self._is_live():
+            candles = self._fetch(exchange, token, resolution, start, end)
+            return candles[(candles["time"] >= start) & (candles["time"] <= end)]
+        return self.cache.get_candles(self._fetch, exchange, token, resolution, start, end)
+
+    @validated(QUOTE)
+    def get_quote(self, exchange: str, instrumentId: str):
+        key = (exchange.upper(), str(instrumentId))
+        cached = self._quotes.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        quote = self._get_client().get_quote(exchange, instrumentId)
+        self._quotes[key] = (time.monotonic() + self.quote_ttl, quote)
+        return quote
+
+
+def candles_to_table(candles: np.ndarray) -> dict:
+    """Compact column/row form for tool responses."""
+    return {"columns": list(CANDLE_FIELDS), "rows": candles.tolist(), "count": len(candles)}
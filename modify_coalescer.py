@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+from typing import Callable, Dict, List, Set
+
+from logger import get_logger
+
+BATCH_WINDOW = float(os.getenv("ALICE_MODIFY_BATCH_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("ALICE_MODIFY_MAX_BATCH", "20"))
+# Fields of a modify element that a newer update overrides only when it sets them.
+PRICE_FIELDS = ("quantity", "price", "triggerPrice")
+
+log = get_logger("modify")
+
+
+class ModifyCoalescer:
+    """Debounces and coalesces order modifications, keyed by brokerOrderId.
+
+    Only the latest pending quantity/price/trigger of an order is kept (fields a newer update
+    leaves empty keep their pending value), at most one modify per order is in flight, and the
+    newest value is sent as soon as the previous modify completes, so modifies cannot reach the
+    broker out of order. Pending modifies of different orders go out together in one list-shaped
+    orders/modify call. `send` is a blocking callable taking the list of modify elements and
+    returning one response per element; it runs in a worker thread. Every caller whose update
+    was folded into a sent modify receives that modify's response.
+    """
+
+    def __init__(self, send: Callable[[List[dict]], List[dict]], window: float = BATCH_WINDOW,
+                 max_batch: int = MAX_BATCH):
+        self._send = send
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, tuple] = {}
+        self._in_flight: Set[str] = set()
+        self._flush_handle = None
+        self.stats = {"requests": 0, "coalesced": 0, "broker_calls": 0, "sent_modifies": 0,
+                      "broker_seconds": 0.0}
+
+    async def submit(self, item: dict) -> tuple:
+        """Queue a normalized modify element; returns (broker response, updates coalesced into it)."""
+        self.stats["requests"] += 1
+        order_id = item["brokerOrderId"]
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.get(order_id)
+        if pending is None:
+            self._pending[order_id] = (item, [future])
+        else:
+            self.stats["coalesced"] += 1
+            latest, futures = pending
+            merged = dict(item)
+            for field in PRICE_FIELDS:
+                if merged.get(field) in (None, ""):
+                    merged[field] = latest.get(field, "")
+            futures.append(future)
+            self._pending[order_id] = (merged, futures)
+        self._schedule(len(self._pending) >= self.max_batch)
+        return await future
+
+    def _schedule(self, now: bool = False):
+        if now:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        ready = [order_id for order_id in self._pending if order_id not in self._in_flight][:self.max_batch]
+        if not ready:
+            return
+        batch = {order_id: self._pending.pop(order_id) for order_id in ready}
+        self._in_flight.update(ready)
+        asyncio.get_running_loop().create_task(self._run(batch))
+        if any(order_id not in self._in_flight for order_id in self._pending):
+            self._schedule()
+
+    async def _run(self, batch: Dict[str, tuple]):
+        order_ids = list(batch)
+        started = time.perf_counter()
+        try:
+            responses = await asyncio.to_thread(self._send, [batch[order_id][0] for order_id in order_ids])
+        except Exception as e:
+            for order_id in order_ids:
+                for future in batch[order_id][1]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        finally:
+            self._in_flight.difference_update(order_ids)
+            self.stats["broker_calls"] += 1
+            self.stats["sent_modifies"] += len(order_ids)
+            self.stats["broker_seconds"] += time.perf_counter() - started
+            # Updates that arrived while these were in flight go out now, without another window.
+            if any(order_id in self._pending for order_id in order_ids):
+                self._flush()
+
+        for order_id, response in zip(order_ids, responses):
+            futures = batch[order_id][1]
+            for future in futures:
+                if not future.done():
+                    future.set_result((response, len(futures) - 1))
+        log.debug("modify batch", extra={"orders": len(order_ids),
+                                         "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+    def metrics(self) -> dict:
+        stats = self.stats
+        calls = stats["broker_calls"]
+        return {
+            **{k: v for k, v in stats.items() if k != "broker_seconds"},
+            "pending": len(self._pending), "in_flight": len(self._in_flight),
+            "orders_per_call": round(stats["sent_modifies"] / calls, 2) if calls else 0.0,
+            "avg_broker_call_ms": round(stats["broker_seconds"] / calls * 1000, 2) if calls else 0.0,
+            "broker_calls_saved": stats["requests"] - calls,
+        }
@@ -0,0 +1,614 @@
+"""Paper trading: the AliceBlue method surface on top of an in-memory matching engine.
+
+Agent orders rest in per-instrument books with price-time priority and fill against the
+liquidity of a replayed tick stream (CSV: time,exchange,instrumentId,ltp[,bid,ask,volume]).
+Nothing here touches the network.
+"""
+import os
+import csv
+import time
+import heapq
+import itertools
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from Client import AliceBlue
+from logger import get_logger
+from market_data import parse_time
+from validation import (BROKER_ORDER_ID, CANDLES, EXIT_BRACKET, MARGIN, MODIFY_GTT, MODIFY_ORDER, PLACE_GTT,
+                        PLACE_ORDER, POSITION_CONVERSION, QUOTE, SQUARE_OFF, validated)
+
+PAPER_TICKS = os.getenv("ALICE_PAPER_TICKS")
+PAPER_CASH = float(os.getenv("ALICE_PAPER_CASH", "1000000"))
+MARGIN_RATES = {"CNC": 1.0, "NRML": 0.3, "MIS": 0.2, "CO": 0.1, "BO": 0.1}
+INF = float("inf")
+
+OPEN = "open"
+TRIGGER_PENDING = "trigger pending"
+COMPLETE = "complete"
+CANCELLED = "cancelled"
+REJECTED = "rejected"
+
+log = get_logger("paper")
+
+
+class Tick(NamedTuple):
+    time: float
+    exchange: str
+    token: str
+    ltp: float
+    bid: float
+    ask: float
+    volume: float
+
+
+def read_ticks(path: str) -> Iterator[Tick]:
+    """Ticks from a CSV file; bid/ask default to ltp and a missing volume means unlimited liquidity."""
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#") or row[0] == "time":
+                continue
+            ltp = float(row[3])
+            bid = float(row[4]) if len(row) > 4 and row[4] else ltp
+            ask = float(row[5]) if len(row) > 5 and row[5] else ltp
+            volume = float(row[6]) if len(row) > 6 and row[6] else INF
+            yield Tick(parse_time(row[0]), row[1].upper(), row[2], ltp, bid, ask, volume)
+
+
+class Order:
+    __slots__ = ("id", "exchange", "token", "buy", "qty", "filled", "avg", "order_type", "product", "complexity",
+                 "price", "trigger", "validity", "status", "seq", "time", "history", "parent", "legs",
+                 "sl_leg", "target_leg", "symbol", "message")
+
+    def to_dict(self) -> dict:
+        return {
+            "brokerOrderId": self.id,
+            "instrumentId": self.token,
+            "exchange": self.exchange,
+            "tradingSymbol": self.symbol,
+            "transactionType": "BUY" if self.buy else "SELL",
+            "quantity": self.qty,
+            "filledQuantity": self.filled,
+            "pendingQuantity": self.qty - self.filled if self.status in (OPEN, TRIGGER_PENDING) else 0,
+            "averageTradedPrice": round(self.avg, 4),
+            "orderType": self.order_type,
+            "product": self.product,
+            "orderComplexity": self.complexity,
+            "price": self.price if self.price not in (INF, 0.0) or self.order_type == "LIMIT" else 0.0,
+            "triggerPrice": self.trigger or 0.0,
+            "validity": self.validity,
+            "orderStatus": self.status,
+            "parentOrderId": self.parent,
+            "rejectionReason": self.message,
+            "orderTime": self.time,
+        }
+
+
+class MatchingEngine:
+    """Per-instrument books of resting agent orders, matched against tick liquidity.
+
+    Bids are ordered by (-price, seq) and asks by (price, seq): better price first, then
+    earlier arrival. Cancelled or re-prioritised orders are dropped lazily when they reach
+    the top of the heap. `on_fill(order, qty, price, time)` is called for every execution.
+    """
+
+    def __init__(self, on_fill):
+        self.on_fill = on_fill
+        self.books: Dict[tuple, tuple] = {}
+        self.stops: Dict[tuple, List[Order]] = {}
+        self.quotes: Dict[tuple, Tick] = {}
+        self.liquidity: Dict[tuple, list] = {}
+        self.clock = 0.0
+        self._seq = itertools.count()
+
+    def _book(self, key):
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = ([], [])
+        return book
+
+    def rest(self, order: Order):
+        order.seq = next(self._seq)
+        bids, asks = self._book((order.exchange, order.token))
+        if order.buy:
+            heapq.heappush(bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(asks, (order.price, order.seq, order))
+
+    def submit(self, order: Order):
+        key = (order.exchange, order.token)
+        if order.trigger and order.order_type in ("SL", "SL-M"):
+            order.status = TRIGGER_PENDING
+            order.history[-1] = (TRIGGER_PENDING, order.time, order.filled)
+            quote = self.quotes.get(key)
+            if quote is None or not self._trigger(order, key, quote):
+                self.stops.setdefault(key, []).append(order)
+            return
+        self._match_incoming(order, key)
+        if order.status == OPEN:
+            self.rest(order)
+
+    def _match_incoming(self, order: Order, key):
+        quote = self.quotes.get(key)
+        if quote is None:
+            return
+        budget = self.liquidity[key]
+        side = 1 if order.buy else 0
+        touch = quote.ask if order.buy else quote.bid
+        if budget[side] <= 0 or (order.price < touch if order.buy else order.price > touch):
+            return
+        qty = min(order.qty - order.filled, budget[side])
+        budget[side] -= qty
+        self.on_fill(order, int(qty), touch, self.clock)
+
+    def on_tick(self, tick: Tick):
+        key = (tick.exchange, tick.token)
+        self.quotes[key] = tick
+        self.clock = tick.time
+        budget = self.liquidity[key] = [tick.volume, tick.volume]
+        if key in self.stops:
+            self._trigger_stops(key, tick)
+        book = self.books.get(key)
+        if book is None:
+            return
+        bids, asks = book
+        while bids and budget[1] > 0 and -bids[0][0] >= tick.ask:
+            self._fill_top(bids, budget, 1, tick.ask)
+        while asks and budget[0] > 0 and asks[0][0] <= tick.bid:
+            self._fill_top(asks, budget, 0, tick.bid)
+
+    def _fill_top(self, heap, budget, side, price):
+        order = heap[0][2]
+        if order.status != OPEN or heap[0][1] != order.seq:
+            heapq.heappop(heap)
+            return
+        qty = min(order.qty - order.filled, budget[side])
+        budget[side] -= qty
+        self.on_fill(order, int(qty), price, self.clock)
+        if order.status != OPEN:
+            heapq.heappop(heap)
+
+    def _trigger(self, order: Order, key, tick: Tick) -> bool:
+        """Activate a stop order if the last price has crossed its trigger."""
+        if order.buy and tick.ltp < order.trigger or not order.buy and tick.ltp > order.trigger:
+            return False
+        order.status = OPEN
+        order.history.append((OPEN, self.clock, order.filled))
+        if order.order_type == "SL-M":
+            order.price = INF if order.buy else 0.0
+        self._match_incoming(order, key)
+        if order.status == OPEN:
+            self.rest(order)
+        return True
+
+    def _trigger_stops(self, key, tick: Tick):
+        # Fills can submit new stops (bracket legs) for this instrument while we iterate.
+        pending = self.stops.pop(key)
+        waiting = [order for order in pending
+                   if order.status == TRIGGER_PENDING and not self._trigger(order, key, tick)]
+        self.stops.setdefault(key, []).extend(waiting)
+
+
+class PaperAliceBlue(AliceBlue):
+    """Drop-in replacement for AliceBlue that trades against MatchingEngine."""
+
+    def __init__(self, app_key: str = "paper", api_secret: str = "paper", tick_file: Optional[str] = PAPER_TICKS,
+                 cash: float = PAPER_CASH):
+        super().__init__(app_key, api_secret)
+        self.user_id = "PAPER"
+        self.user_session = "paper-session"
+        self.cash = cash
+        self.engine = MatchingEngine(self._on_fill)
+        self.orders: Dict[str, Order] = {}
+        self.trades: List[dict] = []
+        self.positions: Dict[tuple, list] = {}
+        self.gtt_orders: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._ticks = read_ticks(tick_file) if tick_file else iter(())
+
+    def _request(self, method, url, **kwargs):
+        raise RuntimeError("Paper trading client never calls the broker")
+
+    def authenticate(self):
+        log.info("Paper trading session ready")
+
+    def login_and_get_auth_code(self):
+        pass
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _ok(result) -> dict:
+        return {"status": "Ok", "result": result}
+
+    @staticmethod
+    def _not_ok(message: str) -> dict:
+        return {"status": "Not_Ok", "message": message}
+
+    # -- feed ---------------------------------------------------------------
+
+    def feed(self, tick: Tick):
+        with self._lock:
+            self.engine.on_tick(tick)
+            gtts = [g for g in self.gtt_orders.values()
+                    if g["status"] == "active" and g["key"] == (tick.exchange, tick.token)]
+            for gtt in gtts:
+                self._check_gtt(gtt, tick.ltp)
+
+    def replay(self, count: Optional[int] = None) -> int:
+        """Advance the tick file by `count` ticks (all remaining if None); returns ticks processed."""
+        processed = 0
+        for tick in itertools.islice(self._ticks, count):
+            self.feed(tick)
+            processed += 1
+        return processed
+
+    def _now(self) -> float:
+        return self.engine.clock or time.time()
+
+    def _ltp(self, exchange: str, token: str) -> Optional[float]:
+        quote = self.engine.quotes.get((exchange, token))
+        return quote.ltp if quote else None
+
+    # -- order lifecycle ----------------------------------------------------
+
+    def _new_order(self, token, exchange, buy, qty, order_type, product, complexity, price, trigger, validity,
+                   symbol=None, parent=None) -> Order:
+        order = Order()
+        order.id = str(next(self._ids)).zfill(10)
+        order.exchange = exchange.upper()
+        order.token = str(token)
+        order.buy = buy
+        order.qty = int(qty)
+        order.filled = 0
+        order.avg = 0.0
+        order.order_type = order_type.upper()
+        order.product = product.upper()
+        order.complexity = complexity.upper()
+        order.trigger = float(trigger) if trigger not in (None, "") else 0.0
+        if order.order_type in ("MARKET", "SL-M"):
+            order.price = INF if buy else 0.0
+        else:
+            order.price = float(price)
+        order.validity = validity.upper()
+        order.status = OPEN
+        order.seq = -1
+        order.time = self._now()
+        order.history = [(OPEN, order.time, 0)]
+        order.parent = parent
+        order.legs = None
+        order.sl_leg = order.target_leg = None
+        order.symbol = symbol
+        order.message = None
+        self.orders[order.id] = order
+        return order
+
+    def _set_status(self, order: Order, status: str):
+        order.status = status
+        order.history.append((status, self._now(), order.filled))
+
+    def _on_fill(self, order: Order, qty: int, price: float, when: float):
+        if qty <= 0:
+            return
+        order.avg = (order.avg * order.filled + price * qty) / (order.filled + qty)
+        order.filled += qty
+        if order.filled >= order.qty:
+            self._set_status(order, COMPLETE)
+        self.trades.append({
+            "tradeId": str(len(self.trades) + 1), "brokerOrderId": order.id, "instrumentId": order.token, "exchange": order.exchange,
+            "transactionType": "BUY" if order.buy else "SELL", "product": order.product,
+            "filledQuantity": qty, "tradedPrice": price, "tradeTime": when,
+        })
+        self._update_position(order.exchange, order.token, order.product, qty if order.buy else -qty, price)
+        if order.status == COMPLETE:
+            if order.sl_leg is not None or order.target_leg is not None:
+                self._open_bracket_legs(order)
+            elif order.parent and order.parent in self.orders:
+                for leg_id in self.orders[order.parent].legs or ():
+                    leg = self.orders[leg_id]
+                    if leg is not order and leg.status in (OPEN, TRIGGER_PENDING):
+                        self._set_status(leg, CANCELLED)
+
+    def _update_position(self, exchange, token, product, signed_qty, price):
+        pos = self.positions.get((exchange, token, product))
+        if pos is None:
+            # net qty, avg open price, realized, buy qty, buy value, sell qty, sell value
+            pos = self.positions[(exchange, token, product)] = [0, 0.0, 0.0, 0, 0.0, 0, 0.0]
+        net, avg = pos[0], pos[1]
+        if signed_qty > 0:
+            pos[3] += signed_qty
+            pos[4] += signed_qty * price
+        else:
+            pos[5] -= signed_qty
+            pos[6] -= signed_qty * price
+        if net == 0 or (net > 0) == (signed_qty > 0):
+            pos[1] = (avg * abs(net) + price * abs(signed_qty)) / (abs(net) + abs(signed_qty))
+            pos[0] = net + signed_qty
+            return
+        closed = min(abs(net), abs(signed_qty))
+        pos[2] += (price - avg) * closed * (1 if net > 0 else -1)
+        pos[0] = net + signed_qty
+        if pos[0] == 0:
+            pos[1] = 0.0
+        elif (pos[0] > 0) != (net > 0):
+            pos[1] = price
+
+    def _open_bracket_legs(self, parent: Order):
+        exit_buy = not parent.buy
+        sign = 1 if parent.buy else -1
+        legs = []
+        if parent.target_leg is not None:
+            legs.append(self._new_order(parent.token, parent.exchange, exit_buy, parent.qty, "LIMIT", parent.product,
+                                        "BO", parent.avg + sign * parent.target_leg, None, parent.validity,
+                                        parent.symbol, parent.id))
+        if parent.sl_leg is not None:
+            legs.append(self._new_order(parent.token, parent.exchange, exit_buy, parent.qty, "SL-M", parent.product,
+                                        "BO", 0.0, parent.avg - sign * parent.sl_leg, parent.validity,
+                                        parent.symbol, parent.id))
+        parent.legs = [leg.id for leg in legs]
+        for leg in legs:
+            self.engine.submit(leg)
+
+    def _submit(self, order: Order) -> dict:
+        if order.qty <= 0:
+            self._set_status(order, REJECTED)
+            order.message = "Quantity must be positive"
+            return self._not_ok(order.message)
+        self.engine.submit(order)
+        return self._ok([{"brokerOrderId": order.id}])
+
+    # -- AliceBlue surface --------------------------------------------------
+
+    def get_profile(self):
+        return self._ok({"clientId": self.user_id, "clientName": "Paper Trader", "exchanges": ["NSE", "BSE", "NFO", "MCX"]})
+
+    @validated(PLACE_ORDER)
+    def get_place_order(self, instrument_id: str, exchange: str, transaction_type: str, quantity: int, order_type: str,
+                        product: str, order_complexity: str, price: float, validity: str, sl_leg_price=None,
+                        target_leg_price=None, sl_trigger_price=None, trailing_sl_amount=None,
+                        disclosed_quantity: int = 0, source: str = "API"):
+        with self._lock:
+            order = self._new_order(instrument_id, exchange, transaction_type.upper() == "BUY", quantity, order_type,
+                                    product, order_complexity, price, sl_trigger_price, validity)
+            if order.complexity == "BO":
+                order.sl_leg = float(sl_leg_price) if sl_leg_price is not None else None
+                order.target_leg = float(target_leg_price) if target_leg_price is not None else None
+            return self._submit(order)
+
+    @validated(MODIFY_ORDER)
+    def get_modify_order(self, brokerOrderId: str, validity: str, quantity=None, price=None, triggerPrice=None):
+        with self._lock:
+            order = self.orders.get(brokerOrderId)
+            if order is None or order.status not in (OPEN, TRIGGER_PENDING):
+                return self._not_ok("Order not open")
+            reprioritise = False
+            if quantity not in (None, ""):
+                if int(quantity) <= order.filled:
+                    return self._not_ok("Quantity below filled quantity")
+                reprioritise = int(quantity) > order.qty
+                order.qty = int(quantity)
+            if price not in (None, "") and order.order_type in ("LIMIT", "SL"):
+                reprioritise = reprioritise or float(price) != order.price
+                order.price = float(price)
+            if triggerPrice not in (None, ""):
+                order.trigger = float(triggerPrice)
+            order.validity = validity.upper()
+            order.history.append(("modified", self._now(), order.filled))
+            if order.status == OPEN and reprioritise:
+                # The old heap entry goes stale because its seq no longer matches.
+                key = (order.exchange, order.token)
+                self.engine._match_incoming(order, key)
+                if order.status == OPEN:
+                    self.engine.rest(order)
+            return self._ok([{"brokerOrderId": order.id}])
+
+    def modify_orders(self, items: list) -> list:
+        return [self.get_modify_order(**item) for item in items]
+
+    @validated(BROKER_ORDER_ID)
+    def get_cancel_order(self, brokerOrderId):
+        with self._lock:
+            order = self.orders.get(brokerOrderId)
+            if order is None or order.status not in (OPEN, TRIGGER_PENDING):
+                return self._not_ok("Order not open")
+            self._set_status(order, CANCELLED)
+            return self._ok([{"brokerOrderId": order.id}])
+
+    def get_order_book(self):
+        with self._lock:
+            return self._ok([order.to_dict() for order in self.orders.values()])
+
+    @validated(BROKER_ORDER_ID)
+    def get_order_history(self, brokerOrderId: str):
+        with self._lock:
+            order = self.orders.get(brokerOrderId)
+            if order is None:
+                return self._not_ok("Order not found")
+            return self._ok([{"brokerOrderId": order.id, "orderStatus": status, "filledQuantity": filled, "time": at}
+                             for status, at, filled in reversed(order.history)])
+
+    def get_trade_book(self):
+        with self._lock:
+            return self._ok(list(self.trades))
+
+    def iter_order_book(self):
+        return iter(self.get_order_book()["result"])
+
+    def iter_trade_book(self):
+        return iter(self.get_trade_book()["result"])
+
+    def iter_holdings(self):
+        return iter(self.get_holdings()["result"])
+
+    @validated(EXIT_BRACKET)
+    def get_exit_bracket_order(self, brokerOrderId: str, orderComplexity: str):
+        with self._lock:
+            order = self.orders.get(brokerOrderId)
+            if order is None:
+                return self._not_ok("Order not found")
+            parent = self.orders.get(order.parent) if order.parent else order
+            if parent.status in (OPEN, TRIGGER_PENDING):
+                self._set_status(parent, CANCELLED)
+            open_legs = [self.orders[i] for i in parent.legs or () if self.orders[i].status in (OPEN, TRIGGER_PENDING)]
+            for leg in open_legs:
+                self._set_status(leg, CANCELLED)
+            if open_legs:
+                exit_order = self._new_order(parent.token, parent.exchange, not parent.buy, open_legs[0].qty, "MARKET",
+                                             parent.product, "REGULAR", 0.0, None, "DAY", parent.symbol, parent.id)
+                self.engine.submit(exit_order)
+            return self._ok([{"brokerOrderId": parent.id}])
+
+    def get_positions(self):
+        with self._lock:
+            rows = []
+            for (exchange, token, product), (net, avg, realized, bq, bv, sq, sv) in self.positions.items():
+                ltp = self._ltp(exchange, token) or avg
+                rows.append({
+                    "exchange": exchange, "instrumentId": token, "product": product, "netQuantity": net,
+                    "averagePrice": round(avg, 4), "ltp": ltp, "realizedPnl": round(realized, 2),
+                    "unrealizedPnl": round((ltp - avg) * net, 2), "buyQuantity": bq,
+                    "buyAveragePrice": round(bv / bq, 4) if bq else 0.0, "sellQuantity": sq,
+                    "sellAveragePrice": round(sv / sq, 4) if sq else 0.0,
+                })
+            return self._ok(rows)
+
+    def get_holdings(self):
+        with self._lock:
+            return self._ok([{"exchange": exchange, "instrumentId": token, "quantity": pos[0],
+                              "averagePrice": round(pos[1], 4), "ltp": self._ltp(exchange, token) or pos[1]}
+                             for (exchange, token, product), pos in self.positions.items()
+                             if product == "CNC" and pos[0] > 0])
+
+    @validated(SQUARE_OFF)
+    def get_positions_sqroff(self, exch, symbol, qty, product, transaction_type):
+        with self._lock:
+            order = self._new_order(symbol, exch, str(transaction_type).upper() == "BUY", qty, "MARKET", product,
+                                    "REGULAR", 0.0, None, "DAY")
+            return self._submit(order)
+
+    @validated(POSITION_CONVERSION)
+    def get_position_conversion(self, exchange, validity, prevProduct, product, quantity, tradingSymbol,
+                                transactionType, orderSource):
+        with self._lock:
+            exchange, prevProduct, product = exchange.upper(), prevProduct.upper(), product.upper()
+            matches = [key for key in self.positions if key[0] == exchange and key[2] == prevProduct
+                       and key[1] == str(tradingSymbol)]
+            if not matches:
+                return self._not_ok("Position not found")
+            source = self.positions[matches[0]]
+            qty = min(int(quantity), abs(source[0]))
+            signed = qty if source[0] > 0 else -qty
+            source[0] -= signed
+            avg = source[1]
+            self._update_position(exchange, matches[0][1], product, signed, avg)
+            return self._ok([{"converted": qty}])
+
+    def _blocked_margin(self) -> float:
+        blocked = 0.0
+        for order in self.orders.values():
+            if order.status in (OPEN, TRIGGER_PENDING) and order.buy:
+                price = order.price if order.price != INF else (self._ltp(order.exchange, order.token) or 0.0)
+                blocked += price * (order.qty - order.filled) * MARGIN_RATES.get(order.product, 1.0)
+        return blocked
+
+    def get_limits(self):
+        with self._lock:
+            realized = sum(pos[2] for pos in self.positions.values())
+            used = sum(abs(pos[0]) * pos[1] * MARGIN_RATES.get(key[2], 1.0) for key, pos in self.positions.items())
+            blocked = self._blocked_margin()
+            return self._ok([{"openingBalance": self.cash, "realizedPnl": round(realized, 2),
+                              "utilizedMargin": round(used + blocked, 2),
+                              "availableMargin": round(self.cash + realized - used - blocked, 2)}])
+
+    def get_order_margins(self, items: list) -> list:
+        with self._lock:
+            limits = self.get_limits()["result"][0]
+            responses = []
+            for item in items:
+                price = float(item.get("price") or 0) or self._ltp(item["exchange"], str(item["instrumentId"])) or 0.0
+                required = price * int(item["quantity"]) * MARGIN_RATES.get(item["product"], 1.0)
+                responses.append(self._ok([{"requiredMargin": round(required, 2),
+                                            "availableMargin": limits["availableMargin"],
+                                            "shortfall": round(max(0.0, required - limits["availableMargin"]), 2)}]))
+            return responses
+
+    @validated(MARGIN)
+    def get_order_margin(self, exchange, instrumentId, transactionType, quantity, product, orderComplexity, orderType,
+                         validity, price=0.0, slTriggerPrice=None):
+        return self.get_order_margins([self.margin_item(exchange, instrumentId, transactionType, quantity, product,
+                                                        orderComplexity, orderType, validity, price,
+                                                        slTriggerPrice)])[0]
+
+    @validated(QUOTE)
+    def get_quote(self, exchange: str, instrumentId: str):
+        quote = self.engine.quotes.get((exchange.upper(), str(instrumentId)))
+        if quote is None:
+            return self._not_ok("No ticks yet for instrument")
+        return self._ok([{"exchange": quote.exchange, "token": quote.token, "ltp": quote.ltp,
+                          "bid": quote.bid, "ask": quote.ask}])
+
+    # -- GTT ----------------------------------------------------------------
+
+    def _check_gtt(self, gtt: dict, ltp: float):
+        if gtt["side"] is None:
+            gtt["side"] = ltp >= gtt["gttValue"]
+            return
+        if (ltp >= gtt["gttValue"]) != gtt["side"]:
+            gtt["status"] = "triggered"
+            placed = self.get_place_order(gtt["instrumentId"], gtt["exchange"], gtt["transactionType"],
+                                          gtt["quantity"], gtt["orderType"], gtt["product"], gtt["orderComplexity"],
+                                          gtt["price"], gtt["validity"])
+            gtt["orderId"] = (placed.get("result") or [{}])[0].get("brokerOrderId")
+
+    @validated(PLACE_GTT)
+    def get_place_gtt_order(self, tradingSymbol, exchange, transactionType, orderType, product, validity, quantity,
+                            price, orderComplexity, instrumentId, gttType, gttValue):
+        with self._lock:
+            gtt_id = "G" + str(next(self._ids)).zfill(9)
+            self.gtt_orders[gtt_id] = {
+                "brokerOrderId": gtt_id, "tradingSymbol": tradingSymbol.upper(), "exchange": exchange.upper(),
+                "transactionType": transactionType.upper(), "orderType": orderType.upper(),
+                "product": product.upper(), "validity": validity.upper(), "quantity": int(quantity),
+                "price": float(price), "orderComplexity": orderComplexity.upper(), "instrumentId": str(instrumentId),
+                "gttType": gttType.upper(), "gttValue": float(gttValue), "status": "active", "orderId": None,
+                "key": (exchange.upper(), str(instrumentId)), "side": None,
+            }
+            ltp = self._ltp(exchange.upper(), str(instrumentId))
+            if ltp is not None:
+                self._check_gtt(self.gtt_orders[gtt_id], ltp)
+            return self._ok([{"brokerOrderId": gtt_id}])
+
+    def get_gtt_order_book(self):
+        with self._lock:
+            return self._ok([{k: v for k, v in gtt.items() if k not in ("key", "side")}
+                             for gtt in self.gtt_orders.values()])
+
+    @validated(MODIFY_GTT)
+    def get_modify_gtt_order(self, brokerOrderId, instrumentId, tradingSymbol, exchange, orderType, product, validity,
+                             quantity, price, orderComplexity, gttType, gttValue):
+        with self._lock:
+            gtt = self.gtt_orders.get(brokerOrderId)
+            if gtt is None or gtt["status"] != "active":
+                return self._not_ok("GTT order not active")
+            gtt.update(orderType=orderType.upper(), product=product.upper(), validity=validity.upper(),
+                       quantity=int(quantity), price=float(price), orderComplexity=orderComplexity.upper(),
+                       gttType=gttType.upper(), gttValue=float(gttValue), side=None)
+            ltp = self._ltp(gtt["exchange"], gtt["instrumentId"])
+            if ltp is not None:
+                self._check_gtt(gtt, ltp)
+            return self._ok([{"brokerOrderId": brokerOrderId}])
+
+    @validated(BROKER_ORDER_ID)
+    def get_cancel_gtt_order(self, brokerOrderId):
+        with self._lock:
+            gtt = self.gtt_orders.get(brokerOrderId)
+            if gtt is None or gtt["status"] != "active":
+                return self._not_ok("GTT order not active")
+            gtt["status"] = "cancelled"
+            return self._ok([{"brokerOrderId": brokerOrderId}])
+
+    @validated(CANDLES)
+    def get_historical_candles(self, exchange, instrumentId, resolution, from_ms, to_ms):
+        return self._not_ok("Historical data is not available in paper trading")
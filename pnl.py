@@ -0,0 +1,278 @@
+"""Incremental P&L over trade-book fills.
+
+Each (exchange, instrument, product) keeps its open tax lots in two parallel typed arrays
+(signed quantities and prices) consumed from a moving head, so a fill costs time in the
+lots it closes rather than in the whole history. FIFO and weighted-average cost are tracked
+side by side. Fills already seen are skipped, so the trade book can be re-ingested on every
+call; live accounts also append new fills to a local journal so lots carry across days.
+"""
+import os
+import csv
+import itertools
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Set
+
+JOURNAL_DIR = os.getenv("ALICE_PNL_JOURNAL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pnl_journal"))
+METHODS = ("FIFO", "AVERAGE")
+
+FILL_ID_FIELDS = ("tradeId", "fillId", "exchangeTradeId", "tradeNumber")
+QTY_FIELDS = ("filledQuantity", "tradedQuantity", "fillQuantity", "fillQty", "quantity")
+PRICE_FIELDS = ("tradedPrice", "fillPrice", "averageTradedPrice", "averagePrice", "price")
+TIME_FIELDS = ("tradeTime", "fillTime", "exchangeTime", "orderTime")
+TOKEN_FIELDS = ("instrumentId", "token")
+DELIVERY_PRODUCTS = frozenset({"CNC", "DELIVERY", "LONGTERM", "MTF"})
+DERIVATIVE_EXCHANGES = frozenset({"NFO", "BFO", "CDS", "BCD", "MCX", "NCO"})
+
+# Statutory charges as fractions of turnover: (STT buy, STT sell, exchange txn, stamp duty on buys).
+# SEBI fees and GST on brokerage + txn + SEBI are added on top.
+CHARGE_RATES = {
+    "delivery": (0.001, 0.001, 0.0000297, 0.00015),
+    "intraday": (0.0, 0.00025, 0.0000297, 0.00003),
+    "futures": (0.0, 0.0002, 0.0000173, 0.00002),
+    "options": (0.0, 0.001, 0.0003503, 0.00003),
+}
+SEBI_RATE = 0.000001
+GST_RATE = 0.18
+BROKERAGE_PER_FILL = float(os.getenv("ALICE_BROKERAGE_PER_ORDER", "20"))
+BROKERAGE_RATE = float(os.getenv("ALICE_BROKERAGE_RATE", "0.0003"))
+
+
+def segment(exchange: str, product: str, symbol: str = "") -> str:
+    if exchange in DERIVATIVE_EXCHANGES:
+        return "options" if symbol.upper().endswith(("CE", "PE")) else "futures"
+    return "delivery" if product in DELIVERY_PRODUCTS else "intraday"
+
+
+def estimate_charges(segment_name: str, buy_value: float, sell_value: float, brokerage: float) -> float:
+    """STT, exchange, SEBI, stamp duty and GST on buy/sell turnover, plus `brokerage`."""
+    stt_buy, stt_sell, txn, stamp = CHARGE_RATES[segment_name]
+    fees = (buy_value + sell_value) * (txn + SEBI_RATE)
+    return brokerage + fees + buy_value * (stt_buy + stamp) + sell_value * stt_sell + GST_RATE * (brokerage + fees)
+
+
+class LotBook:
+    """Open lots and running P&L of one instrument/product."""
+
+    __slots__ = ("exchange", "token", "product", "symbol", "segment", "qty", "price", "head", "net",
+                 "open_value", "realized", "avg_net", "avg_cost", "avg_realized", "buy_qty", "buy_value", "sell_qty",
+                 "sell_value", "brokerage", "last_price")
+
+    def __init__(self, exchange: str, token: str, product: str, symbol: str = ""):
+        self.exchange, self.token, self.product, self.symbol = exchange, token, product, symbol
+        self.segment = segment(exchange, product, symbol)
+        self.qty = array("q")
+        self.price = array("d")
+        self.head = 0
+        self.net = 0
+        self.open_value = 0.0
+        self.realized = 0.0
+        self.avg_net = 0
+        self.avg_cost = 0.0
+        self.avg_realized = 0.0
+        self.buy_qty = self.sell_qty = 0
+        self.buy_value = self.sell_value = self.brokerage = 0.0
+        self.last_price = 0.0
+
+    def apply(self, signed_qty: int, price: float):
+        value = abs(signed_qty) * price
+        if signed_qty > 0:
+            self.buy_qty += signed_qty
+            self.buy_value += value
+        else:
+            self.sell_qty -= signed_qty
+            self.sell_value += value
+        if self.segment != "delivery":
+            # Per fill: overstates orders that fill in several parts.
+            self.brokerage += min(BROKERAGE_PER_FILL, value * BROKERAGE_RATE)
+        self.last_price = price
+        self._fifo(signed_qty, price)
+        self._average(signed_qty, price)
+
+    def _fifo(self, signed_qty: int, price: float):
+        qty, prices, net = self.qty, self.price, self.net
+        if net == 0 or (net > 0) == (signed_qty > 0):
+            qty.append(signed_qty)
+            prices.append(price)
+            self.net = net + signed_qty
+            self.open_value += abs(signed_qty) * price
+            return
+        remaining = abs(signed_qty)
+        head = self.head
+        while remaining and head < len(qty):
+            lot = qty[head]
+            matched = min(abs(lot), remaining)
+            self.realized += matched * (price - prices[head]) * (1 if lot > 0 else -1)
+            self.open_value -= matched * prices[head]
+            remaining -= matched
+            if matched == abs(lot):
+                head += 1
+            else:
+                qty[head] = lot - matched if lot > 0 else lot + matched
+        self.net = net + signed_qty
+        if remaining:
+            # Closed every lot and flipped sides: the rest opens a new lot.
+            del qty[:], prices[:]
+            head = 0
+            qty.append(remaining if signed_qty > 0 else -remaining)
+            prices.append(price)
+            self.open_value = remaining * price
+        elif head > 64 and head * 2 > len(qty):
+            del qty[:head], prices[:head]
+            head = 0
+        self.head = head
+
+    def _average(self, signed_qty: int, price: float):
+        net = self.avg_net
+        if net == 0 or (net > 0) == (signed_qty > 0):
+            self.avg_cost = (self.avg_cost * abs(net) + price * abs(signed_qty)) / (abs(net) + abs(signed_qty))
+        else:
+            closed = min(abs(net), abs(signed_qty))
+            self.avg_realized += closed * (price - self.avg_cost) * (1 if net > 0 else -1)
+            if abs(signed_qty) > abs(net):
+                self.avg_cost = price
+        self.avg_net = net + signed_qty
+        if self.avg_net == 0:
+            self.avg_cost = 0.0
+
+    def fifo_cost(self) -> float:
+        """Average price of the open FIFO lots."""
+        return self.open_value / abs(self.net) if self.net else 0.0
+
+    def report(self, method: str, mark: Optional[float]) -> dict:
+        fifo = method == "FIFO"
+        cost = self.fifo_cost() if fifo else self.avg_cost
+        realized = self.realized if fifo else self.avg_realized
+        mark = self.last_price if mark is None else mark
+        unrealized = (mark - cost) * self.net if self.net else 0.0
+        charges = estimate_charges(self.segment, self.buy_value, self.sell_value, self.brokerage)
+        return {
+            "exchange": self.exchange, "instrumentId": self.token, "product": self.product,
+            "tradingSymbol": self.symbol, "open_quantity": self.net, "average_cost": round(cost, 4),
+            "open_lots": len(self.qty) - self.head if fifo else int(self.net != 0),
+            "mark_price": mark, "realized": round(realized, 2), "unrealized": round(unrealized, 2),
+            "charges": round(charges, 2), "net": round(realized + unrealized - charges, 2),
+            "buy_quantity": self.buy_qty, "sell_quantity": self.sell_qty,
+            "buy_value": round(self.buy_value, 2), "sell_value": round(self.sell_value, 2),
+        }
+
+
+class PnLEngine:
+    """Consumes trade-book fills incrementally; see the module docstring."""
+
+    def __init__(self, journal_path: Optional[str] = None):
+        self.books: Dict[tuple, LotBook] = {}
+        # Tool calls for one account run concurrently; ingest and summary hold this.
+        self._lock = threading.Lock()
+        self.seen: Set[str] = set()
+        self.fills = 0
+        # Position and last fill key of the previous ingest, to skip an append-only book's known head.
+        self._cursor = 0
+        self._cursor_key = None
+        self._occurrences = Counter()
+        self.journal_path = journal_path
+        if journal_path and os.path.exists(journal_path):
+            with open(journal_path, newline="") as f:
+                for key, exchange, token, product, signed_qty, price, symbol in csv.reader(f):
+                    # Several worker processes may have journaled the same fill.
+                    if key in self.seen:
+                        continue
+                    self.seen.add(key)
+                    self.apply(exchange, token, product, int(signed_qty), float(price), symbol)
+
+    def book(self, exchange: str, token: str, product: str, symbol: str = "") -> LotBook:
+        key = (exchange, token, product)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = LotBook(exchange, token, product, symbol)
+        return book
+
+    def apply(self, exchange: str, token: str, product: str, signed_qty: int, price: float, symbol: str = ""):
+        self.book(exchange, token, product, symbol).apply(signed_qty, price)
+        self.fills += 1
+
+    @staticmethod
+    def _names(record) -> tuple:
+        """Which of the field aliases this trade book uses (fill id, time, quantity, price, token)."""
+        def first(names):
+            return next((name for name in names if record.get(name) not in (None, "")), None)
+        return (first(FILL_ID_FIELDS), first(TIME_FIELDS), first(QTY_FIELDS) or QTY_FIELDS[0],
+                first(PRICE_FIELDS) or PRICE_FIELDS[0], first(TOKEN_FIELDS) or TOKEN_FIELDS[0])
+
+    @staticmethod
+    def _fill_key(record, names: tuple) -> str:
+        """Broker fill id when the book has one, else order id, time, quantity and price."""
+        fill_id, when, qty, price = names[0], names[1], names[2], names[3]
+        when = record.get(when) if when else ""
+        if fill_id:
+            return f"{record.get('exchange')}:{record.get(fill_id)}:{when}"
+        return f"{record.get('brokerOrderId')}:{when}:{record.get(qty)}:{record.get(price)}"
+
+    def ingest(self, records: Iterable) -> int:
+        """Apply fills not seen before; returns how many were new.
+
+        Records are trade-book entries (dicts or LazyRecords). When the book still starts with
+        the fills consumed last time, only its tail is read; otherwise every fill is checked
+        against the ones already seen. Fills without a broker id are told apart by their
+        occurrence among identical fills.
+        """
+        if not isinstance(records, Sequence):
+            records = list(records)
+        with self._lock:
+            return self._ingest(records)
+
+    def _ingest(self, records: Sequence) -> int:
+        if not records:
+            return 0
+        names = self._names(records[-1])
+        start = self._cursor
+        if not (0 < start <= len(records) and self._fill_key(records[start - 1], names) == self._cursor_key):
+            start = 0
+            self._occurrences = Counter()
+        has_id, qty_name, price_name, token_name = names[0] is not None, names[2], names[3], names[4]
+        seen, occurrences, fill_key = self.seen, self._occurrences, self._fill_key
+        journal = []
+        for record in itertools.islice(records, start, None):
+            key = fill_key(record, names)
+            if not has_id:
+                occurrences[key] += 1
+                key = f"{key}#{occurrences[key]}"
+            if key in seen:
+                continue
+            qty = int(float(record.get(qty_name) or 0))
+            if qty <= 0:
+                continue
+            seen.add(key)
+            price = float(record.get(price_name) or 0)
+            exchange = str(record.get("exchange") or "").upper()
+            token = str(record.get(token_name) or "")
+            product = str(record.get("product") or "").upper()
+            symbol = str(record.get("tradingSymbol") or "")
+            signed_qty = qty if str(record.get("transactionType")).upper() == "BUY" else -qty
+            self.apply(exchange, token, product, signed_qty, price, symbol)
+            journal.append((key, exchange, token, product, signed_qty, price, symbol))
+        self._cursor, self._cursor_key = len(records), fill_key(records[-1], names)
+        if journal and self.journal_path:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a", newline="") as f:
+                csv.writer(f).writerows(journal)
+        return len(journal)
+
+    def summary(self, method: str = "FIFO", marks: Optional[Dict[str, float]] = None,
+                instrument: Optional[str] = None) -> dict:
+        """Per-instrument and total P&L. `marks` maps "EXCHANGE:instrumentId" to a price for
+        unrealized P&L; otherwise the last fill price is used."""
+        method = method.upper()
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {', '.join(METHODS)}; got {method!r}")
+        marks = marks or {}
+        rows = []
+        with self._lock:
+            for book in self.books.values():
+                if instrument and instrument not in (book.token, book.symbol):
+                    continue
+                rows.append(book.report(method, marks.get(f"{book.exchange}:{book.token}")))
+            fills = self.fills
+        totals = {name: round(sum(row[name] for row in rows), 2) for name in ("realized", "unrealized", "charges", "net")}
+        return {"method": method, "fills": fills, "totals": totals, "positions": rows}
@@ -0,0 +1,342 @@
+"""On-demand profiling of live tool calls.
+
+`Profiler.start()` arms the next N calls of chosen tools. Only while calls are armed are
+timing wrappers patched onto the stages of the call path (argument validation, auth,
+the broker request with HTTP connect/send/wait/read, JSON decode and MCP result encoding),
+so an idle profiler costs nothing beyond one check in its middleware. Each stage span is
+timed per call and aggregated into a tree whose folded form feeds flame graph tools.
+"deterministic" mode also runs cProfile over blocking tool bodies; "sampling" mode also
+samples the stacks of the threads running profiled calls.
+"""
+import os
+import sys
+import time
+import cProfile
+import pstats
+import threading
+import functools
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+import urllib3.connection
+import urllib3.response
+import fastmcp.tools.tool
+from fastmcp.server.middleware import Middleware
+
+import stream_json
+from logger import get_logger
+from validation import Schema
+
+PROFILE_DIR = os.getenv("ALICE_PROFILE_DIR", ".profiles")
+MODES = ("spans", "deterministic", "sampling")
+MAX_CALLS = 1000
+SAMPLE_INTERVAL_MS = 5.0
+TOP_N = 25
+
+# (owner, attribute, stage) wrapped while calls are armed; callers add their own (e.g. auth).
+STAGE_HOOKS = [
+    (Schema, "__call__", "validation"),
+    (urllib3.connection.HTTPConnection, "connect", "http.connect"),
+    (urllib3.connection.HTTPSConnection, "connect", "http.connect"),
+    (urllib3.connection.HTTPConnection, "request", "http.send"),
+    (urllib3.connection.HTTPConnection, "getresponse", "http.wait"),
+    (urllib3.response.HTTPResponse, "read", "http.read"),
+    (urllib3.response.HTTPResponse, "read_chunked", "http.read"),
+    (requests.models.Response, "json", "decode"),
+    (stream_json, "loads", "decode"),
+    (fastmcp.tools.tool, "_convert_to_content", "encode"),
+]
+# Frames from these files are executor/event-loop plumbing, dropped from sampled stacks.
+_PLUMBING = ("threading.py", os.sep + "concurrent" + os.sep, os.sep + "asyncio" + os.sep, "profiling.py")
+
+current: ContextVar[Optional["CallProfile"]] = ContextVar("profiled_call", default=None)
+
+log = get_logger("profiling")
+
+
+class CallProfile:
+    """Span timings of one profiled tool call; spans nest per thread."""
+
+    __slots__ = ("tool", "started", "spans", "stacks", "top", "threads", "cprofile")
+
+    def __init__(self, tool: str, thread: int):
+        self.tool = tool
+        self.started = time.perf_counter()
+        self.spans: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        self.stacks: Dict[int, list] = {}
+        self.top = 0.0
+        self.threads = {thread}
+        self.cprofile = None
+
+    def enter(self, stage: str):
+        stack = self.stacks.setdefault(threading.get_ident(), [])
+        path = (stack[-1][0] if stack else (self.tool,)) + (stage,)
+        stack.append([path, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stack = self.stacks[threading.get_ident()]
+        path, started, children = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += elapsed
+        else:
+            self.top += elapsed
+        span = self.spans[path]
+        span[0] += 1
+        span[1] += elapsed
+        span[2] += elapsed - children
+
+
+def _span(stage: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = current.get()
+        if call is None:
+            return fn(*args, **kwargs)
+        call.enter(stage)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            call.exit()
+    return wrapper
+
+
+class Profiler:
+    """Profiles the next N calls of chosen tools.
+
+    `bodies` maps blocking tool names to the functions their worker threads call; the profiler
+    swaps armed entries for a wrapper that opens a "body" span (and cProfile or stack sampling).
+    `hooks` are (owner, attribute, stage) triples added to STAGE_HOOKS.
+    """
+
+    def __init__(self, bodies: Dict[str, Callable], hooks: Iterable[Tuple[object, str, str]] = ()):
+        self.bodies = bodies
+        self.hooks = STAGE_HOOKS + list(hooks)
+        self.armed: Dict[str, int] = {}
+        self.mode = "spans"
+        self.interval = SAMPLE_INTERVAL_MS / 1000
+        self._lock = threading.Lock()
+        self._patched: List[tuple] = []
+        self._active = set()
+        self._sampler = None
+        self._reset()
+
+    def _reset(self):
+        self.spans: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.samples = Counter()
+        self.stats: Optional[pstats.Stats] = None
+        self.started_at = None
+
+    def start(self, tools: List[str], calls: int, mode: str = "spans", interval_ms: float = SAMPLE_INTERVAL_MS):
+        """Arm the next `calls` calls of each of `tools`, discarding the previous results."""
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode '{mode}'. Must be one of {MODES}")
+        if not 1 <= calls <= MAX_CALLS:
+            raise ValueError(f"calls must be between 1 and {MAX_CALLS}")
+        with self._lock:
+            if self._active:
+                raise ValueError("Profiled calls are still running; stop or wait for them first")
+            self._uninstall()
+            self._reset()
+            self.mode = mode
+            self.interval = max(interval_ms, 1.0) / 1000
+            self.armed = dict.fromkeys(tools, calls)
+            self.started_at = time.time()
+            self._install()
+        log.info("profiling armed", extra={"tools": tools, "calls": calls, "mode": mode})
+
+    def stop(self):
+        """Disarm; calls already being profiled still finish and are reported."""
+        with self._lock:
+            self.armed = {}
+            if not self._active:
+                self._uninstall()
+
+    def begin(self, tool: str) -> Optional[CallProfile]:
+        with self._lock:
+            remaining = self.armed.get(tool)
+            if not remaining:
+                return None
+            if remaining == 1:
+                del self.armed[tool]
+            else:
+                self.armed[tool] = remaining - 1
+            call = CallProfile(tool, threading.get_ident())
+            self._active.add(call)
+            return call
+
+    def finish(self, call: CallProfile):
+        elapsed = time.perf_counter() - call.started
+        with self._lock:
+            self._active.discard(call)
+            for path, (count, total, own) in call.spans.items():
+                span = self.spans[path]
+                span[0] += count
+                span[1] += total
+                span[2] += own
+            root = self.spans[(call.tool,)]
+            root[0] += 1
+            root[1] += elapsed
+            root[2] += elapsed - call.top
+            self.durations[call.tool].append(elapsed)
+            if call.cprofile is not None:
+                if self.stats is None:
+                    self.stats = pstats.Stats(call.cprofile)
+                else:
+                    self.stats.add(call.cprofile)
+            if not self.armed and not self._active:
+                self._uninstall()
+
+    def _install(self):
+        if self._patched:
+            return
+        for owner, attr, stage in self.hooks:
+            original = vars(owner).get(attr, _MISSING)
+            setattr(owner, attr, _span(stage, getattr(owner, attr)))
+            self._patched.append((owner, attr, original))
+        for tool in self.armed:
+            if tool in self.bodies:
+                original = self.bodies[tool]
+                self.bodies[tool] = self._body(original)
+                self._patched.append((self.bodies, tool, original))
+        if self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def _uninstall(self):
+        for owner, attr, original in reversed(self._patched):
+            if owner is self.bodies:
+                owner[attr] = original
+            elif original is _MISSING:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+        self._patched = []
+        self._sampler = None
+
+    def _body(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            call = current.get()
+            if call is None:
+                return fn(*args, **kwargs)
+            loop_threads = call.threads
+            call.threads = {threading.get_ident()}
+            profile = cProfile.Profile() if self.mode == "deterministic" else None
+            call.enter("body")
+            if profile is not None:
+                profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    call.cprofile = profile
+                call.exit()
+                call.threads = loop_threads
+        return body
+
+    def _sample(self):
+        me = threading.current_thread()
+        while self._sampler is me:
+            frames = sys._current_frames()
+            for call in list(self._active):
+                for thread in call.threads:
+                    frame = frames.get(thread)
+                    names = []
+                    while frame is not None:
+                        code = frame.f_code
+                        if not any(part in code.co_filename for part in _PLUMBING):
+                            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if names:
+                        with self._lock:
+                            self.samples[";".join([call.tool, *reversed(names)])] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def folded(self) -> List[str]:
+        """Collapsed stacks ("a;b;c value"): sample counts in sampling mode, else span self time in µs."""
+        if self.mode == "sampling":
+            return [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        lines = sorted(self.spans.items(), key=lambda item: -item[1][2])
+        return [f"{';'.join(path)} {round(own * 1e6)}" for path, (_, _, own) in lines if own > 0]
+
+    def report(self, write_file: bool = False) -> dict:
+        with self._lock:
+            tools = {}
+            for tool, durations in self.durations.items():
+                ordered = sorted(durations)
+                total = self.spans[(tool,)][1]
+                stages = []
+                for path, (count, spent, own) in sorted(self.spans.items()):
+                    if path[0] != tool:
+                        continue
+                    stages.append({
+                        "stage": "/".join(path[1:]) or "(unattributed)", "calls": count,
+                        "total_ms": round(spent * 1000, 2), "self_ms": round(own * 1000, 2),
+                        "mean_ms": round(spent / count * 1000, 3) if count else None,
+                        "share_pct": round(own / total * 100, 1) if total else None,
+                    })
+                tools[tool] = {
+                    "calls": len(ordered), "mean_ms": round(total / len(ordered) * 1000, 2),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2), "max_ms": round(ordered[-1] * 1000, 2),
+                    "stages": stages,
+                }
+            result = {"mode": self.mode, "armed": dict(self.armed), "in_flight": len(self._active),
+                      "since": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds")
+                      if self.started_at else None,
+                      "tools": tools, "folded": self.folded()[:TOP_N]}
+            if self.stats is not None:
+                result["functions"] = _top_functions(self.stats)
+            if write_file:
+                result["files"] = self._write()
+            return result
+
+    def _write(self) -> List[str]:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{self.mode}")
+        with open(base + ".folded", "w") as f:
+            f.write("\n".join(self.folded()) + "\n")
+        files = [base + ".folded"]
+        if self.stats is not None:
+            self.stats.dump_stats(base + ".prof")
+            files.append(base + ".prof")
+        return files
+
+
+_MISSING = object()
+
+
+def _top_functions(stats: pstats.Stats, limit: int = TOP_N) -> List[dict]:
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        if filename == __file__:
+            continue
+        rows.append({"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls,
+                     "self_ms": round(own * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)})
+    return sorted(rows, key=lambda row: -row["cumulative_ms"])[:limit]
+
+
+class ProfilingMiddleware(Middleware):
+    """Opens a CallProfile for armed calls; a single dict check for everything else."""
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+
+    async def on_call_tool(self, context, call_next):
+        if not self.profiler.armed:
+            return await call_next(context)
+        call = self.profiler.begin(context.message.name)
+        if call is None:
+            return await call_next(context)
+        token = current.set(call)
+        try:
+            return await call_next(context)
+        finally:
+            current.reset(token)
+            self.profiler.finish(call)
@@ -0,0 +1,242 @@
+"""Background refresh of account state on an exchange-session-aware schedule.
+
+Limits, positions, holdings and the order book are re-fetched at short intervals while a
+market is open (shorter still around the open, the close and expiry afternoons) and at long
+intervals otherwise. Tools read the latest snapshot instead of calling the broker. Snapshots
+are shared between worker processes through the store, so one worker's refresh serves all of
+them, and each account's schedule is offset and jittered so that accounts do not refresh in lockstep.
+Invalidation bumps a per-snapshot generation in the store; snapshots (this worker's included) and
+broker responses from an older generation are never served or cached, and neither are broker
+error envelopes.
+"""
+import os
+import time
+import random
+import zlib
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from logger import get_logger
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Continuous trading sessions (IST).
+SESSIONS = {
+    "NSE": ((9, 15), (15, 30)),
+    "BSE": ((9, 15), (15, 30)),
+    "MCX": ((9, 0), (23, 30)),
+}
+PEAK_MINUTES = 15
+EXPIRY_WEEKDAYS = frozenset(int(d) for d in os.getenv("ALICE_EXPIRY_WEEKDAYS", "1").split(",") if d.strip())
+EXPIRY_PEAK_FROM = (14, 30)
+HOLIDAYS = frozenset(d.strip() for d in os.getenv("ALICE_MARKET_HOLIDAYS", "").split(",") if d.strip())
+
+# dataset -> (seconds between refreshes while a market is open, while all are closed)
+INTERVALS = {
+    "limits": (15.0, 900.0),
+    "positions": (5.0, 900.0),
+    "holdings": (60.0, 3600.0),
+    "order_book": (5.0, 900.0),
+}
+JITTER = 0.2
+SNAPSHOT_PREFIX = "snapshot:"
+GENERATION_SUFFIX = ":generation"
+
+PEAK, OPEN, CLOSED = "peak", "open", "closed"
+
+log = get_logger("refresh")
+
+
+def _minutes(hm: Tuple[int, int]) -> int:
+    return hm[0] * 60 + hm[1]
+
+
+def market_phase(now: Optional[datetime] = None) -> str:
+    """"peak" near any session's open/close or on an expiry afternoon, "open" during a session, else "closed"."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    if now.weekday() >= 5 or now.strftime("%Y-%m-%d") in HOLIDAYS:
+        return CLOSED
+    minute = now.hour * 60 + now.minute
+    phase = CLOSED
+    for start, end in SESSIONS.values():
+        start, end = _minutes(start), _minutes(end)
+        if start <= minute < end:
+            if minute < start + PEAK_MINUTES or minute >= end - PEAK_MINUTES:
+                return PEAK
+            phase = OPEN
+    if phase == OPEN and now.weekday() in EXPIRY_WEEKDAYS and \
+            _minutes(EXPIRY_PEAK_FROM) <= minute < _minutes(SESSIONS["NSE"][1]):
+        return PEAK
+    return phase
+
+
+def broker_error(data) -> Optional[str]:
+    """The message of a broker error envelope (status/stat other than Ok), else None."""
+    if not isinstance(data, dict):
+        return None
+    status = str(data.get("status", data.get("stat", "Ok"))).lower()
+    if status in ("ok", "success"):
+        return None
+    return str(data.get("emsg") or data.get("message") or data)
+
+
+def refresh_interval(dataset: str, phase: str) -> float:
+    open_interval, closed_interval = INTERVALS[dataset]
+    if phase == CLOSED:
+        return closed_interval
+    return open_interval / 2 if phase == PEAK else open_interval
+
+
+class RefreshScheduler:
+    """Keeps snapshots of account datasets fresh in a background thread.
+
+    `fetchers` maps a dataset name to a function of the client returning its broker response.
+    `get_client` returns the current client or None; the scheduler never starts a login.
+    """
+
+    def __init__(self, get_client: Callable, fetchers: Dict[str, Callable], store=None):
+        self._get_client = get_client
+        self.fetchers = fetchers
+        self._store = store
+        self._local: Dict[str, dict] = {}
+        self._generations: Dict[str, int] = {}
+        self._schedule: Dict[str, Tuple[float, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.adopted = 0
+        self.dropped = 0
+        self.failures = 0
+
+    @staticmethod
+    def _key(client, dataset: str) -> str:
+        return f"{SNAPSHOT_PREFIX}{type(client).__name__}:{getattr(client, 'user_id', '')}:{dataset}"
+
+    def _lock(self, key: str) -> threading.Lock:
+        return self._locks.setdefault(key, threading.Lock())
+
+    def _generation(self, key: str) -> Optional[int]:
+        """Current generation of `key`; changes on every invalidation, in any worker."""
+        if self._store is None:
+            return self._generations.get(key)
+        return self._store.get(key + GENERATION_SUFFIX)
+
+    def snapshot(self, key: str, max_age: float) -> Optional[dict]:
+        """The freshest snapshot for `key` no older than `max_age`, from this process or the store."""
+        generation = self._generation(key)
+        snap = self._local.get(key)
+        if snap is not None and snap.get("generation") != generation:
+            # Another worker invalidated it.
+            del self._local[key]
+            snap = None
+        now = time.time()
+        if snap is not None and now - snap["as_of"] <= max_age:
+            return snap
+        shared = self._store.get(key) if self._store is not None else None
+        if shared is not None and shared.get("generation") == generation and \
+                (snap is None or shared["as_of"] > snap["as_of"]):
+            self._local[key] = snap = shared
+            self.adopted += 1
+        return snap if snap is not None and now - snap["as_of"] <= max_age else None
+
+    def _fetch(self, client, dataset: str, key: str) -> dict:
+        generation = self._generation(key)
+        snap = {"as_of": time.time(), "generation": generation, "data": self.fetchers[dataset](client)}
+        error = broker_error(snap["data"])
+        if error is not None:
+            # Never cache an error envelope; the previous snapshot, if any, stays in place.
+            self.failures += 1
+            raise Exception(f"{dataset} refresh failed: {error}")
+        if self._generation(key) != generation:
+            # Invalidated while the broker call was in flight; the response may predate the change.
+            self.dropped += 1
+            return snap
+        self._local[key] = snap
+        if self._store is not None:
+            self._store.set(key, snap, ttl=2 * max(INTERVALS[dataset]))
+        self.refreshes += 1
+        return snap
+
+    def read(self, dataset: str, client, refresh: bool = False, fetch: bool = True) -> Optional[Tuple[object, dict]]:
+        """Dataset contents and a staleness note; calls the broker only without a usable snapshot.
+
+        With `fetch=False` returns None instead of calling the broker.
+        """
+        phase = market_phase()
+        max_age = 2 * refresh_interval(dataset, phase)
+        key = self._key(client, dataset)
+        source = "snapshot"
+        snap = None if refresh else self.snapshot(key, max_age)
+        if snap is None:
+            if not fetch:
+                return None
+            with self._lock(key):
+                # Concurrent readers of a missing snapshot share one broker call.
+                snap = None if refresh else self.snapshot(key, max_age)
+                if snap is None:
+                    snap = self._fetch(client, dataset, key)
+                    source = "broker"
+        age = time.time() - snap["as_of"]
+        return snap["data"], {
+            "source": source, "as_of": datetime.fromtimestamp(snap["as_of"], IST).isoformat(timespec="seconds"),
+            "age_s": round(age, 2), "stale": age > refresh_interval(dataset, phase), "market_phase": phase,
+        }
+
+    def invalidate(self, *datasets: str):
+        """Drop snapshots (e.g. after an order changes account state) so the next read refetches."""
+        client = self._get_client()
+        if client is None:
+            return
+        generation = time.time_ns()
+        for dataset in datasets or tuple(self.fetchers):
+            key = self._key(client, dataset)
+            self._local.pop(key, None)
+            if self._store is None:
+                self._generations[key] = generation
+            else:
+                self._store.set(key + GENERATION_SUFFIX, generation)
+                self._store.delete(key)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="account-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _due(self, client, dataset: str, key: str, phase: str) -> float:
+        if key not in self._schedule:
+            # Stable per-account offset spreads first refreshes of different accounts.
+            spread = zlib.crc32(str(getattr(client, "user_id", "")).encode()) % 1000 / 1000
+            self._schedule[key] = (time.time() - refresh_interval(dataset, phase) * (1 - spread), 1.0)
+        last, factor = self._schedule[key]
+        return last + refresh_interval(dataset, phase) * factor
+
+    def _run(self):
+        while True:
+            client = self._get_client()
+            wait = 5.0
+            if client is not None:
+                phase = market_phase()
+                for dataset in self.fetchers:
+                    key = self._key(client, dataset)
+                    interval = refresh_interval(dataset, phase)
+                    if time.time() >= self._due(client, dataset, key, phase):
+                        try:
+                            with self._lock(key):
+                                if self.snapshot(key, interval * (1 - JITTER)) is None:
+                                    self._fetch(client, dataset, key)
+                        except Exception as e:
+                            log.warning("background refresh failed", extra={"dataset": dataset, "error": str(e)})
+                        self._schedule[key] = (time.time(), random.uniform(1 - JITTER, 1 + JITTER))
+                    wait = min(wait, max(0.05, self._due(client, dataset, key, phase) - time.time()))
+            if self._stop.wait(wait):
+                return
+
+    def status(self) -> dict:
+        return {"running": bool(self._thread and self._thread.is_alive()), "market_phase": market_phase(),
+                "refreshes": self.refreshes, "adopted_from_other_workers": self.adopted,
+                "dropped_stale": self.dropped, "failed_refreshes": self.failures}
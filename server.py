@@ -1,19 +1,152 @@
 import os
+import sys
 import socket
 import time
+import asyncio
+import inspect
+import argparse
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from fastmcp import FastMCP
-from Client import AliceBlue
-from typing import Optional, Union
+from fastmcp.server.middleware import Middleware
+from Client import BASE_URL, AliceBlue, http_session
+from typing import Callable, Dict, List, Optional, Union
 from dotenv import load_dotenv
+from logger import correlation_id, get_logger, new_correlation_id, setup_logging
+from store import get_store
+from admission import BULK, GLOBAL_LIMIT, RISK, TRADE, AdmissionControl, parse_limits
+from health import HealthMonitor, breakers
+from refresh import RefreshScheduler
+from margin_batcher import MarginBatcher
+from modify_coalescer import ModifyCoalescer
+from market_data import MarketData, candles_to_table
+from workflows import OrderWorkflow, find_key
+from algos import AlgoScheduler
+from paper_trading import PaperAliceBlue
+from pnl import JOURNAL_DIR, PnLEngine
+from greeks import MAX_SCENARIOS, OptionBook
+from profiling import MODES as PROFILE_MODES, Profiler, ProfilingMiddleware
+from stream_json import select
+from validation import Complexity, Exchange, OrderType, Product, Resolution, TransactionType, Validity
 
 load_dotenv()
+setup_logging()
+
+log = get_logger("server")
 
 mcp = FastMCP(
     name="New AliceBlue Portfolio Agent",
-    dependencies=["python-dotenv", "requests"]
+    dependencies=["python-dotenv", "requests", "numpy"]
 )
 _alice_client = None
-
+_paper_client: Optional[PaperAliceBlue] = None
+_client_lock = threading.RLock()
+SESSION_KEY = "alice:session"
+TRADING_MODES = ("live", "paper")
+trading_mode = os.getenv("ALICE_TRADING_MODE", "live").lower()
+# Worker processes serving the HTTP port; main() exports it so every uvicorn worker sees the same count.
+worker_count = int(os.getenv("ALICE_MCP_WORKERS", "1"))
+
+
+class ToolCallLogging(Middleware):
+    """Tags each tool call with a correlation ID and logs its outcome and latency."""
+
+    async def on_call_tool(self, context, call_next):
+        token = new_correlation_id()
+        started = time.perf_counter()
+        try:
+            result = await call_next(context)
+            log.info("tool call", extra={"tool": context.message.name,
+                                         "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)})
+            return result
+        except Exception:
+            log.exception("tool call failed", extra={"tool": context.message.name})
+            raise
+        finally:
+            correlation_id.reset(token)
+
+
+# Tools that change orders, positions or funds; account snapshots are dropped after they run.
+ACCOUNT_MUTATING_TOOLS = frozenset({
+    "place_order", "get_modify_order", "get_cancel_order", "get_positions_sqroff", "get_position_conversion",
+    "get_exit_bracket_order", "execute_order", "paper_replay",
+})
+
+
+class SnapshotInvalidation(Middleware):
+    """Drops background-refreshed account snapshots after a tool that changes account state."""
+
+    async def on_call_tool(self, context, call_next):
+        try:
+            return await call_next(context)
+        finally:
+            if context.message.name in ACCOUNT_MUTATING_TOOLS:
+                account_state.invalidate()
+
+
+# Priority classes for admission control; unlisted tools are READ.
+TOOL_PRIORITIES = {
+    **dict.fromkeys(("get_cancel_order", "get_exit_bracket_order", "get_positions_sqroff", "get_cancel_gtt_order",
+                     "cancel_algo", "close_session"), RISK),
+    **dict.fromkeys(("place_order", "get_modify_order", "execute_order", "start_algo", "get_place_gtt_order",
+                     "get_modify_gtt_order", "get_position_conversion", "get_order_margin", "set_trading_mode"), TRADE),
+    **dict.fromkeys(("get_trade_book", "get_candles", "realized_pnl", "paper_replay", "portfolio_greeks"), BULK),
+}
+ADMISSION_EXEMPT_TOOLS = ("get_admission_metrics", "broker_health", "get_margin_batch_metrics",
+                          "get_modify_batch_metrics", "algo_status", "profile_calls")
+
+mcp.add_middleware(ToolCallLogging())
+# Modify calls mostly wait in the coalescer, so they are not capped below the global limit.
+admission = AdmissionControl(TOOL_PRIORITIES, ADMISSION_EXEMPT_TOOLS,
+                             tool_limits={"initiate_login": 1, "get_modify_order": GLOBAL_LIMIT,
+                                          **parse_limits(os.getenv("ALICE_TOOL_LIMITS", ""))})
+mcp.add_middleware(admission)
+# Sized to the admission limit (plus exempt tools) so admitted calls never queue again behind a small default pool.
+_tool_threads = ThreadPoolExecutor(max_workers=admission.global_limit + 4, thread_name_prefix="tool")
+def _account_scope() -> tuple:
+    """What broker answers depend on besides the request: trading mode, account and session."""
+    alice = _cached_client()
+    return trading_mode, getattr(alice, "user_id", None), getattr(alice, "user_session", None)
+
+margin_batcher = MarginBatcher(lambda items: get_alice_client().get_order_margins(items), scope=_account_scope)
+modify_coalescer = ModifyCoalescer(lambda items: get_alice_client().modify_orders(items))
+market_data = MarketData(lambda: get_alice_client(), is_live=lambda: trading_mode == "live")
+order_workflow = OrderWorkflow(lambda: get_alice_client(), margin_batcher)
+# The heartbeat only uses an existing session; it never triggers a browser login.
+account_state = RefreshScheduler(lambda: _cached_client(), {
+    "limits": lambda alice: alice.get_limits(),
+    "positions": lambda alice: alice.get_positions(),
+    "holdings": lambda alice: alice.get_holdings(),
+    "order_book": lambda alice: alice.get_order_book(),
+}, get_store())
+mcp.add_middleware(SnapshotInvalidation())
+# Bodies of blocking tools, looked up per call so the profiler can wrap armed ones.
+_tool_bodies: Dict[str, Callable] = {}
+profiler = Profiler(_tool_bodies, hooks=[(sys.modules[__name__], "get_alice_client", "auth"),
+                                         (AliceBlue, "_request", "broker_request")])
+# Innermost, so profiled time excludes the admission queue.
+mcp.add_middleware(ProfilingMiddleware(profiler))
+_pnl_engines: Dict[tuple, PnLEngine] = {}
+_pnl_lock = threading.Lock()
+algo_scheduler = AlgoScheduler(lambda: get_alice_client(), account_state.invalidate)
+health_monitor = HealthMonitor(lambda: _cached_client() if trading_mode == "live" else None, http_session, BASE_URL,
+                               is_live=lambda: trading_mode == "live")
+
+def tool(fn):
+    """Register `fn` as an MCP tool. Blocking tools run in worker threads, so a slow call does not
+    hold the event loop and admission control decides which calls run concurrently."""
+    if not inspect.iscoroutinefunction(fn):
+        blocking = fn
+        name = blocking.__name__
+        _tool_bodies[name] = blocking
+
+        @functools.wraps(blocking)
+        async def fn(*args, **kwargs):
+            call = functools.partial(contextvars.copy_context().run, _tool_bodies[name], *args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(_tool_threads, call)
+    return mcp.tool()(fn)
 
 def get_free_port():
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -22,11 +155,61 @@ def get_free_port():
     s.close()
     return port
 
+def _restore_alice_client() -> Optional[AliceBlue]:
+    """Adopt a session another worker already created, if one is in the shared store."""
+    global _alice_client
+    if trading_mode == "paper":
+        return None
+    session = get_store().get(SESSION_KEY)
+    if not session:
+        return None
+    alice = AliceBlue(app_key=os.getenv("ALICE_APP_KEY"), api_secret=os.getenv("ALICE_API_SECRET"))
+    alice.set_session(session["user_id"], session["user_session"])
+    _alice_client = alice
+    return _alice_client
+
+def _cached_client() -> Optional[AliceBlue]:
+    """The cached client, as long as its session is still the one in the shared store.
+
+    Another worker may have closed or replaced the session; a stale client is dropped.
+    """
+    global _alice_client
+    alice = _alice_client
+    if alice is None or isinstance(alice, PaperAliceBlue):
+        return alice
+    session = get_store().get(SESSION_KEY)
+    if session and session.get("user_session") == alice.user_session:
+        return alice
+    if _alice_client is alice:
+        _alice_client = None
+    return None
+
 def get_alice_client(force_refresh: bool = False) -> AliceBlue:
     """Return a cached AliceBlue client, authenticate only once unless forced."""
+    alice = _cached_client()
+    if alice and not force_refresh:
+        return alice
+    # Tools run in worker threads; only one of them may restore or log in.
+    with _client_lock:
+        return _create_alice_client(force_refresh)
+
+def _paper_account() -> PaperAliceBlue:
+    """This process's simulated account; it outlives re-logins and mode switches, keeping its book."""
+    global _paper_client
+    if _paper_client is None:
+        _paper_client = PaperAliceBlue()
+    return _paper_client
+
+def _create_alice_client(force_refresh: bool) -> AliceBlue:
     global _alice_client
 
-    if _alice_client and not force_refresh:
+    alice = _cached_client()
+    if alice and not force_refresh:
+        return alice
+    if not force_refresh and _restore_alice_client():
+        return _alice_client
+    if trading_mode == "paper":
+        _alice_client = _paper_account()
         return _alice_client
 
     app_key = os.getenv("ALICE_APP_KEY")
@@ -37,9 +220,43 @@ def get_alice_client(force_refresh: bool = False) -> AliceBlue:
 
     alice = AliceBlue(app_key=app_key, api_secret=api_secret)
     alice.authenticate() 
+    get_store().set(SESSION_KEY, {"user_id": alice.user_id, "user_session": alice.get_session()})
     _alice_client = alice
     return _alice_client
 
+def _select_streamed(records, where, fields, limit, count_only) -> dict:
+    rows, matched = select(records, where, fields, 0 if count_only else limit)
+    data = {"count": matched} if count_only else {"count": matched, "records": rows}
+    envelope = getattr(records, "envelope", None)
+    if envelope is not None:
+        data["response"] = envelope
+    return data
+
+def _snapshot_records(data) -> Optional[list]:
+    if isinstance(data, dict):
+        data = data.get("result", data.get("data"))
+    return data if isinstance(data, list) else None
+
+def _account_read(dataset: str, alice: AliceBlue, refresh: bool, stream=None, where=None, fields=None,
+                  limit=None, count_only=False) -> dict:
+    """Serve an account dataset from its background-refreshed snapshot, with a staleness note.
+
+    Filtered reads use the snapshot when one is fresh and otherwise stream from the broker.
+    """
+    if stream is not None and (where or fields or limit is not None or count_only):
+        found = account_state.read(dataset, alice, refresh, fetch=False)
+        records = _snapshot_records(found[0]) if found else None
+        if records is None:
+            return {"status": "success", "data": _select_streamed(stream(), where, fields, limit, count_only)}
+        return {"status": "success", "data": _select_streamed(records, where, fields, limit, count_only),
+                "staleness": found[1]}
+    data, staleness = account_state.read(dataset, alice, refresh)
+    return {"status": "success", "data": data, "staleness": staleness}
+
+def _start_background():
+    health_monitor.start()
+    account_state.start()
+
 def kill_port_process(port=8080):
     """Kill process using the specified port (Windows)"""
     try:
@@ -50,31 +267,31 @@ def kill_port_process(port=8080):
                 parts = line.split()
                 pid = parts[-1]
                 subprocess.run(['taskkill', '/F', '/PID', pid], capture_output=True)
-                print(f"Killed process {pid} using port {port}")
+                log.info("Killed process %s using port %s", pid, port)
                 return True
     except Exception as e:
-        print(f"Error killing process: {e}")
+        log.warning("Error killing process: %s", e)
     return False
 
 
-@mcp.tool()
+@tool
 def check_and_authenticate() -> dict:
     """Check if AliceBlue session is active."""
-    global _alice_client
     try:
-        if not _alice_client:
+        alice = _cached_client() or _restore_alice_client()
+        if not alice:
             return {
                 "status": "error",
                 "authenticated": False,
                 "message": "No active session. Please run initiate_login first."
             }
 
-        session_id = _alice_client.get_session()
+        session_id = alice.get_session()
         return {
             "status": "success",
             "authenticated": True,
             "session_id": session_id,
-            "user_id": _alice_client.user_id,
+            "user_id": alice.user_id,
             "message": "Session is active"
         }
     except Exception as e:
@@ -85,7 +302,7 @@ def check_and_authenticate() -> dict:
         }
 
 
-@mcp.tool()
+@tool
 def initiate_login(force_refresh: bool = False) -> dict:
     """Login and create a new AliceBlue session if none exists or forced."""
     try:
@@ -104,18 +321,20 @@ def initiate_login(force_refresh: bool = False) -> dict:
             "message": f"Login failed: {e}"
         }
 
-@mcp.tool()
+@tool
 def close_session() -> dict:
-    """Explicitly close the current session (forces next call to re-authenticate)."""
+    """Explicitly close the current session (forces next call to re-authenticate, on every worker)."""
     global _alice_client
     _alice_client = None
+    if trading_mode == "live":
+        get_store().delete(SESSION_KEY)
     return {
         "status": "success",
         "message": "Session closed. Next call will require re-authentication."
     }
 
 
-@mcp.tool()
+@tool
 def get_profile() -> dict:
     """Fetches the user's profile details."""
     try:
@@ -125,27 +344,28 @@ def get_profile() -> dict:
         return {"status": "error", "message": str(e)}
 
 
-@mcp.tool()
-def get_holdings() -> dict:
-    """Fetches the user's Holdings Stock"""
+@tool
+def get_holdings(where: Optional[Dict[str, str]] = None, fields: Optional[List[str]] = None,
+                 limit: Optional[int] = None, count_only: bool = False, refresh: bool = False) -> dict:
+    """Fetches the user's Holdings Stock from the latest background snapshot (see "staleness"; refresh=true
+    calls the broker). Optional where/fields/limit/count_only filter the records."""
     try:
         alice = get_alice_client()
-        return {"status": "success", "data": alice.get_holdings()}
+        return _account_read("holdings", alice, refresh, alice.iter_holdings, where, fields, limit, count_only)
     except Exception as e:
         return {"status": "error", "message": str(e)}
     
-@mcp.tool()
-def get_positions()-> dict:
-    """Fetches the user's Positions"""
+@tool
+def get_positions(refresh: bool = False)-> dict:
+    """Fetches the user's Positions from the latest background snapshot (refresh=true calls the broker)"""
     try:
-        alice = get_alice_client()
-        return{"status": "success", "data": alice.get_positions()}
+        return _account_read("positions", get_alice_client(), refresh)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_positions_sqroff(exch: str, symbol: str, qty: str, product: str, 
-                         transaction_type: str)-> dict:
+@tool
+def get_positions_sqroff(exch: Exchange, symbol: str, qty: str, product: Product, 
+                         transaction_type: TransactionType)-> dict:
     """Position Square Off"""
     try:
         alice = get_alice_client()
@@ -162,9 +382,9 @@ def get_positions_sqroff(exch: str, symbol: str, qty: str, product: str,
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_position_conversion(exchange: str, validity: str, prevProduct: str, product: str, quantity: int, 
-                            tradingSymbol: str, transactionType: str, orderSource: str)->dict:
+@tool
+def get_position_conversion(exchange: Exchange, validity: Validity, prevProduct: Product, product: Product, quantity: int, 
+                            tradingSymbol: str, transactionType: TransactionType, orderSource: str)->dict:
     """Position conversion"""
     try:
         alice = get_alice_client()
@@ -184,9 +404,9 @@ def get_position_conversion(exchange: str, validity: str, prevProduct: str, prod
     except Exception as e:
         return {"status": "error", "message": str(e)}
     
-@mcp.tool()
-def place_order(instrument_id: str, exchange: str, transaction_type: str, quantity: int, order_type: str, product: str,
-                    order_complexity: str, price: float, validity: str) -> dict:
+@tool
+def place_order(instrument_id: str, exchange: Exchange, transaction_type: TransactionType, quantity: int, order_type: OrderType, product: Product,
+                    order_complexity: Complexity, price: float, validity: Validity) -> dict:
     """Places an order for the given stock."""
     try:
         alice = get_alice_client()
@@ -207,19 +427,19 @@ def place_order(instrument_id: str, exchange: str, transaction_type: str, quanti
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_order_book()-> dict:
-    """Fetches Order Book"""
+@tool
+def get_order_book(where: Optional[Dict[str, str]] = None, fields: Optional[List[str]] = None,
+                   limit: Optional[int] = None, count_only: bool = False, refresh: bool = False)-> dict:
+    """Fetches Order Book from the latest background snapshot (see "staleness"; refresh=true calls the broker).
+    Optional where (e.g. {"orderStatus": "open"}), fields, limit or count_only filter and project the book
+    instead of returning it whole."""
     try:
         alice = get_alice_client()
-        return {
-            "status": "success",
-            "data": alice.get_order_book()
-        }
+        return _account_read("order_book", alice, refresh, alice.iter_order_book, where, fields, limit, count_only)
     except Exception as e:
         return {"status": "error", "message": str(e)}
     
-@mcp.tool()
+@tool
 def get_order_history(brokerOrderId: str)-> dict:
     """Fetchs Orders History"""
     try:
@@ -233,26 +453,19 @@ def get_order_history(brokerOrderId: str)-> dict:
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_modify_order(brokerOrderId:str, validity: str , quantity: Optional[int] = None,
-                     price: Optional[Union[int, float]] = None, triggerPrice: Optional[float] = None)-> dict:
-    """Modify Order"""
+@tool
+async def get_modify_order(brokerOrderId:str, validity: Validity , quantity: Optional[int] = None,
+                           price: Optional[Union[int, float]] = None, triggerPrice: Optional[float] = None)-> dict:
+    """Modify Order. Rapid re-prices of the same order are coalesced: only the latest pending values are
+    sent, one modify at a time per order; `coalesced` counts the earlier updates folded into this one."""
     try:
-        alice = get_alice_client()
-        return {
-            "status": "success",
-            "data": alice.get_modify_order(
-                brokerOrderId = brokerOrderId,
-                quantity= quantity if quantity else "",
-                validity= validity,
-                price= price if price else "",
-                triggerPrice=triggerPrice if triggerPrice else ""
-            )
-        }
+        item = AliceBlue.modify_item(brokerOrderId, validity, quantity, price, triggerPrice)
+        response, coalesced = await modify_coalescer.submit(item)
+        return {"status": "success", "data": response, "coalesced": coalesced}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
+@tool
 def get_cancel_order(brokerOrderId: str)-> dict:
     """Cancel Order"""
     try:
@@ -266,11 +479,14 @@ def get_cancel_order(brokerOrderId: str)-> dict:
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_trade_book()-> dict:
-    """Fetches Trade Book"""
+@tool
+def get_trade_book(where: Optional[Dict[str, str]] = None, fields: Optional[List[str]] = None,
+                   limit: Optional[int] = None, count_only: bool = False)-> dict:
+    """Fetches Trade Book. Optional where/fields/limit/count_only filter while streaming."""
     try:
         alice = get_alice_client()
+        if where or fields or limit is not None or count_only:
+            return {"status": "success", "data": _select_streamed(alice.iter_trade_book(), where, fields, limit, count_only)}
         return{
             "status": "success",
             "data": alice.get_trade_book()
@@ -278,16 +494,15 @@ def get_trade_book()-> dict:
     except Exception as e:
         return {"status": "error", "message" : str(e)}
 
-@mcp.tool()
-def get_order_margin(exchange:str, instrumentId:str, transactionType:str, quantity:int, product:str, 
-                         orderComplexity:str, orderType:str, validity:str, price=0.0, 
+@tool
+async def get_order_margin(exchange: Exchange, instrumentId:str, transactionType: TransactionType, quantity:int, product: Product, 
+                         orderComplexity: Complexity, orderType: OrderType, validity: Validity, price=0.0, 
                          slTriggerPrice: Optional[Union[int, float]] = None)-> dict:
     """Order Margin"""
     try:
-        alice = get_alice_client()
         return{
             "status": "success",
-            "data": alice.get_order_margin(
+            "data": await margin_batcher.submit(AliceBlue.margin_item(
                 exchange=exchange,
                 instrumentId = instrumentId,
                 transactionType=transactionType,
@@ -297,14 +512,65 @@ def get_order_margin(exchange:str, instrumentId:str, transactionType:str, quanti
                 orderType=orderType,
                 validity=validity,
                 price=price,
-                slTriggerPrice= slTriggerPrice if slTriggerPrice is not None else ""
-            )
+                slTriggerPrice=slTriggerPrice
+            ))
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_exit_bracket_order(brokerOrderId: str, orderComplexity:str)->dict:
+@tool
+def get_margin_batch_metrics() -> dict:
+    """Batching factor, memo hits and estimated latency saved by margin-check coalescing"""
+    return {"status": "success", "data": margin_batcher.metrics()}
+
+@tool
+def get_modify_batch_metrics() -> dict:
+    """Updates coalesced, orders per modify call and broker calls saved by order-modify coalescing"""
+    return {"status": "success", "data": modify_coalescer.metrics()}
+
+@tool
+def get_admission_metrics() -> dict:
+    """Concurrency, queue depth, wait-time percentiles and shed counts of tool admission control"""
+    return {"status": "success", "data": admission.metrics()}
+
+@tool
+def broker_health() -> dict:
+    """Circuit-breaker state, recent latency per broker endpoint, session heartbeat and background refresh status"""
+    return {"status": "success", "data": {"heartbeat": health_monitor.status(), "endpoints": breakers.snapshot(),
+                                          "account_refresh": account_state.status()}}
+
+@tool
+async def profile_calls(action: str = "start", tools: Optional[List[str]] = None, calls: int = 10,
+                        mode: str = "spans", interval_ms: float = 5.0, write_file: bool = False) -> dict:
+    """Profile the next `calls` invocations of `tools` while the server runs.
+
+    action "start" arms profiling (mode "spans": per-stage timings for validation, auth, HTTP
+    connect/send/wait/read, decode and encode; "deterministic" adds cProfile of blocking tool
+    bodies; "sampling" adds stack samples every `interval_ms`). "report" returns the aggregated
+    stage breakdown and flame-graph folded stacks so far, "stop" disarms and reports.
+    `write_file` also writes the folded stacks (and a .prof for deterministic mode) to disk.
+    """
+    try:
+        if action == "start":
+            if not tools:
+                return {"status": "error", "message": "tools is required to start profiling"}
+            known = {t.name for t in (await mcp.get_tools()).values()}
+            unknown = sorted(set(tools) - known)
+            if unknown or "profile_calls" in tools:
+                return {"status": "error", "message": f"Cannot profile: {', '.join(unknown or ['profile_calls'])}"}
+            profiler.start(tools, calls, mode, interval_ms)
+            return {"status": "success", "message": f"Profiling the next {calls} calls of {', '.join(tools)} "
+                                                    f"({mode})", "modes": PROFILE_MODES}
+        if action == "stop":
+            profiler.stop()
+        elif action != "report":
+            return {"status": "error", "message": f"Invalid action '{action}'. Must be start, report or stop"}
+        return {"status": "success", "data": profiler.report(write_file)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def get_exit_bracket_order(brokerOrderId: str, orderComplexity: Complexity)->dict:
     """Exit Bracket Order"""
     try:
         alice = get_alice_client()
@@ -318,9 +584,9 @@ def get_exit_bracket_order(brokerOrderId: str, orderComplexity:str)->dict:
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_place_gtt_order(tradingSymbol: str, exchange: str, transactionType: str, orderType: str,
-                            product: str, validity: str, quantity: int, price: float, orderComplexity: str, 
+@tool
+def get_place_gtt_order(tradingSymbol: str, exchange: Exchange, transactionType: TransactionType, orderType: OrderType,
+                            product: Product, validity: Validity, quantity: int, price: float, orderComplexity: Complexity, 
                             instrumentId: str, gttType: str, gttValue: float)->dict:
     """Place GTT Order"""
     try:
@@ -345,8 +611,8 @@ def get_place_gtt_order(tradingSymbol: str, exchange: str, transactionType: str,
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_gtt_order_book(self):
+@tool
+def get_gtt_order_book() -> dict:
     """Fetches GTT Order Book"""
     try:
         alice = get_alice_client()
@@ -357,10 +623,10 @@ def get_gtt_order_book(self):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
+@tool
 def get_modify_gtt_order(brokerOrderId: str, instrumentId: str, tradingSymbol: str, 
-                            exchange: str, orderType: str, product: str, validity: str, 
-                            quantity: int, price: float, orderComplexity: str, 
+                            exchange: Exchange, orderType: OrderType, product: Product, validity: Validity, 
+                            quantity: int, price: float, orderComplexity: Complexity, 
                             gttType: str, gttValue: float)->dict:
     """Modify GTT Order"""
     try:
@@ -385,7 +651,7 @@ def get_modify_gtt_order(brokerOrderId: str, instrumentId: str, tradingSymbol: s
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
+@tool
 def get_cancel_gtt_order(brokerOrderId: str):
     """Cancel Order"""
     try:
@@ -399,27 +665,237 @@ def get_cancel_gtt_order(brokerOrderId: str):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@mcp.tool()
-def get_limits():
-    """Get Limits"""
+@tool
+def get_limits(refresh: bool = False):
+    """Get Limits from the latest background snapshot (refresh=true calls the broker)"""
     try:
-        alice = get_alice_client()
-        return{
-            "status": "success",
-            "data": alice.get_limits()
-        }
+        return _account_read("limits", get_alice_client(), refresh)
     except Exception as e:
         return {"status": "error", "message": str(e)}
     
-if __name__ == "__main__":
-    app_key = os.getenv("ALICE_APP_KEY")
-    api_secret = os.getenv("ALICE_API_SECRET")
-    if not app_key or not api_secret:
-        raise Exception("Missing credentials. Please set ALICE_APP_KEY and ALICE_API_SECRET in .env file")
-    if not AliceBlue(app_key, api_secret)._is_port_available(8080):
-        print(f"Port 8080 is busy. Attempting to free it...")
-        kill_port_process(8080)
-        time.sleep(2)
-    port = get_free_port()
-    mcp.run(transport="sse", host="127.0.0.1", port=port)
+@tool
+async def execute_order(instrument_id: str, exchange: Exchange, transaction_type: TransactionType, quantity: int, order_type: OrderType,
+                        product: Product, order_complexity: Complexity, price: float, validity: Validity,
+                        sl_leg_price: Optional[float] = None, target_leg_price: Optional[float] = None,
+                        sl_trigger_price: Optional[float] = None, trailing_sl_amount: Optional[float] = None,
+                        trading_symbol: Optional[str] = None, gtt_type: Optional[str] = None,
+                        gtt_value: Optional[float] = None, check_margin: bool = True,
+                        wait_for: str = "accepted", timeout: float = 10.0,
+                        cancel_on_timeout: bool = False) -> dict:
+    """Margin check, place and confirm an order in one call.
+
+    Set sl_leg_price/target_leg_price with order_complexity "BO" for bracket orders, or gtt_type,
+    gtt_value and trading_symbol for GTT orders. wait_for is "accepted" or "terminal"; the result
+    carries per-stage timings in milliseconds.
+    """
+    return await order_workflow.execute_order(
+        instrument_id=instrument_id, exchange=exchange, transaction_type=transaction_type, quantity=quantity,
+        order_type=order_type, product=product, order_complexity=order_complexity, price=price, validity=validity,
+        sl_leg_price=sl_leg_price, target_leg_price=target_leg_price, sl_trigger_price=sl_trigger_price,
+        trailing_sl_amount=trailing_sl_amount, trading_symbol=trading_symbol, gtt_type=gtt_type,
+        gtt_value=gtt_value, check_margin=check_margin, wait_for=wait_for, timeout=timeout,
+        cancel_on_timeout=cancel_on_timeout)
+
+def get_pnl_engine(alice: AliceBlue) -> PnLEngine:
+    """P&L engine per account; live accounts journal fills so lots carry across days."""
+    key = (type(alice).__name__, alice.user_id)
+    with _pnl_lock:
+        engine = _pnl_engines.get(key)
+        if engine is None:
+            journal = None if isinstance(alice, PaperAliceBlue) else os.path.join(JOURNAL_DIR, f"{alice.user_id}.csv")
+            engine = _pnl_engines[key] = PnLEngine(journal)
+    return engine
+
+@tool
+def realized_pnl(method: str = "FIFO", instrument: Optional[str] = None, marks: Optional[Dict[str, float]] = None,
+                 mark_to_market: bool = False) -> dict:
+    """Realized/unrealized P&L, average cost, open lots and estimated charges per instrument from trade-book fills.
+    method is "FIFO" or "AVERAGE" cost; only fills not seen before are processed. marks maps "EXCHANGE:instrumentId"
+    to a price for unrealized P&L (default: last fill price); mark_to_market=true uses live quotes instead."""
+    try:
+        alice = get_alice_client()
+        engine = get_pnl_engine(alice)
+        records = alice.iter_trade_book()
+        new_fills = engine.ingest(records)
+        marks = dict(marks or {})
+        if mark_to_market:
+            for book in engine.books.values():
+                key = f"{book.exchange}:{book.token}"
+                if book.net and key not in marks:
+                    ltp = find_key(market_data.get_quote(book.exchange, book.token), ("ltp", "lastTradedPrice", "lastPrice"))
+                    if ltp is not None:
+                        marks[key] = float(ltp)
+        data = engine.summary(method, marks, instrument)
+        data["new_fills"] = new_fills
+        envelope = getattr(records, "envelope", None)
+        if envelope is not None:
+            data["response"] = envelope
+        return {"status": "success", "data": data}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def portfolio_greeks(spots: Optional[Dict[str, float]] = None, price_shifts_pct: Optional[List[float]] = None,
+                     vol_shifts: Optional[List[float]] = None, days: Optional[List[float]] = None,
+                     include_legs: bool = False, refresh: bool = False) -> dict:
+    """Net delta/gamma/vega/theta, implied volatility and what-if P&L of the F&O positions.
+
+    Strike, expiry and CE/PE are parsed from each position's trading symbol. spots maps underlying
+    (e.g. "NIFTY") to its price; without one it is implied from a CE/PE pair or a futures leg.
+    The P&L grid covers price_shifts_pct (% moves of every underlying, default -10..10) x vol_shifts
+    (vol points, default -5/0/+5) x days forward (default 0/1/7) and is indexed [day][vol][price];
+    expiry_payoff is P&L at expiry against average cost over the same price moves."""
+    try:
+        price_shifts_pct = price_shifts_pct if price_shifts_pct is not None else list(range(-10, 11, 2))
+        vol_shifts = vol_shifts if vol_shifts is not None else [-5.0, 0.0, 5.0]
+        days = days if days is not None else [0.0, 1.0, 7.0]
+        if len(price_shifts_pct) * len(vol_shifts) * len(days) > MAX_SCENARIOS:
+            return {"status": "error", "message": f"At most {MAX_SCENARIOS} scenarios per call"}
+        data, staleness = account_state.read("positions", get_alice_client(), refresh)
+        book = OptionBook(_snapshot_records(data) or [], spots)
+        result = book.summary(include_legs)
+        result.update(book.scenario_report(price_shifts_pct, vol_shifts, days))
+        return {"status": "success", "data": result, "staleness": staleness}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
+@tool
+async def start_algo(algo: str, instrument_id: str, exchange: Exchange, transaction_type: TransactionType, quantity: int,
+                     product: Product, price: Optional[float] = None, duration_minutes: float = 30.0,
+                     slices: Optional[int] = None, display_quantity: Optional[int] = None,
+                     profile: Optional[List[float]] = None, on_end: str = "cancel", validity: Validity = "DAY") -> dict:
+    """Work a large parent order in the server as child orders. algo: "TWAP" (even slices over duration_minutes),
+    "VWAP" (slices weighted by an intraday volume profile, or `profile` weights per 30 minutes from 09:15) or
+    "ICEBERG" (one child of display_quantity working at a time). price makes children LIMIT orders, otherwise
+    MARKET. on_end (TWAP/VWAP): "cancel" the unfilled rest, sweep it at "market", or "leave" it working.
+    Returns an algo_id for algo_status and cancel_algo. Only available on single-worker servers, since
+    algos run inside the worker that started them."""
+    if worker_count > 1:
+        return {"status": "error", "message": f"Algos run inside one worker process; with {worker_count} workers "
+                                              "algo_status and cancel_algo could not reach them. Use --workers 1"}
+    try:
+        return {"status": "success", "data": await algo_scheduler.start(
+            algo, instrument_id, exchange, transaction_type, quantity, product, price, duration_minutes * 60,
+            slices, display_quantity, profile, on_end, validity)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def algo_status(algo_id: Optional[str] = None) -> dict:
+    """Progress of an execution algo (all algos if algo_id is omitted): fills, average price, working and child orders"""
+    try:
+        return {"status": "success", "data": algo_scheduler.status(algo_id)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+async def cancel_algo(algo_id: str) -> dict:
+    """Stop an execution algo and cancel its working child orders"""
+    try:
+        return {"status": "success", "data": await algo_scheduler.cancel(algo_id)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def set_trading_mode(mode: str) -> dict:
+    """Switch this server between "live" broker trading and in-process "paper" trading.
+
+    Only a single-worker server can switch at runtime; multi-worker servers take the mode from
+    ALICE_TRADING_MODE at start-up, since the mode and paper books live in each worker process.
+    """
+    global _alice_client, trading_mode
+    mode = mode.lower()
+    if mode not in TRADING_MODES:
+        return {"status": "error", "message": f"Unknown mode {mode}; use one of {TRADING_MODES}"}
+    if mode != trading_mode and worker_count > 1:
+        return {"status": "error", "mode": trading_mode,
+                "message": f"Cannot switch modes across {worker_count} workers; "
+                           "restart with ALICE_TRADING_MODE set instead"}
+    if mode != trading_mode:
+        trading_mode = mode
+        _alice_client = None
+    return {"status": "success", "mode": trading_mode}
+
+@tool
+def paper_replay(ticks: Optional[int] = 1000) -> dict:
+    """Advance the paper-trading tick file by N ticks (all remaining if null)"""
+    try:
+        alice = get_alice_client()
+        if not isinstance(alice, PaperAliceBlue):
+            return {"status": "error", "message": "Not in paper trading mode"}
+        return {"status": "success", "data": {"ticks": alice.replay(ticks), "clock": alice.engine.clock}}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def get_candles(exchange: Exchange, instrumentId: str, from_time: str, to_time: str, resolution: Resolution = "1") -> dict:
+    """OHLCV candles for an instrument. Times are IST "YYYY-MM-DD[ HH:MM]"; resolution "1" (minute) or "D" (day)."""
+    try:
+        candles = market_data.get_candles(exchange, instrumentId, resolution, from_time, to_time)
+        return {"status": "success", "data": candles_to_table(candles)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@tool
+def get_quote(exchange: Exchange, instrumentId: str) -> dict:
+    """Latest quote for an instrument"""
+    try:
+        return {"status": "success", "data": market_data.get_quote(exchange, instrumentId)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+def create_app():
+    """ASGI app factory for multi-worker streamable HTTP (`uvicorn server:create_app --factory`).
+
+    Stateless mode lets any worker serve any request; the AliceBlue session lives in the shared store.
+    """
+    _start_background()
+    return mcp.http_app(transport="http", stateless_http=True, json_response=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AliceBlue MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "http"],
+                        default=os.getenv("ALICE_MCP_TRANSPORT", "http"))
+    parser.add_argument("--host", default=os.getenv("ALICE_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ALICE_MCP_PORT", "8000")),
+                        help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ALICE_MCP_WORKERS", "1")),
+                        help="worker processes sharing the port (http transport only)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Paper trading needs neither broker credentials nor the login callback port.
+    if trading_mode == "live":
+        app_key = os.getenv("ALICE_APP_KEY")
+        api_secret = os.getenv("ALICE_API_SECRET")
+        if not app_key or not api_secret:
+            raise Exception("Missing credentials. Please set ALICE_APP_KEY and ALICE_API_SECRET in .env file")
+        if not AliceBlue(app_key, api_secret)._is_port_available(8080):
+            log.warning("Port 8080 is busy. Attempting to free it...")
+            kill_port_process(8080)
+            time.sleep(2)
+
+    if args.transport == "stdio":
+        _start_background()
+        mcp.run(transport="stdio")
+        return
+    port = args.port or get_free_port()
+    log.info("Starting MCP server", extra={"transport": args.transport, "host": args.host,
+                                           "port": port, "workers": args.workers})
+    if args.transport == "http":
+        import uvicorn
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.environ["ALICE_MCP_WORKERS"] = str(args.workers)
+        uvicorn.run("server:create_app", factory=True, host=args.host, port=port,
+                    workers=args.workers, log_level="warning")
+        return
+    _start_background()
+    mcp.run(transport=args.transport, host=args.host, port=port)
+
+
+if __name__ == "__main__":
+    main()
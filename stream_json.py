@@ -0,0 +1,210 @@
+"""Incremental decoding of large broker list payloads.
+
+The body is scanned chunk by chunk for the record array (the top-level array, or the array
+under "result"/"data"); each record is kept as raw bytes in a LazyRecord and only decoded
+when a field is read. orjson is used as the decoder when installed.
+"""
+import re
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+    loads: Callable = orjson.loads
+    BACKEND = "orjson"
+except ImportError:  # pragma: no cover - depends on the environment
+    loads = json.loads
+    BACKEND = "json"
+
+RECORD_KEYS = (b"result", b"data")
+CHUNK_SIZE = 64 * 1024
+
+# A complete string, a lone quote (string continues in the next chunk), or a bracket.
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|"|[{}\[\]]', re.DOTALL)
+_field_patterns: Dict[str, "re.Pattern"] = {}
+
+
+def _flat_record(buffer: bytes, start: int) -> Optional[bytes]:
+    """The object starting at `start` if it is complete, flat and escape-free, using only C-level scans."""
+    end = buffer.find(b"}", start)
+    if end < 0:
+        return None
+    record = buffer[start:end + 1]
+    if record.count(b"{") != 1 or b"[" in record or b"\\" in record or record.count(b'"') % 2:
+        return None
+    return record
+
+
+def _field_pattern(key: str) -> "re.Pattern":
+    pattern = _field_patterns.get(key)
+    if pattern is None:
+        pattern = _field_patterns[key] = re.compile(
+            rb'(?<!\\)"' + re.escape(key.encode()) + rb'"\s*:\s*("(?:[^"\\]|\\.)*"|[^,}\]\s]+)')
+    return pattern
+
+
+class LazyRecord:
+    """A JSON object kept as bytes; single fields are extracted on demand.
+
+    Field reads use a targeted scan that assumes flat records (as broker books are) and fall
+    back to a full decode for nested values; `to_dict()` decodes everything.
+    """
+
+    __slots__ = ("raw", "_data", "_fields")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._data = None
+        self._fields = {}
+
+    def to_dict(self) -> dict:
+        if self._data is None:
+            self._data = loads(self.raw)
+        return self._data
+
+    def get(self, key: str, default=None):
+        if self._data is not None:
+            return self._data.get(key, default)
+        if key in self._fields:
+            return self._fields[key]
+        token = self._scan(key) if b"\\" not in self.raw else None
+        if token is None:
+            match = _field_pattern(key).search(self.raw)
+            if match is None:
+                return default
+            token = match.group(1)
+        if token[:1] in (b"{", b"["):
+            return self.to_dict().get(key, default)
+        value = self._fields[key] = loads(token)
+        return value
+
+    def _scan(self, key: str) -> Optional[bytes]:
+        """Raw value of `key` via bytes.find; only valid for records without escapes."""
+        raw, needle = self.raw, b'"' + key.encode() + b'"'
+        start = raw.find(needle)
+        while start >= 0:
+            i = start + len(needle)
+            while raw[i:i + 1] in (b" ", b"\n", b"\t", b"\r"):
+                i += 1
+            if raw[i:i + 1] == b":":
+                i += 1
+                while raw[i:i + 1] in (b" ", b"\n", b"\t", b"\r"):
+                    i += 1
+                if raw[i:i + 1] == b'"':
+                    return raw[i:raw.find(b'"', i + 1) + 1]
+                end = i
+                while raw[end:end + 1] not in (b",", b"}", b"]", b""):
+                    end += 1
+                return raw[i:end].strip()
+            start = raw.find(needle, start + 1)
+        return None
+
+    def __getitem__(self, key: str):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def project(self, fields: Iterable[str]) -> dict:
+        return {field: self.get(field) for field in fields}
+
+
+class RecordStream:
+    """Iterate the records of a JSON body delivered as byte chunks.
+
+    If the body has no record array (e.g. a broker error), it is decoded whole and exposed as
+    `envelope` once iteration finishes.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], record_keys: Tuple[bytes, ...] = RECORD_KEYS):
+        self._chunks = chunks
+        self._record_keys = record_keys
+        self.envelope = None
+        self.bytes_read = 0
+        self.records = 0
+
+    def __iter__(self) -> Iterator[LazyRecord]:
+        buffer = b""
+        pos = 0
+        depth = 0
+        in_array = False
+        array_depth = -1
+        record_start = -1
+        last_key = None
+        head = []
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            self.bytes_read += len(chunk)
+            buffer += chunk
+            while True:
+                match = _TOKEN.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                token = match.group()
+                if token == b'"':
+                    # Unterminated string: wait for the next chunk.
+                    pos = match.start()
+                    break
+                pos = match.end()
+                first = token[:1]
+                if first == b'"':
+                    if depth == 1 and not in_array:
+                        last_key = token[1:-1]
+                    continue
+                if first == b"{" and in_array and depth == array_depth:
+                    record = _flat_record(buffer, match.start())
+                    if record is not None:
+                        pos = match.start() + len(record)
+                        self.records += 1
+                        yield LazyRecord(record)
+                        continue
+                if first in (b"{", b"["):
+                    depth += 1
+                    if not in_array and first == b"[" and (depth == 1 or (depth == 2 and last_key in self._record_keys)):
+                        in_array, array_depth = True, depth
+                    elif in_array and depth == array_depth + 1 and first == b"{":
+                        record_start = match.start()
+                else:
+                    depth -= 1
+                    if in_array and depth == array_depth and record_start >= 0:
+                        self.records += 1
+                        yield LazyRecord(buffer[record_start:pos])
+                        record_start = -1
+                    elif in_array and depth == array_depth - 1:
+                        in_array = False
+            # Keep only what an unfinished record (or the envelope, before the array) still needs.
+            if record_start >= 0:
+                buffer, pos, record_start = buffer[record_start:], pos - record_start, 0
+            elif in_array or self.records:
+                buffer, pos = buffer[pos:], 0
+            else:
+                head.append(buffer[:pos])
+                buffer, pos = buffer[pos:], 0
+        if not self.records and array_depth < 0:
+            body = b"".join(head) + buffer
+            self.envelope = loads(body) if body.strip() else None
+
+
+def select(records: Iterable, where: Optional[Dict[str, object]] = None,
+           fields: Optional[List[str]] = None, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+    """Filter (case-insensitive equality) and project records while they stream.
+
+    Records may be LazyRecords or plain dicts (e.g. from the paper-trading client).
+
+    Returns the kept rows (at most `limit`) and the total number of matches.
+    """
+    conditions = [(key, str(value).lower()) for key, value in (where or {}).items()]
+    rows, matched = [], 0
+    for record in records:
+        if any(str(record.get(key)).lower() != value for key, value in conditions):
+            continue
+        matched += 1
+        if limit is None or len(rows) < limit:
+            if fields:
+                rows.append({field: record.get(field) for field in fields})
+            else:
+                rows.append(record.to_dict() if isinstance(record, LazyRecord) else record)
+    return rows, matched
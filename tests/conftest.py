@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point every on-disk location at a scratch directory before any project module reads it.
+_scratch = tempfile.mkdtemp(prefix="alice-tests-")
+os.environ.setdefault("ALICE_STORE_PATH", os.path.join(_scratch, "store.sqlite"))
+os.environ.setdefault("ALICE_PNL_JOURNAL_DIR", os.path.join(_scratch, "pnl"))
+os.environ.setdefault("ALICE_PROFILE_DIR", os.path.join(_scratch, "profiles"))
+os.environ.setdefault("ALICE_CANDLE_CACHE", os.path.join(_scratch, "candles"))
+os.environ.setdefault("ALICE_HEARTBEAT_SECONDS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def call_tool():
+    """Call a server tool through an in-memory MCP client; returns its structured result."""
+    from fastmcp import Client
+    import server
+
+    def call(name, **arguments):
+        async def run():
+            async with Client(server.mcp) as client:
+                result = await client.call_tool(name, arguments, raise_on_error=False)
+                return result.structured_content
+        return asyncio.run(run())
+    return call
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from admission import BULK, READ, RISK, TRADE, AdmissionControl, Shed, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits("initiate_login=1, get_candles = 2,bogus") == {"initiate_login": 1, "get_candles": 2}
+
+
+def test_freed_slots_go_to_the_most_urgent_waiter():
+    admission = AdmissionControl({}, global_limit=1)
+    order = []
+
+    async def call(tool, priority):
+        await admission.acquire(tool, priority)
+        order.append(tool)
+
+    async def run():
+        await admission.acquire("holder", READ)
+        waiters = [asyncio.create_task(call(tool, priority))
+                   for tool, priority in (("bulk", BULK), ("read", READ), ("trade", TRADE), ("risk", RISK))]
+        await asyncio.sleep(0)
+        for _ in waiters:
+            admission.release(order[-1] if order else "holder")
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert order == ["risk", "trade", "read", "bulk"]
+
+
+def test_per_tool_limit_does_not_block_other_tools():
+    admission = AdmissionControl({}, global_limit=4, tool_limits={"get_candles": 1})
+
+    async def run():
+        await admission.acquire("get_candles", BULK)
+        blocked = asyncio.create_task(admission.acquire("get_candles", BULK))
+        await admission.acquire("get_limits", READ)
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        admission.release("get_candles")
+        await blocked
+
+    asyncio.run(run())
+    assert admission.running == 2 and admission.running_by_tool["get_candles"] == 1
+
+
+def test_full_queue_sheds_the_least_urgent_waiter():
+    admission = AdmissionControl({}, global_limit=1, max_queued=1)
+
+    async def run():
+        await admission.acquire("holder", READ)
+        bulk = asyncio.create_task(admission.acquire("get_trade_book", BULK))
+        await asyncio.sleep(0)
+        risk = asyncio.create_task(admission.acquire("get_cancel_order", RISK))
+        await asyncio.sleep(0)
+        with pytest.raises(Shed, match="displaced"):
+            await bulk
+        with pytest.raises(Shed, match="queue full"):
+            await admission.acquire("get_candles", BULK)
+        admission.release("holder")
+        await risk
+
+    asyncio.run(run())
+
+
+def test_waiters_are_shed_after_their_class_deadline():
+    admission = AdmissionControl({}, global_limit=1, max_wait={BULK: 0.01})
+
+    async def run():
+        await admission.acquire("holder", READ)
+        with pytest.raises(Shed, match="waited over"):
+            await admission.acquire("get_candles", BULK)
+
+    asyncio.run(run())
+    assert admission.metrics()["queued"] == 0
+
+
+def test_server_answers_busy_instead_of_queueing_forever(call_tool, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.admission, "global_limit", 0)
+    monkeypatch.setattr(server.admission, "max_queued", 0)
+    result = call_tool("get_limits")
+    assert result["status"] == "error" and result["message"].startswith("Server busy")
+    assert call_tool("get_admission_metrics")["status"] == "success"
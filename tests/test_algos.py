@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import server
+from algos import AlgoScheduler, IST, profile_weights, slice_targets
+
+
+class FakeBroker:
+    """Orders open until cancelled (or fill on the next book read with fill=True); placement can be held to
+    simulate a slow broker."""
+
+    def __init__(self, id_key="brokerOrderId", fill=False):
+        self.id_key = id_key
+        self.fill = fill
+        self.orders = {}
+        self.modifies = []
+        self.cancelled = []
+        self.release = threading.Event()
+        self.release.set()
+        self.sent = threading.Event()
+
+    def get_place_order(self, **order):
+        self.sent.set()
+        self.release.wait(5)
+        order_id = f"C{len(self.orders) + 1}"
+        self.orders[order_id] = dict(order, status="open")
+        return {"status": "Ok", "result": [{self.id_key: order_id}]}
+
+    def get_modify_order(self, brokerOrderId, validity, quantity=None, price=None):
+        self.modifies.append((brokerOrderId, quantity))
+        self.orders[brokerOrderId]["quantity"] = quantity
+        return {"status": "Ok", "result": [{self.id_key: brokerOrderId}]}
+
+    def get_cancel_order(self, brokerOrderId):
+        self.cancelled.append(brokerOrderId)
+        self.orders[brokerOrderId]["status"] = "cancelled"
+        return {"status": "Ok"}
+
+    def get_order_book(self):
+        if self.fill:
+            for order in self.orders.values():
+                if order["status"] == "open":
+                    order.update(status="complete", filled=order["quantity"])
+        return {"status": "Ok", "result": [{self.id_key: order_id, "orderStatus": order["status"],
+                                            "filledQuantity": order.get("filled", 0)}
+                                           for order_id, order in self.orders.items()]}
+
+
+def test_cancel_during_placement_cancels_the_child():
+    broker = FakeBroker()
+    broker.release.clear()
+
+    async def run():
+        scheduler = AlgoScheduler(lambda: broker)
+        algo = await scheduler.start("TWAP", "2885", "NSE", "BUY", 10, "MIS", price=100.0, duration=60, slices=2)
+        await asyncio.to_thread(broker.sent.wait, 5)
+        cancelling = asyncio.create_task(scheduler.cancel(algo["algo_id"]))
+        await asyncio.sleep(0.05)
+        broker.release.set()
+        return await cancelling
+
+    result = asyncio.run(run())
+    assert result["status"] == "cancelled"
+    assert broker.cancelled == ["C1"]
+    assert [child["status"] for child in result["children"]] == ["cancelled"]
+
+
+def test_working_child_is_grown_when_modify_answers_with_any_order_id_key():
+    broker = FakeBroker(id_key="nOrdNo")
+
+    async def run():
+        scheduler = AlgoScheduler(lambda: broker)
+        algo = await scheduler.start("TWAP", "2885", "NSE", "BUY", 10, "MIS", price=100.0, duration=0.1,
+                                     slices=2, on_end="leave")
+        await scheduler.algos[algo["algo_id"]].task
+        return scheduler.status(algo["algo_id"])
+
+    result = asyncio.run(run())
+    assert list(broker.orders) == ["C1"]
+    assert broker.modifies == [("C1", 10)]
+    assert result["working_quantity"] == 10 and result["slices_sent"] == 2
+
+
+def test_iceberg_finishes_when_the_book_uses_another_order_id_key(monkeypatch):
+    monkeypatch.setattr("algos.POLL_SECONDS", 0.01)
+    broker = FakeBroker(id_key="nOrdNo", fill=True)
+
+    async def run():
+        scheduler = AlgoScheduler(lambda: broker)
+        algo = await scheduler.start("ICEBERG", "2885", "NSE", "BUY", 10, "MIS", price=100.0, display_quantity=4)
+        await asyncio.wait_for(scheduler.algos[algo["algo_id"]].task, 5)
+        return scheduler.status(algo["algo_id"])
+
+    result = asyncio.run(run())
+    assert [order["quantity"] for order in broker.orders.values()] == [4, 4, 2]
+    assert result["status"] == "completed" and result["filled_quantity"] == 10
+
+
+def test_slice_targets_end_on_quantity_in_whole_lots():
+    assert slice_targets(10, [1, 1, 1]) == [3, 7, 10]
+    assert slice_targets(500, [1, 1, 1], lot=50) == [150, 350, 500]
+
+
+def test_profile_weights_follow_the_session_buckets():
+    start = datetime(2024, 1, 15, 9, 15, tzinfo=IST)
+    weights = profile_weights(start, 3600, 2, profile=(0.5, 0.3, 0.2))
+    assert weights == [0.5, 0.3]
+
+
+def test_start_algo_refused_with_several_workers(call_tool, monkeypatch):
+    monkeypatch.setattr(server, "worker_count", 2)
+    result = call_tool("start_algo", algo="TWAP", instrument_id="2885", exchange="NSE", transaction_type="BUY",
+                       quantity=10, product="MIS")
+    assert result["status"] == "error" and "--workers 1" in result["message"]
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from greeks import OptionBook, greeks, implied_vol, option_price, parse_contract
+from refresh import IST
+
+NOW = datetime(2024, 11, 20, 10, 0, tzinfo=IST)
+
+
+def row(symbol, qty, ltp, avg=None):
+    return {"tradingSymbol": symbol, "netQuantity": qty, "ltp": ltp, "averagePrice": avg or ltp}
+
+
+@pytest.mark.parametrize("rows, spots, reason", [
+    ([], None, None),
+    ([row("RELIANCE-EQ", 10, 2500)], None, "not an F&O contract"),
+    ([row("NIFTY28NOV24C24000", 50, 100)], None, "no spot price for NIFTY"),
+])
+def test_books_without_priced_legs(rows, spots, reason):
+    book = OptionBook(rows, spots, now=NOW)
+    assert len(book) == 0 and book.is_future.dtype == bool
+    assert [skip["reason"] for skip in book.skipped] == ([reason] if reason else [])
+    summary = book.summary(include_legs=True)
+    assert summary["legs"] == 0 and summary["totals"]["value"] == 0 and summary["leg_details"] == []
+    report = book.scenario_report([-1, 0, 1], [0], [0, 1])
+    assert report["scenarios"]["total"] == [[[0.0, 0.0, 0.0]], [[0.0, 0.0, 0.0]]]
+    assert report["expiry_payoff"] == {}
+
+
+def test_parse_contract_symbol_styles():
+    broker = parse_contract("NIFTY28NOV24C24000")
+    assert (broker.underlying, broker.strike, broker.kind, broker.expiry.date().isoformat()) == \
+        ("NIFTY", 24000.0, "CE", "2024-11-28")
+    weekly = parse_contract("NIFTY24N2824000PE")
+    assert (weekly.kind, weekly.expiry.date().isoformat()) == ("PE", "2024-11-28")
+    assert parse_contract("BANKNIFTY24NOVFUT").kind == "FUT"
+    assert parse_contract("RELIANCE-EQ") is None
+
+
+def test_put_call_parity_and_implied_vol_round_trip():
+    spot, strike, years, vol = 24000.0, np.array([23500.0, 24500.0]), np.array([0.05, 0.05]), np.array([0.15, 0.25])
+    calls = option_price(spot, strike, years, vol, 0.0)
+    puts = option_price(spot, strike, years, vol, 1.0)
+    assert np.allclose(calls - puts, spot - strike * np.exp(-0.065 * years))
+    assert np.allclose(implied_vol(puts, spot, strike, years, 1.0), vol, atol=1e-5)
+    assert np.isnan(implied_vol(np.array([0.0]), spot, strike[:1], years[:1], 0.0))[0]
+    call_greeks = greeks(spot, strike, years, vol, 0.0)
+    assert np.all((call_greeks["delta"] > 0) & (call_greeks["delta"] < 1)) and np.all(call_greeks["gamma"] > 0)
+
+
+def test_scenarios_reprice_the_book():
+    rows = [row("NIFTY28NOV24C24000", 50, 180.0), row("NIFTY28NOV24P24000", -50, 160.0),
+            row("NIFTY24NOVFUT", 25, 24100.0)]
+    book = OptionBook(rows, {"NIFTY": 24000.0}, now=NOW)
+    assert len(book) == 3 and book.vol_fallback.sum() == 0
+    grid = book.scenarios([-0.02, 0.0, 0.02], [0.0], [0.0])
+    assert grid.shape == (1, 1, 1, 3)
+    assert grid[0, 0, 0, 1] == pytest.approx(0.0, abs=1e-3)
+
+    shifted = 24000.0 * 1.02
+    options = option_price(shifted, book.strike[:2], book.years[:2], book.vol[:2], book.is_put[:2])
+    expected = (book.qty[:2] * (options - book.ltp[:2])).sum() + 25 * (shifted * book.basis[2] - 24100.0)
+    assert grid[0, 0, 0, 2] == pytest.approx(expected, rel=1e-5)
+
+
+def test_spot_implied_from_a_call_put_pair():
+    book = OptionBook([row("NIFTY28NOV24C24000", 50, 180.0), row("NIFTY28NOV24P24000", -50, 160.0)], now=NOW)
+    assert book.spots["NIFTY"] == pytest.approx(20 + 24000 * np.exp(-0.065 * book.years[0]))
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+import requests
+
+import Client
+from Client import AliceBlue
+from health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, HealthMonitor
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("orders/book", failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(0.01, False, "HTTP 503")
+    breaker.record(0.01, True)
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+    for _ in range(3):
+        breaker.record(0.01, False, "HTTP 503")
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError, match="HTTP 503"):
+        breaker.before_call()
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("profile", failure_threshold=2, slow_call_seconds=0.5)
+    breaker.record(0.6, True)
+    breaker.record(0.7, True)
+    assert breaker.state == OPEN and breaker.last_error == "slow call 0.70s"
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("limits", failure_threshold=1, cooldown=0.01)
+    breaker.record(0.01, False, "timeout")
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(0.01, False, "timeout")
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record(0.01, True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 3
+
+
+def test_client_requests_fail_fast_while_open(monkeypatch):
+    attempts = []
+
+    def refuse(method, url, **kwargs):
+        attempts.append(url)
+        raise requests.exceptions.ConnectionError("refused")
+
+    monkeypatch.setattr(Client.http_session, "request", refuse)
+    monkeypatch.setattr(Client.breakers, "_breakers",
+                        {"profile": CircuitBreaker("profile", failure_threshold=2, cooldown=60)})
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            alice.get_profile()
+    with pytest.raises(CircuitOpenError):
+        alice.get_profile()
+    assert len(attempts) == 2
+
+
+class FakeClient:
+    headers = {"Authorization": "Bearer token"}
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def get_profile(self):
+        if self.error:
+            raise self.error
+        return {"status": "Ok"}
+
+
+@pytest.mark.parametrize("client, session", [
+    (None, "none"),
+    (FakeClient(), "active"),
+    (FakeClient(Exception("Profile Error 401: Unauthorized")), "expired"),
+    (FakeClient(CircuitOpenError("circuit open")), "unknown"),
+])
+def test_heartbeat_reports_session_state(client, session):
+    monitor = HealthMonitor(lambda: client, session=None, base_url="https://example.invalid", interval=0)
+    monitor.heartbeat()
+    assert monitor.status()["session"] == session
+    assert monitor.status()["running"] is False
+
+
+def test_half_open_trial_is_released_when_the_request_cannot_be_sent(monkeypatch):
+    breaker = CircuitBreaker("profile", failure_threshold=1, cooldown=0.01)
+    breaker.record(0.01, False, "HTTP 503")
+    time.sleep(0.02)
+    monkeypatch.setattr(Client.breakers, "_breakers", {"profile": breaker})
+    alice = AliceBlue(app_key="app", api_secret="secret")
+
+    def broken(method, url, **kwargs):
+        raise TypeError("bad header value")
+
+    monkeypatch.setattr(Client.http_session, "request", broken)
+    with pytest.raises(TypeError):
+        alice.get_profile()
+    assert breaker.state == HALF_OPEN
+
+    class Response:
+        status_code = 200
+        text = "{}"
+
+        def json(self):
+            return {"status": "Ok"}
+
+    monkeypatch.setattr(Client.http_session, "request", lambda method, url, **kwargs: Response())
+    monkeypatch.setattr(Client, "log_http", lambda *args: None)
+    assert alice.get_profile() == {"status": "Ok"}
+    assert breaker.state == CLOSED
@@ -0,0 +1,73 @@
+import io
+import json
+import logging
+import threading
+
+import logger
+
+
+def _format(record_logger, message, **extra):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logger.JsonFormatter())
+    handler.addFilter(logger.CorrelationFilter())
+    record_logger.addHandler(handler)
+    try:
+        record_logger.warning(message, extra=extra)
+    finally:
+        record_logger.removeHandler(handler)
+    return json.loads(stream.getvalue())
+
+
+def test_json_lines_carry_extra_fields_and_correlation_id():
+    token = logger.new_correlation_id()
+    try:
+        entry = _format(logging.getLogger("test.logger.extra"), "tool call", tool="get_limits", elapsed_ms=1.5)
+        assert entry["msg"] == "tool call"
+        assert entry["tool"] == "get_limits" and entry["elapsed_ms"] == 1.5
+        assert entry["cid"] == logger.correlation_id.get() != "-"
+    finally:
+        logger.correlation_id.reset(token)
+
+
+def test_secrets_are_redacted():
+    logger.register_secret("super-secret-session-token")
+    entry = _format(logging.getLogger("test.logger.redact"),
+                    "headers Authorization: Bearer abc.def userSession=xyz123 token super-secret-session-token")
+    assert "abc.def" not in entry["msg"]
+    assert "xyz123" not in entry["msg"]
+    assert "super-secret-session-token" not in entry["msg"]
+
+
+def test_short_values_are_not_registered_as_secrets():
+    logger.register_secret("abc")
+    assert logger.redact("abc") == "abc"
+
+
+def test_client_entry_point_does_not_print_the_session():
+    with open(logger.__file__.replace("logger.py", "Client.py")) as f:
+        source = f.read()
+    assert "print(" not in source
+
+
+def test_registering_secrets_while_redacting_is_safe():
+    errors = []
+
+    def register(n):
+        for i in range(500):
+            logger.register_secret(f"session-{n}-{i:04d}")
+
+    def scrub():
+        try:
+            for _ in range(200):
+                logger.redact("session-0-0001 and more text")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=register, args=(n,)) for n in range(4)] + [threading.Thread(target=scrub)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert logger.redact("session-3-0499") == "***"
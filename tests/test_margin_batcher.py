@@ -0,0 +1,61 @@
+import asyncio
+
+from margin_batcher import MarginBatcher
+
+ITEM = {"exchange": "NSE", "instrumentId": "2885", "transactionType": "BUY", "quantity": 1}
+
+
+class FakeBroker:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, items):
+        self.calls.append(items)
+        return [{"status": "Ok", "result": {"requiredMargin": len(self.calls)}} for _ in items]
+
+
+def test_concurrent_identical_checks_share_one_broker_call():
+    broker = FakeBroker()
+    batcher = MarginBatcher(broker.fetch, window=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(dict(ITEM)) for _ in range(3)),
+                                    batcher.submit(dict(ITEM, quantity=2)))
+
+    responses = asyncio.run(run())
+    assert len(broker.calls) == 1 and len(broker.calls[0]) == 2
+    assert batcher.stats["coalesced"] == 2
+    assert all(response["status"] == "Ok" for response in responses)
+
+
+def test_each_caller_gets_its_own_copy():
+    batcher = MarginBatcher(FakeBroker().fetch, window=0.01)
+
+    async def run():
+        first, second = await asyncio.gather(batcher.submit(dict(ITEM)), batcher.submit(dict(ITEM)))
+        first["result"]["requiredMargin"] = -1
+        return second, await batcher.submit(dict(ITEM))
+
+    second, memoized = asyncio.run(run())
+    assert second["result"]["requiredMargin"] == 1
+    assert memoized["result"]["requiredMargin"] == 1
+    assert batcher.stats["memo_hits"] == 1
+
+
+def test_memo_is_not_shared_across_accounts_or_modes():
+    broker = FakeBroker()
+    scope = ["live", "AB123"]
+    batcher = MarginBatcher(broker.fetch, window=0.001, scope=lambda: tuple(scope))
+
+    async def run():
+        await batcher.submit(dict(ITEM))
+        scope[0] = "paper"
+        await batcher.submit(dict(ITEM))
+        scope[:] = ["live", "XY999"]
+        await batcher.submit(dict(ITEM))
+        scope[:] = ["live", "AB123"]
+        await batcher.submit(dict(ITEM))
+
+    asyncio.run(run())
+    assert len(broker.calls) == 3
+    assert batcher.stats["memo_hits"] == 1
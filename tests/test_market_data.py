@@ -0,0 +1,110 @@
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+
+from market_data import CANDLE_DTYPE, CandleCache, MarketData, day_of, day_start, parse_candles, parse_time
+
+DAY = date(2024, 1, 15)
+SESSION_OPEN = 9 * 3600 + 15 * 60
+SESSION_MINUTES = 375
+
+
+class FakeHistory:
+    """One-minute candles for every 09:15-15:29 IST session, like the chart history API."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, exchange, token, resolution, start, end):
+        self.calls.append((start, end))
+        times = []
+        for day in range(day_of(start).toordinal(), day_of(end).toordinal() + 1):
+            opens = day_start(date.fromordinal(day)) + SESSION_OPEN
+            times.extend(opens + 60 * np.arange(SESSION_MINUTES))
+        times = np.array([t for t in times if start <= t <= min(end, time.time())], dtype="i8")
+        candles = np.zeros(len(times), dtype=CANDLE_DTYPE)
+        candles["time"] = times
+        candles["close"] = 100.0
+        return candles
+
+
+def test_partial_query_does_not_truncate_a_past_day(tmp_path):
+    cache, fetch = CandleCache(str(tmp_path)), FakeHistory()
+    opens = day_start(DAY) + SESSION_OPEN
+
+    morning = cache.get_candles(fetch, "NSE", "2885", "1", opens, opens + 45 * 60)
+    assert len(morning) == 46
+    full = cache.get_candles(fetch, "NSE", "2885", "1", day_start(DAY), day_start(DAY) + 86399)
+    assert len(full) == SESSION_MINUTES
+    assert len(fetch.calls) == 1
+
+
+def test_incomplete_past_day_is_topped_up(tmp_path):
+    cache, fetch = CandleCache(str(tmp_path)), FakeHistory()
+    partial = fetch("NSE", "2885", "1", day_start(DAY), day_start(DAY) + SESSION_OPEN + 45 * 60)
+    cache.save_day("NSE", "2885", "1", DAY, partial, complete=False)
+
+    full = cache.get_candles(fetch, "NSE", "2885", "1", day_start(DAY), day_start(DAY) + 86399)
+    assert len(full) == SESSION_MINUTES
+    assert fetch.calls[-1][0] == int(partial["time"][-1]) + 1
+    candles, complete = cache.load_day("NSE", "2885", "1", DAY)
+    assert complete and len(candles) == SESSION_MINUTES
+    assert not os.path.exists(cache._path("NSE", "2885", "1", DAY, complete=False))
+
+
+def test_today_stays_incomplete(tmp_path):
+    cache, fetch = CandleCache(str(tmp_path)), FakeHistory()
+    now = int(time.time())
+    cache.get_candles(fetch, "NSE", "2885", "1", day_start(day_of(now)), now)
+    assert cache.load_day("NSE", "2885", "1", day_of(now))[1] is False
+
+
+def test_parse_candles_and_times():
+    assert parse_time("2024-01-15") == day_start(DAY)
+    assert parse_time(1705290300000) == 1705290300
+    candles = parse_candles({"result": [{"time": "2024-01-15 09:16", "open": 1, "high": 2, "low": 0.5,
+                                         "close": 1.5, "volume": 10},
+                                        {"time": "2024-01-15 09:15", "open": 1, "high": 2, "low": 0.5,
+                                         "close": 1.5}]})
+    assert list(candles["time"]) == [parse_time("2024-01-15 09:15"), parse_time("2024-01-15 09:16")]
+    assert candles["volume"][0] == 0
+
+
+def test_broker_errors_are_not_cached_as_empty_days(tmp_path):
+    cache, history = CandleCache(str(tmp_path)), FakeHistory()
+    outage = [True]
+
+    def fetch(*args):
+        if outage[0]:
+            return parse_candles({"stat": "Not_Ok", "emsg": "Session Expired"})
+        return history(*args)
+
+    with pytest.raises(Exception, match="Session Expired"):
+        cache.get_candles(fetch, "NSE", "2885", "1", day_start(DAY), day_start(DAY) + 86399)
+    assert cache.load_day("NSE", "2885", "1", DAY) == (None, False)
+    outage[0] = False
+    assert len(cache.get_candles(fetch, "NSE", "2885", "1", day_start(DAY), day_start(DAY) + 86399)) == SESSION_MINUTES
+
+
+class CandleClient:
+    def __init__(self):
+        self.history = FakeHistory()
+
+    def get_historical_candles(self, exchange, token, resolution, from_ms, to_ms):
+        candles = self.history(exchange, token, resolution, from_ms // 1000, to_ms // 1000)
+        return {"status": "Ok", "result": [[int(t), 1, 1, 1, 1, 0] for t in candles["time"]]}
+
+
+def test_paper_mode_bypasses_the_shared_cache(tmp_path):
+    client = CandleClient()
+    market = MarketData(lambda: client, CandleCache(str(tmp_path)), is_live=lambda: False)
+    candles = market.get_candles("NSE", "2885", "1", "2024-01-15 09:15", "2024-01-15 10:00")
+    assert len(candles) == 46
+    assert list(tmp_path.iterdir()) == []
+
+    live = MarketData(lambda: client, CandleCache(str(tmp_path)))
+    assert len(live.get_candles("NSE", "2885", "1", "2024-01-15", "2024-01-15")) == SESSION_MINUTES
+    assert live.cache.load_day("NSE", "2885", "1", DAY)[1] is True
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+
+from Client import AliceBlue
+from modify_coalescer import ModifyCoalescer
+
+
+def item(order_id, quantity="", price=""):
+    return AliceBlue.modify_item(order_id, "DAY", quantity or None, price or None)
+
+
+class FakeBroker:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def send(self, items):
+        self.batches.append([dict(i) for i in items])
+        if self.delay:
+            time.sleep(self.delay)
+        return [{"status": "Ok", "result": [{"brokerOrderId": i["brokerOrderId"]}]} for i in items]
+
+
+def test_rapid_updates_to_one_order_collapse_to_the_latest():
+    broker = FakeBroker()
+    coalescer = ModifyCoalescer(broker.send, window=0.01)
+
+    async def run():
+        return await asyncio.gather(coalescer.submit(item("B1", quantity=10)),
+                                    coalescer.submit(item("B1", price=101.5)),
+                                    coalescer.submit(item("B2", price=50)))
+
+    results = asyncio.run(run())
+    assert len(broker.batches) == 1
+    sent = {i["brokerOrderId"]: i for i in broker.batches[0]}
+    assert sent["B1"]["quantity"] == 10 and sent["B1"]["price"] == 101.5
+    assert [coalesced for _, coalesced in results] == [1, 1, 0]
+    assert coalescer.metrics()["broker_calls_saved"] == 2
+
+
+def test_one_modify_in_flight_per_order():
+    broker = FakeBroker(delay=0.05)
+    coalescer = ModifyCoalescer(broker.send, window=0.001)
+
+    async def run():
+        first = asyncio.create_task(coalescer.submit(item("B1", price=100)))
+        await asyncio.sleep(0.02)
+        second = coalescer.submit(item("B1", price=101))
+        await asyncio.gather(first, second)
+
+    asyncio.run(run())
+    assert [[i["price"] for i in batch] for batch in broker.batches] == [[100], [101]]
+
+
+def test_broker_errors_reach_every_caller():
+    def fail(items):
+        raise RuntimeError("Order Modify Error 503")
+
+    coalescer = ModifyCoalescer(fail, window=0.001)
+
+    async def run():
+        return await asyncio.gather(coalescer.submit(item("B1", price=1)), coalescer.submit(item("B2", price=1)),
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+    assert coalescer.metrics()["in_flight"] == 0
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+
+def test_modify_orders_falls_back_to_one_call_per_order(monkeypatch):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    sent = []
+
+    def request(method, url, json=None, **kwargs):
+        sent.append(json)
+        if len(json) > 1:
+            return FakeResponse({"status": "Ok", "result": "2 orders modified"})
+        return FakeResponse({"status": "Ok", "result": [{"brokerOrderId": json[0]["brokerOrderId"]}]})
+
+    monkeypatch.setattr(alice, "_request", request)
+    responses = alice.modify_orders([item("B1", price=1), item("B2", price=2)])
+    assert [r["result"][0]["brokerOrderId"] for r in responses] == ["B1", "B2"]
+    assert [len(payload) for payload in sent] == [2, 1, 1]
+
+
+def test_modify_orders_splits_list_responses(monkeypatch):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    monkeypatch.setattr(alice, "_request", lambda *args, json=None, **kwargs: FakeResponse(
+        {"status": "Ok", "result": [{"brokerOrderId": i["brokerOrderId"]} for i in json]}))
+    responses = alice.modify_orders([item("B1", price=1), item("B2", price=2)])
+    assert responses == [{"status": "Ok", "result": [{"brokerOrderId": "B1"}]},
+                         {"status": "Ok", "result": [{"brokerOrderId": "B2"}]}]
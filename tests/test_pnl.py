@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from pnl import PnLEngine, estimate_charges, segment
+
+
+def fill(n, side, qty, price, token="2885", product="MIS", exchange="NSE", symbol="RELIANCE-EQ"):
+    return {"tradeId": f"T{n}", "tradeTime": f"10:00:{n:02d}", "exchange": exchange, "instrumentId": token,
+            "product": product, "tradingSymbol": symbol, "transactionType": side,
+            "filledQuantity": qty, "tradedPrice": price}
+
+
+def position(engine, method="FIFO", **kwargs):
+    return engine.summary(method, **kwargs)["positions"][0]
+
+
+def test_fifo_and_average_cost():
+    engine = PnLEngine()
+    engine.ingest([fill(1, "BUY", 10, 100), fill(2, "BUY", 10, 110), fill(3, "SELL", 15, 120)])
+    fifo = position(engine)
+    assert fifo["realized"] == 10 * 20 + 5 * 10
+    assert fifo["open_quantity"] == 5 and fifo["average_cost"] == 110 and fifo["open_lots"] == 1
+    average = position(engine, "AVERAGE")
+    assert average["realized"] == 15 * 15 and average["average_cost"] == 105
+
+
+def test_position_flip_opens_a_short_lot():
+    engine = PnLEngine()
+    engine.ingest([fill(1, "BUY", 5, 100), fill(2, "SELL", 8, 90)])
+    row = position(engine, marks={"NSE:2885": 80})
+    assert row["realized"] == -50
+    assert row["open_quantity"] == -3 and row["average_cost"] == 90
+    assert row["unrealized"] == 30 and row["mark_price"] == 80
+
+
+def test_reingesting_the_book_skips_known_fills():
+    engine = PnLEngine()
+    book = [fill(n, "BUY", 1, 100 + n) for n in range(5)]
+    assert engine.ingest(book) == 5
+    assert engine.ingest(book) == 0
+    assert engine.ingest(book + [fill(5, "SELL", 5, 110)]) == 1
+    assert engine.ingest(list(reversed(book))) == 0
+    assert engine.fills == 6
+
+
+def test_identical_fills_without_ids_are_counted_by_occurrence():
+    engine = PnLEngine()
+    row = {"brokerOrderId": "B1", "exchange": "NSE", "instrumentId": "2885", "product": "MIS",
+           "transactionType": "BUY", "filledQuantity": 1, "tradedPrice": 100}
+    assert engine.ingest([row, dict(row)]) == 2
+    assert engine.ingest([row, dict(row), dict(row)]) == 1
+
+
+def test_journal_carries_lots_across_restarts(tmp_path):
+    journal = str(tmp_path / "AB123.csv")
+    PnLEngine(journal).ingest([fill(1, "BUY", 10, 100)])
+    restarted = PnLEngine(journal)
+    assert restarted.ingest([fill(1, "BUY", 10, 100), fill(2, "SELL", 10, 105)]) == 1
+    assert position(restarted)["realized"] == 50
+
+
+def test_concurrent_ingest_counts_each_fill_once(tmp_path):
+    journal = str(tmp_path / "AB123.csv")
+    engine = PnLEngine(journal)
+    book = [fill(n, "BUY", 1, 100) for n in range(50)] + [fill(50, "SELL", 50, 110)]
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        engine.ingest(book)
+        engine.summary("FIFO")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert engine.fills == 51 and position(engine)["realized"] == 500
+    assert position(PnLEngine(journal))["realized"] == 500
+
+
+def test_charges_and_segments():
+    assert segment("NFO", "NRML", "NIFTY24JAN21000CE") == "options"
+    assert segment("NFO", "NRML", "NIFTY24JANFUT") == "futures"
+    assert segment("NSE", "CNC") == "delivery" and segment("NSE", "MIS") == "intraday"
+    assert estimate_charges("delivery", 100000, 0, 0) == pytest.approx(100 + 15 + 100000 * 0.0000307 * 1.18)
+    engine = PnLEngine()
+    engine.ingest([fill(1, "BUY", 10, 100), fill(2, "SELL", 10, 101)])
+    summary = engine.summary()
+    assert summary["totals"]["net"] == pytest.approx(10 - summary["totals"]["charges"], abs=0.01)
+
+
+def test_unknown_method_and_instrument_filter():
+    engine = PnLEngine()
+    engine.ingest([fill(1, "BUY", 1, 100), fill(2, "BUY", 1, 50, token="11536", symbol="TCS-EQ")])
+    assert [row["instrumentId"] for row in engine.summary(instrument="TCS-EQ")["positions"]] == ["11536"]
+    with pytest.raises(ValueError):
+        engine.summary("LIFO")
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import server
+from profiling import CallProfile, Profiler, current
+from validation import Schema
+
+ORIGINAL_SCHEMA_CALL = Schema.__call__
+
+
+@pytest.fixture(autouse=True)
+def idle_profiler():
+    yield
+    server.profiler.stop()
+
+
+def test_spans_nest_and_split_self_time():
+    call = CallProfile("tool", 0)
+    call.enter("body")
+    call.enter("http.wait")
+    call.exit()
+    call.exit()
+    body, wait = call.spans[("tool", "body")], call.spans[("tool", "body", "http.wait")]
+    assert body[0] == wait[0] == 1
+    assert body[1] >= wait[1] and body[2] == pytest.approx(body[1] - wait[1])
+    assert call.top == body[1]
+
+
+def test_armed_calls_are_profiled_then_hooks_removed(call_tool):
+    started = call_tool("profile_calls", tools=["get_margin_batch_metrics"], calls=2, mode="deterministic")
+    assert started["status"] == "success"
+    assert Schema.__call__ is not ORIGINAL_SCHEMA_CALL
+    for _ in range(3):
+        assert call_tool("get_margin_batch_metrics")["status"] == "success"
+    assert Schema.__call__ is ORIGINAL_SCHEMA_CALL
+
+    report = call_tool("profile_calls", action="report", write_file=True)["data"]
+    tool = report["tools"]["get_margin_batch_metrics"]
+    assert tool["calls"] == 2 and report["armed"] == {}
+    assert "body" in {stage["stage"] for stage in tool["stages"]}
+    assert report["functions"] and report["folded"][0].startswith("get_margin_batch_metrics")
+    assert all(os.path.exists(path) for path in report["files"])
+
+
+def test_invalid_requests_are_rejected(call_tool):
+    assert call_tool("profile_calls", tools=["no_such_tool"])["status"] == "error"
+    assert call_tool("profile_calls", tools=["profile_calls"])["status"] == "error"
+    assert call_tool("profile_calls", tools=["get_limits"], mode="perf")["status"] == "error"
+    assert call_tool("profile_calls", tools=["get_limits"], calls=0)["status"] == "error"
+    assert call_tool("profile_calls", action="pause")["status"] == "error"
+
+
+def test_stop_disarms_and_restores_bodies():
+    bodies = {"work": lambda: "done"}
+    original = bodies["work"]
+    profiler = Profiler(bodies, hooks=[])
+    profiler.start(["work"], 5)
+    assert bodies["work"] is not original
+    call = profiler.begin("work")
+    token = current.set(call)
+    try:
+        assert bodies["work"]() == "done"
+    finally:
+        current.reset(token)
+    profiler.stop()
+    assert bodies["work"] is not original
+    profiler.finish(call)
+    assert bodies["work"] is original
+    assert profiler.report()["tools"]["work"]["calls"] == 1
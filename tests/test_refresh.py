@@ -0,0 +1,120 @@
+from datetime import datetime
+
+import pytest
+
+from refresh import CLOSED, IST, OPEN, PEAK, RefreshScheduler, market_phase, refresh_interval
+from store import SharedStore
+
+
+class Account:
+    user_id = "AB123"
+
+
+class Broker:
+    def __init__(self):
+        self.version = 0
+        self.calls = 0
+        self.during_call = None
+        self.error = None
+
+    def positions(self, client):
+        self.calls += 1
+        seen = self.version
+        if self.during_call:
+            self.during_call()
+        if self.error:
+            return {"stat": "Not_Ok", "emsg": self.error}
+        return {"version": seen}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedStore(str(tmp_path / "store.sqlite"))
+    yield store
+    store.close()
+
+
+def _worker(broker, store):
+    return RefreshScheduler(lambda: Account(), {"positions": broker.positions}, store)
+
+
+def test_snapshot_is_shared_between_workers(store):
+    broker = Broker()
+    first, second = _worker(broker, store), _worker(broker, store)
+    assert first.read("positions", Account())[1]["source"] == "broker"
+    data, staleness = second.read("positions", Account())
+    assert staleness["source"] == "snapshot" and data == {"version": 0}
+    assert broker.calls == 1 and second.adopted == 1
+
+
+def test_invalidation_reaches_other_workers_local_snapshots(store):
+    broker = Broker()
+    first, second = _worker(broker, store), _worker(broker, store)
+    first.read("positions", Account())
+    second.read("positions", Account())
+    broker.version = 1
+    first.invalidate()
+    data, staleness = second.read("positions", Account())
+    assert staleness["source"] == "broker" and data == {"version": 1}
+
+
+def test_fetch_started_before_invalidation_is_not_cached(store):
+    broker = Broker()
+    first, second = _worker(broker, store), _worker(broker, store)
+
+    def order_placed_elsewhere():
+        broker.during_call = None
+        broker.version = 1
+        second.invalidate()
+
+    broker.during_call = order_placed_elsewhere
+    assert first.read("positions", Account())[0] == {"version": 0}
+    assert first.dropped == 1 and first.status()["dropped_stale"] == 1
+    assert second.read("positions", Account())[0] == {"version": 1}
+    assert first.read("positions", Account())[0] == {"version": 1}
+
+
+def test_without_a_store_invalidation_is_local():
+    broker = Broker()
+    worker = RefreshScheduler(lambda: Account(), {"positions": broker.positions})
+    worker.read("positions", Account())
+    broker.version = 1
+    worker.invalidate("positions")
+    assert worker.read("positions", Account())[0] == {"version": 1}
+    assert worker.read("positions", Account(), fetch=False)[1]["source"] == "snapshot"
+
+
+@pytest.mark.parametrize("when, phase", [
+    ("2024-01-15 09:20", PEAK),
+    ("2024-01-15 11:00", OPEN),
+    ("2024-01-15 15:20", PEAK),
+    ("2024-01-15 23:45", CLOSED),
+    ("2024-01-15 20:00", OPEN),
+    ("2024-01-16 14:45", PEAK),
+    ("2024-01-13 11:00", CLOSED),
+])
+def test_market_phase(when, phase):
+    assert market_phase(datetime.strptime(when, "%Y-%m-%d %H:%M").replace(tzinfo=IST)) == phase
+
+
+def test_refresh_interval_tightens_at_peak():
+    assert refresh_interval("positions", PEAK) < refresh_interval("positions", OPEN) < \
+        refresh_interval("positions", CLOSED)
+
+
+def test_broker_errors_are_reported_and_never_cached(store):
+    broker = Broker()
+    first, second = _worker(broker, store), _worker(broker, store)
+    first.read("positions", Account())
+    broker.version, broker.error = 1, "Session Expired"
+    with pytest.raises(Exception, match="Session Expired"):
+        first.read("positions", Account(), refresh=True)
+    assert first.read("positions", Account())[0] == {"version": 0}
+    assert first.status()["failed_refreshes"] == 1
+
+    first.invalidate()
+    with pytest.raises(Exception, match="Session Expired"):
+        second.read("positions", Account())
+    broker.error = None
+    data, staleness = second.read("positions", Account())
+    assert data == {"version": 1} and staleness["source"] == "broker"
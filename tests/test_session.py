@@ -0,0 +1,61 @@
+import pytest
+
+import server
+from Client import AliceBlue
+from store import get_store
+
+
+@pytest.fixture(autouse=True)
+def clean_session(monkeypatch):
+    monkeypatch.delenv("ALICE_USER_ID", raising=False)
+    monkeypatch.delenv("ALICE_APP_KEY", raising=False)
+    monkeypatch.delenv("ALICE_API_SECRET", raising=False)
+    get_store().delete(server.SESSION_KEY)
+    server._alice_client = None
+    yield
+    get_store().delete(server.SESSION_KEY)
+    server._alice_client = None
+
+
+def _share(token):
+    get_store().set(server.SESSION_KEY, {"user_id": "AB123", "user_session": token})
+
+
+def _cache(token):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    alice.set_session("AB123", token)
+    server._alice_client = alice
+    return alice
+
+
+def test_cached_client_reused_while_session_is_shared():
+    _share("session-one")
+    alice = _cache("session-one")
+    assert server.get_alice_client() is alice
+
+
+def test_session_replaced_by_another_worker_is_adopted():
+    _cache("session-one")
+    _share("session-two")
+    alice = server.get_alice_client()
+    assert alice.get_session() == "session-two"
+    assert server._alice_client is alice
+
+
+def test_session_closed_by_another_worker_drops_cached_client(call_tool):
+    _share("session-one")
+    _cache("session-one")
+    get_store().delete(server.SESSION_KEY)  # close_session on another worker
+    assert server._cached_client() is None
+    result = call_tool("check_and_authenticate")
+    assert result["status"] == "error" and result["authenticated"] is False
+    with pytest.raises(Exception, match="Missing credentials"):
+        server.get_alice_client()
+
+
+def test_close_session_clears_shared_session(call_tool):
+    _share("session-one")
+    _cache("session-one")
+    assert call_tool("close_session")["status"] == "success"
+    assert get_store().get(server.SESSION_KEY) is None
+    assert server._alice_client is None
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from Client import AliceBlue
+from stream_json import LazyRecord, RecordStream, select
+from validation import ValidationError
+
+ORDERS = [{"brokerOrderId": str(n), "tradingSymbol": f"SYM{n}", "orderStatus": "open" if n % 2 else "complete",
+           "quantity": n, "price": 10.5 * n} for n in range(50)]
+
+
+def chunked(payload, size):
+    body = json.dumps(payload).encode()
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 16])
+def test_records_stream_across_any_chunk_boundary(size):
+    stream = RecordStream(chunked({"status": "Ok", "result": ORDERS}, size))
+    assert [record.to_dict() for record in stream] == ORDERS
+    assert stream.records == len(ORDERS) and stream.envelope is None
+
+
+def test_nested_and_escaped_records():
+    rows = [{"id": 1, "legs": [{"p": 1}], "note": 'say "hi"'}, {"id": 2, "meta": {"x": "}"}}]
+    records = list(RecordStream(chunked({"data": rows}, 5)))
+    assert [record.to_dict() for record in records] == rows
+    assert records[0]["note"] == 'say "hi"' and records[1]["meta"] == {"x": "}"}
+
+
+def test_error_body_is_exposed_as_envelope():
+    stream = RecordStream(chunked({"status": "Not_Ok", "message": "Session expired"}, 4))
+    assert list(stream) == []
+    assert stream.envelope == {"status": "Not_Ok", "message": "Session expired"}
+
+
+def test_lazy_record_reads_single_fields():
+    record = LazyRecord(b'{"a": "x", "b": 2.5, "c": null, "d": [1, 2]}')
+    assert record.get("a") == "x" and record["b"] == 2.5 and record.get("c") is None
+    assert record["d"] == [1, 2] and record.get("missing", 0) == 0
+    with pytest.raises(KeyError):
+        record["missing"]
+
+
+def test_select_filters_projects_and_counts():
+    rows, matched = select(RecordStream(chunked(ORDERS, 100)), where={"orderStatus": "OPEN"},
+                           fields=["brokerOrderId"], limit=3)
+    assert matched == 25
+    assert rows == [{"brokerOrderId": "1"}, {"brokerOrderId": "3"}, {"brokerOrderId": "5"}]
+    assert select(ORDERS, where={"quantity": 4})[0] == [ORDERS[4]]
+
+
+def test_order_history_validates_the_order_id(monkeypatch):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    monkeypatch.setattr(alice, "_request", lambda *args, **kwargs: pytest.fail("request sent"))
+    with pytest.raises(ValidationError, match="brokerOrderId is required"):
+        alice.get_order_history(" ")
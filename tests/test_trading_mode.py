@@ -0,0 +1,71 @@
+import pytest
+
+import server
+from paper_trading import PaperAliceBlue
+
+
+@pytest.fixture(autouse=True)
+def live_mode(monkeypatch):
+    monkeypatch.setattr(server, "trading_mode", "live")
+    monkeypatch.setattr(server, "_alice_client", None)
+    monkeypatch.setattr(server, "_paper_client", None)
+
+
+def test_single_worker_switches_to_paper(call_tool, monkeypatch):
+    monkeypatch.setattr(server, "worker_count", 1)
+    assert call_tool("set_trading_mode", mode="PAPER") == {"status": "success", "mode": "paper"}
+    assert isinstance(server.get_alice_client(), PaperAliceBlue)
+    assert call_tool("set_trading_mode", mode="live")["mode"] == "live"
+    assert server._alice_client is None
+
+
+def test_multi_worker_refuses_runtime_switch(call_tool, monkeypatch):
+    monkeypatch.setattr(server, "worker_count", 4)
+    result = call_tool("set_trading_mode", mode="paper")
+    assert result["status"] == "error" and result["mode"] == "live"
+    assert server.trading_mode == "live"
+    assert call_tool("set_trading_mode", mode="live")["status"] == "success"
+
+
+def test_unknown_mode_is_rejected(call_tool):
+    assert call_tool("set_trading_mode", mode="demo")["status"] == "error"
+
+
+def test_main_exports_worker_count_to_http_workers(monkeypatch):
+    import uvicorn
+
+    seen = {}
+    monkeypatch.setenv("ALICE_APP_KEY", "app")
+    monkeypatch.setenv("ALICE_API_SECRET", "secret")
+    monkeypatch.setenv("ALICE_MCP_WORKERS", "1")
+    monkeypatch.setattr(server.AliceBlue, "_is_port_available", lambda self, port: True)
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: seen.update(
+        workers=kwargs["workers"], env=server.os.environ["ALICE_MCP_WORKERS"]))
+    server.main(["--transport", "http", "--workers", "3", "--port", "9"])
+    assert seen == {"workers": 3, "env": "3"}
+
+
+def test_paper_book_survives_relogin_and_mode_switches(call_tool, monkeypatch):
+    monkeypatch.setattr(server, "worker_count", 1)
+    call_tool("set_trading_mode", mode="paper")
+    paper = server.get_alice_client()
+    paper.trades.append({"tradeId": "P1"})
+    assert call_tool("initiate_login", force_refresh=True)["status"] == "success"
+    assert server.get_alice_client() is paper
+    call_tool("set_trading_mode", mode="live")
+    call_tool("set_trading_mode", mode="paper")
+    assert server.get_alice_client() is paper and paper.trades == [{"tradeId": "P1"}]
+
+
+def test_paper_mode_starts_without_broker_credentials(monkeypatch):
+    import uvicorn
+
+    started = []
+    monkeypatch.setattr(server, "trading_mode", "paper")
+    monkeypatch.delenv("ALICE_APP_KEY", raising=False)
+    monkeypatch.delenv("ALICE_API_SECRET", raising=False)
+    monkeypatch.setenv("ALICE_MCP_WORKERS", "1")
+    monkeypatch.setattr(server.AliceBlue, "_is_port_available", lambda self, port: pytest.fail("login port checked"))
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: started.append(kwargs["workers"]))
+    server.main(["--transport", "http", "--port", "9"])
+    assert started == [1]
@@ -0,0 +1,86 @@
+import pytest
+
+import validation
+from Client import AliceBlue
+from validation import MARGIN, MODIFY_ORDER, PLACE_ORDER, ValidationError, load_contract_master
+
+ORDER = dict(instrument_id="2885", exchange="nse", transaction_type="buy", quantity="10", order_type="limit",
+             product="mis", order_complexity="regular", price="101.5", validity="day",
+             disclosed_quantity=0, source="api")
+
+
+def test_schema_normalizes_in_place():
+    params = PLACE_ORDER(dict(ORDER))
+    assert params["exchange"] == "NSE" and params["order_type"] == "LIMIT"
+    assert params["quantity"] == 10 and params["price"] == 101.5
+    assert params["source"] == "API"
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("exchange", "NYSE", "exchange must be one of"),
+    ("quantity", "1.5", "quantity must be an integer"),
+    ("quantity", 0, "quantity must be between"),
+    ("price", "abc", "price must be a number"),
+    ("instrument_id", " ", "instrument_id is required"),
+])
+def test_bad_fields_are_rejected(field, value, message):
+    with pytest.raises(ValidationError, match=message):
+        PLACE_ORDER(dict(ORDER, **{field: value}))
+
+
+def test_cross_field_rules():
+    with pytest.raises(ValidationError, match="price must be positive"):
+        PLACE_ORDER(dict(ORDER, price=0))
+    with pytest.raises(ValidationError, match="sl_trigger_price is required"):
+        PLACE_ORDER(dict(ORDER, order_type="SL-M", price=0))
+    with pytest.raises(ValidationError, match="required for bracket orders"):
+        PLACE_ORDER(dict(ORDER, order_complexity="BO", sl_leg_price=5))
+
+
+def test_optional_fields_may_be_empty():
+    params = MODIFY_ORDER({"brokerOrderId": "B1", "validity": "day", "quantity": "", "price": None})
+    assert params == {"brokerOrderId": "B1", "validity": "DAY", "quantity": "", "price": None}
+
+
+def test_lot_and_tick_sizes_from_contract_master(tmp_path, monkeypatch):
+    monkeypatch.setattr(validation, "instruments", {})
+    master = tmp_path / "NFO.csv"
+    master.write_text("Exch,Token,Lot Size,Tick Size\nNFO,43210,50,0.05\n,1,1,1\n")
+    assert load_contract_master(str(master)) == 1
+    item = dict(exchange="NFO", instrumentId="43210", transactionType="BUY", quantity=75, product="NRML",
+                orderComplexity="REGULAR", orderType="LIMIT", validity="DAY", price=100.05)
+    with pytest.raises(ValidationError, match="lot size 50"):
+        MARGIN(dict(item))
+    with pytest.raises(ValidationError, match="tick size 0.05"):
+        MARGIN(dict(item, quantity=100, price=100.02))
+    assert MARGIN(dict(item, quantity=100))["quantity"] == 100
+
+
+def test_invalid_calls_never_reach_the_broker(monkeypatch):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    monkeypatch.setattr(alice, "_request", lambda *args, **kwargs: pytest.fail("request sent"))
+    with pytest.raises(ValidationError):
+        alice.get_place_order(**dict(ORDER, validity="GTC"))
+    with pytest.raises(ValidationError):
+        alice.get_cancel_order("")
+    with pytest.raises(ValidationError):
+        AliceBlue.margin_item("NSE", "2885", "HOLD", 1, "MIS", "REGULAR", "MARKET", "DAY", 0)
+
+
+def test_square_off_validates_qty_but_sends_it_as_text(monkeypatch):
+    alice = AliceBlue(app_key="app", api_secret="secret")
+    sent = []
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"status": "Ok"}
+
+    monkeypatch.setattr(alice, "_request", lambda method, url, json=None, **kwargs: sent.append(json) or Response())
+    alice.get_positions_sqroff("nse", "RELIANCE-EQ", "25", "mis", "sell")
+    alice.get_positions_sqroff("NSE", "RELIANCE-EQ", 25, "MIS", "SELL")
+    assert [payload["qty"] for payload in sent] == ["25", "25"]
+    assert sent[0]["exch"] == "NSE" and sent[0]["transaction_type"] == "SELL"
+    with pytest.raises(ValidationError, match="qty must be an integer"):
+        alice.get_positions_sqroff("NSE", "RELIANCE-EQ", "2.5", "MIS", "SELL")
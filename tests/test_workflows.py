@@ -0,0 +1,90 @@
+import asyncio
+
+import workflows
+from workflows import OrderWorkflow, find_key
+
+ORDER = dict(instrument_id="2885", exchange="NSE", transaction_type="BUY", quantity=1, order_type="LIMIT",
+             product="MIS", order_complexity="REGULAR", price=100.0, validity="DAY")
+GTT = dict(ORDER, trading_symbol="RELIANCE-EQ", gtt_type="LTP_BOS", gtt_value=99.0, check_margin=False)
+
+
+class FakeBroker:
+    def __init__(self, placed=None, gtt_book=None, statuses=("open",)):
+        self.placed = placed if placed is not None else {"status": "Ok", "result": [{"brokerOrderId": "B1"}]}
+        self.gtt_book = gtt_book or []
+        self.statuses = list(statuses)
+        self.calls = []
+
+    def get_order_margins(self, items):
+        self.calls.append("margin")
+        return [{"status": "Ok", "result": {"shortfall": 0}}]
+
+    def get_place_order(self, **kwargs):
+        self.calls.append("place")
+        return self.placed
+
+    def get_place_gtt_order(self, **kwargs):
+        self.calls.append("place_gtt")
+        return self.placed
+
+    def get_order_history(self, brokerOrderId):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {"status": "Ok", "result": [{"brokerOrderId": brokerOrderId, "orderStatus": status}]}
+
+    def get_gtt_order_book(self):
+        return {"status": "Ok", "result": self.gtt_book}
+
+    def get_cancel_order(self, brokerOrderId):
+        self.calls.append("cancel")
+        return {"status": "Ok"}
+
+
+def _execute(broker, **kwargs):
+    return asyncio.run(OrderWorkflow(lambda: broker).execute_order(**kwargs))
+
+
+def test_order_confirmed_when_accepted():
+    broker = FakeBroker()
+    result = _execute(broker, **ORDER)
+    assert result["status"] == "success" and result["brokerOrderId"] == "B1"
+    assert result["orderStatus"] == "open"
+    assert broker.calls == ["margin", "place"]
+    assert set(result["timings_ms"]) == {"margin", "place", "confirm", "total"}
+
+
+def test_unknown_wait_for_is_rejected_before_placing():
+    broker = FakeBroker()
+    result = _execute(broker, wait_for="filled", **ORDER)
+    assert result["status"] == "error" and result["stage"] == "validate"
+    assert broker.calls == []
+
+
+def test_timeout_cancels_when_asked(monkeypatch):
+    monkeypatch.setattr(workflows, "POLL_START", 0.01)
+    broker = FakeBroker(statuses=("open",))
+    result = _execute(broker, wait_for="terminal", timeout=0.05, cancel_on_timeout=True, **ORDER)
+    assert result["stage"] == "cancelled"
+    assert broker.calls[-1] == "cancel"
+
+
+def test_gtt_without_order_id_is_unconfirmed():
+    broker = FakeBroker(placed={"status": "Ok", "result": [{"message": "placed"}]},
+                        gtt_book=[{"brokerOrderId": "OTHER", "gttStatus": "ACTIVE"}])
+    result = _execute(broker, **GTT)
+    assert result["status"] == "error"
+    assert result["orderStatus"] == "unconfirmed"
+
+
+def test_gtt_confirmed_only_by_its_own_row(monkeypatch):
+    monkeypatch.setattr(workflows, "POLL_START", 0.01)
+    broker = FakeBroker(gtt_book=[{"brokerOrderId": "OTHER", "gttStatus": "ACTIVE"}])
+    assert _execute(broker, timeout=0.05, **GTT)["status"] == "error"
+
+    broker.gtt_book.append({"brokerOrderId": "B1", "gttStatus": "ACTIVE"})
+    result = _execute(broker, **GTT)
+    assert result["status"] == "success" and result["orderStatus"] == "active"
+
+
+def test_find_key_searches_nested_payloads():
+    assert find_key({"result": [{"x": 1}, {"nOrdNo": "7"}]}, ("brokerOrderId", "nOrdNo")) == "7"
+    assert find_key({"result": []}, ("brokerOrderId",)) is None
@@ -0,0 +1,294 @@
+"""Declarative parameter validation shared by AliceBlue methods and MCP tool signatures.
+
+Each schema is compiled once into a tuple of per-field checkers, so validating a call is a
+few dictionary lookups and rejects bad input before any network round trip.
+"""
+import os
+import csv
+import inspect
+import functools
+from typing import Annotated, Callable, Dict, Optional, Tuple
+
+from pydantic import Field
+
+EXCHANGES = ("NSE", "BSE", "NFO", "BFO", "CDS", "BCD", "MCX", "NCO")
+TRANSACTION_TYPES = ("BUY", "SELL")
+PRODUCTS = ("CNC", "MIS", "NRML", "INTRADAY", "LONGTERM", "DELIVERY", "MTF", "CO", "BO")
+ORDER_TYPES = ("LIMIT", "MARKET", "SL", "SL-M")
+VALIDITIES = ("DAY", "IOC")
+COMPLEXITIES = ("REGULAR", "AMO", "BO", "CO")
+RESOLUTIONS = ("1", "D")
+MAX_QUANTITY = int(os.getenv("ALICE_MAX_QUANTITY", "1000000"))
+MAX_PRICE = float(os.getenv("ALICE_MAX_PRICE", "10000000"))
+CONTRACT_MASTER = os.getenv("ALICE_CONTRACT_MASTER")
+
+
+def _tool_param(values, description: str):
+    """Tool parameter type listing `values`; the JSON-schema pattern accepts any letter case."""
+    def letters(value):
+        return "".join(f"[{c.upper()}{c.lower()}]" if c.isalpha() else c for c in value)
+    pattern = "^(" + "|".join(letters(v) for v in values) + ")$"
+    return Annotated[str, Field(description=f"{description}: {', '.join(values)}", pattern=pattern)]
+
+
+Exchange = _tool_param(EXCHANGES, "Exchange")
+TransactionType = _tool_param(TRANSACTION_TYPES, "Transaction type")
+Product = _tool_param(PRODUCTS, "Product type")
+OrderType = _tool_param(ORDER_TYPES, "Order type")
+Validity = _tool_param(VALIDITIES, "Order validity")
+Complexity = _tool_param(COMPLEXITIES, "Order complexity")
+Resolution = _tool_param(RESOLUTIONS, 'Candle resolution ("1" minute, "D" day)')
+
+# (exchange, token) -> (lot size, tick size), from the broker contract master when configured.
+instruments: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def _empty(value) -> bool:
+    return value is None or value == ""
+
+
+def enum(values, optional: bool = False) -> Callable:
+    allowed = frozenset(values)
+    listing = ", ".join(values)
+
+    def check(name, value):
+        if optional and _empty(value):
+            return value
+        normalized = str(value).strip().upper()
+        if normalized not in allowed:
+            raise ValidationError(f"{name} must be one of {listing}; got {value!r}")
+        return normalized
+    return check
+
+
+def integer(minimum: int = 1, maximum: int = MAX_QUANTITY, optional: bool = False) -> Callable:
+    def check(name, value):
+        if optional and _empty(value):
+            return value
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError(f"{name} must be an integer; got {value!r}")
+        if number != value and str(number) != str(value).strip():
+            raise ValidationError(f"{name} must be a whole number; got {value!r}")
+        if not minimum <= number <= maximum:
+            raise ValidationError(f"{name} must be between {minimum} and {maximum}; got {number}")
+        return number
+    return check
+
+
+def number(minimum: float = 0.0, maximum: float = MAX_PRICE, optional: bool = False) -> Callable:
+    def check(name, value):
+        if optional and _empty(value):
+            return value
+        try:
+            result = float(value)
+        except (TypeError, ValueError):
+            raise ValidationError(f"{name} must be a number; got {value!r}")
+        if not minimum <= result <= maximum:
+            raise ValidationError(f"{name} must be between {minimum} and {maximum}; got {result}")
+        return result
+    return check
+
+
+def text(upper: bool = False, optional: bool = False) -> Callable:
+    def check(name, value):
+        if optional and _empty(value):
+            return value
+        if _empty(value) or not str(value).strip():
+            raise ValidationError(f"{name} is required")
+        value = str(value).strip()
+        return value.upper() if upper else value
+    return check
+
+
+def price_rules(order_type: str, price: str, trigger: Optional[str] = None) -> Callable:
+    """LIMIT/SL need a positive price; SL/SL-M need a trigger price."""
+    def check(params):
+        kind = params.get(order_type)
+        if kind in ("LIMIT", "SL") and not params.get(price):
+            raise ValidationError(f"{price} must be positive for {kind} orders")
+        if trigger and kind in ("SL", "SL-M") and _empty(params.get(trigger)):
+            raise ValidationError(f"{trigger} is required for {kind} orders")
+    return check
+
+
+def bracket_rules(complexity: str, sl_leg: str, target_leg: str) -> Callable:
+    def check(params):
+        if params.get(complexity) == "BO" and (_empty(params.get(sl_leg)) or _empty(params.get(target_leg))):
+            raise ValidationError(f"{sl_leg} and {target_leg} are required for bracket orders")
+    return check
+
+
+def instrument_rules(exchange: str, token: str, quantity: str, prices: Tuple[str, ...] = ()) -> Callable:
+    """Lot-size and tick-size checks for instruments found in the loaded contract master."""
+    def check(params):
+        if not instruments:
+            return
+        spec = instruments.get((params.get(exchange), str(params.get(token))))
+        if spec is None:
+            return
+        lot, tick = spec
+        qty = params.get(quantity)
+        if lot > 1 and not _empty(qty) and int(qty) % lot:
+            raise ValidationError(f"{quantity} must be a multiple of the lot size {lot}; got {qty}")
+        for name in prices:
+            value = params.get(name)
+            if tick and not _empty(value) and float(value):
+                ticks = float(value) / tick
+                if abs(ticks - round(ticks)) > 1e-6:
+                    raise ValidationError(f"{name} must be a multiple of the tick size {tick}; got {value}")
+    return check
+
+
+class Schema:
+    def __init__(self, fields: Dict[str, Callable], checks: Tuple[Callable, ...] = ()):
+        self.fields = tuple(fields.items())
+        self.checks = tuple(checks)
+
+    def __call__(self, params: dict) -> dict:
+        """Normalize `params` in place, raising ValidationError on the first bad field."""
+        for name, check in self.fields:
+            if name in params:
+                params[name] = check(name, params[name])
+        for check in self.checks:
+            check(params)
+        return params
+
+
+def validated(schema: Schema):
+    """Validate and normalize a function's arguments against `schema` before calling it."""
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            schema(bound.arguments)
+            return fn(*bound.args, **bound.kwargs)
+        return wrapper
+    return decorate
+
+
+def load_contract_master(path: str) -> int:
+    """Load lot and tick sizes from a broker contract-master CSV; returns instruments loaded."""
+    loaded = 0
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip().lower().replace(" ", "_"): v for k, v in row.items() if k}
+            exchange = (row.get("exch") or row.get("exchange") or "").upper()
+            token = row.get("token") or row.get("instrument_id")
+            if not exchange or not token:
+                continue
+            lot = int(float(row.get("lot_size") or 1))
+            tick = float(row.get("tick_size") or 0)
+            instruments[(exchange, token.strip())] = (max(lot, 1), tick)
+            loaded += 1
+    return loaded
+
+
+if CONTRACT_MASTER and os.path.exists(CONTRACT_MASTER):
+    load_contract_master(CONTRACT_MASTER)
+
+
+BROKER_ORDER_ID = Schema({"brokerOrderId": text()})
+
+PLACE_ORDER = Schema({
+    "instrument_id": text(),
+    "exchange": enum(EXCHANGES),
+    "transaction_type": enum(TRANSACTION_TYPES),
+    "quantity": integer(),
+    "order_type": enum(ORDER_TYPES),
+    "product": enum(PRODUCTS),
+    "order_complexity": enum(COMPLEXITIES),
+    "price": number(),
+    "validity": enum(VALIDITIES),
+    "sl_leg_price": number(optional=True),
+    "target_leg_price": number(optional=True),
+    "sl_trigger_price": number(optional=True),
+    "trailing_sl_amount": number(optional=True),
+    "disclosed_quantity": integer(minimum=0),
+    "source": text(upper=True),
+}, (
+    price_rules("order_type", "price", "sl_trigger_price"),
+    bracket_rules("order_complexity", "sl_leg_price", "target_leg_price"),
+    instrument_rules("exchange", "instrument_id", "quantity", ("price", "sl_trigger_price")),
+))
+
+MARGIN = Schema({
+    "exchange": enum(EXCHANGES),
+    "instrumentId": text(upper=True),
+    "transactionType": enum(TRANSACTION_TYPES),
+    "quantity": integer(),
+    "product": enum(PRODUCTS),
+    "orderComplexity": enum(COMPLEXITIES),
+    "orderType": enum(ORDER_TYPES),
+    "validity": enum(VALIDITIES),
+    "price": number(),
+    "slTriggerPrice": number(optional=True),
+}, (
+    price_rules("orderType", "price"),
+    instrument_rules("exchange", "instrumentId", "quantity", ("price", "slTriggerPrice")),
+))
+
+MODIFY_ORDER = Schema({
+    "brokerOrderId": text(),
+    "validity": enum(VALIDITIES),
+    "quantity": integer(optional=True),
+    "price": number(optional=True),
+    "triggerPrice": number(optional=True),
+})
+
+EXIT_BRACKET = Schema({"brokerOrderId": text(), "orderComplexity": enum(COMPLEXITIES)})
+
+SQUARE_OFF = Schema({
+    "exch": enum(EXCHANGES),
+    "symbol": text(),
+    "qty": integer(),
+    "product": enum(PRODUCTS),
+    "transaction_type": enum(TRANSACTION_TYPES),
+})
+
+POSITION_CONVERSION = Schema({
+    "exchange": enum(EXCHANGES),
+    "validity": enum(VALIDITIES),
+    "prevProduct": enum(PRODUCTS),
+    "product": enum(PRODUCTS),
+    "quantity": integer(),
+    "tradingSymbol": text(),
+    "transactionType": enum(TRANSACTION_TYPES),
+    "orderSource": text(upper=True),
+})
+
+GTT_FIELDS = {
+    "tradingSymbol": text(upper=True),
+    "exchange": enum(EXCHANGES),
+    "transactionType": enum(TRANSACTION_TYPES),
+    "orderType": enum(ORDER_TYPES),
+    "product": enum(PRODUCTS),
+    "validity": enum(VALIDITIES),
+    "quantity": integer(),
+    "price": number(),
+    "orderComplexity": enum(COMPLEXITIES),
+    "instrumentId": text(),
+    "gttType": text(upper=True),
+    "gttValue": number(minimum=0.0001),
+}
+GTT_CHECKS = (
+    price_rules("orderType", "price"),
+    instrument_rules("exchange", "instrumentId", "quantity", ("price", "gttValue")),
+)
+PLACE_GTT = Schema(GTT_FIELDS, GTT_CHECKS)
+MODIFY_GTT = Schema({"brokerOrderId": text(), **GTT_FIELDS}, GTT_CHECKS)
+
+CANDLES = Schema({
+    "exchange": enum(EXCHANGES),
+    "instrumentId": text(),
+    "resolution": enum(RESOLUTIONS),
+})
+
+QUOTE = Schema({"exchange": enum(EXCHANGES), "instrumentId": text()})
@@ -0,0 +1,185 @@
+import time
+import asyncio
+from typing import Callable, Optional
+
+from Client import AliceBlue
+from logger import get_logger
+
+TERMINAL_STATUSES = {"complete", "rejected", "cancelled", "canceled"}
+ACCEPTED_STATUSES = TERMINAL_STATUSES | {"open", "trigger pending", "trigger_pending", "after market order req received"}
+WAIT_FOR = ("accepted", "terminal")
+# Keys the broker uses for an order's id across placement, modify and book responses.
+ORDER_ID_KEYS = ("brokerOrderId", "orderNo", "nOrdNo")
+POLL_START = 0.2
+POLL_MAX = 1.0
+
+log = get_logger("workflows")
+
+
+def find_key(data, names):
+    """First value for any of `names` anywhere in a nested broker payload."""
+    if isinstance(data, dict):
+        for name in names:
+            if data.get(name) not in (None, ""):
+                return data[name]
+        data = list(data.values())
+    if isinstance(data, list):
+        for item in data:
+            found = find_key(item, names)
+            if found is not None:
+                return found
+    return None
+
+
+def _latest_status(history) -> Optional[str]:
+    rows = history.get("result") if isinstance(history, dict) else history
+    if isinstance(rows, list) and rows:
+        # History lists the newest state first.
+        history = rows[0]
+    status = find_key(history, ("orderStatus", "status", "Status"))
+    return str(status).lower() if status is not None else None
+
+
+def _margin_shortfall(margin) -> float:
+    shortfall = find_key(margin, ("shortfall", "marginShortfall", "marginShortFall"))
+    try:
+        return float(shortfall or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OrderWorkflow:
+    """Margin check, placement and confirmation of one order in a single server-side call.
+
+    Blocking broker calls run in worker threads so the event loop keeps serving other tools
+    while an order is being confirmed.
+    """
+
+    def __init__(self, get_client: Callable[[], AliceBlue], margin_batcher=None):
+        self._get_client = get_client
+        self._margin_batcher = margin_batcher
+
+    async def _call(self, method: str, **kwargs):
+        alice = await asyncio.to_thread(self._get_client)
+        return await asyncio.to_thread(getattr(alice, method), **kwargs)
+
+    async def _check_margin(self, item: dict):
+        if self._margin_batcher:
+            return await self._margin_batcher.submit(item)
+        alice = await asyncio.to_thread(self._get_client)
+        return (await asyncio.to_thread(alice.get_order_margins, [item]))[0]
+
+    async def _wait_for_order(self, brokerOrderId: str, wait_for: str, deadline: float):
+        wanted = TERMINAL_STATUSES if wait_for == "terminal" else ACCEPTED_STATUSES
+        delay, status = POLL_START, None
+        while True:
+            history = await self._call("get_order_history", brokerOrderId=brokerOrderId)
+            status = _latest_status(history)
+            if status in wanted or time.monotonic() >= deadline:
+                return status, status in wanted
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 1.5, POLL_MAX)
+
+    async def _wait_for_gtt(self, brokerOrderId: str, deadline: float):
+        delay = POLL_START
+        while True:
+            book = await self._call("get_gtt_order_book")
+            rows = book.get("result") if isinstance(book, dict) else book
+            for row in rows if isinstance(rows, list) else []:
+                if str(find_key(row, ORDER_ID_KEYS)) == str(brokerOrderId):
+                    status = find_key(row, ("orderStatus", "status", "gttStatus"))
+                    return (str(status).lower() if status else "active"), True
+            if time.monotonic() >= deadline:
+                return None, False
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 1.5, POLL_MAX)
+
+    async def execute_order(self, instrument_id: str, exchange: str, transaction_type: str, quantity: int,
+                            order_type: str, product: str, order_complexity: str, price: float, validity: str,
+                            sl_leg_price: Optional[float] = None, target_leg_price: Optional[float] = None,
+                            sl_trigger_price: Optional[float] = None, trailing_sl_amount: Optional[float] = None,
+                            trading_symbol: Optional[str] = None, gtt_type: Optional[str] = None,
+                            gtt_value: Optional[float] = None, check_margin: bool = True,
+                            wait_for: str = "accepted", timeout: float = 10.0,
+                            cancel_on_timeout: bool = False) -> dict:
+        started = time.perf_counter()
+        timings = {}
+        result = {"status": "error", "stage": "margin", "brokerOrderId": None, "orderStatus": None}
+
+        def finish(**fields):
+            result.update(fields)
+            timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+            result["timings_ms"] = timings
+            log.info("execute_order", extra={"stage": result["stage"], "order_status": result["orderStatus"],
+                                             "elapsed_ms": timings["total"]})
+            return result
+
+        wait_for = str(wait_for).lower()
+        if wait_for not in WAIT_FOR:
+            return finish(stage="validate", message=f"Invalid wait_for '{wait_for}'. Must be one of {WAIT_FOR}")
+        try:
+            if check_margin:
+                stage_start = time.perf_counter()
+                margin = await self._check_margin(AliceBlue.margin_item(
+                    exchange, instrument_id, transaction_type, quantity, product, order_complexity,
+                    order_type, validity, price, sl_trigger_price))
+                timings["margin"] = round((time.perf_counter() - stage_start) * 1000, 2)
+                result["margin"] = margin.get("result", margin) if isinstance(margin, dict) else margin
+                if isinstance(margin, dict) and str(margin.get("status", margin.get("stat", "Ok"))).lower() not in ("ok", "success"):
+                    return finish(message="Margin check failed")
+                if _margin_shortfall(margin) > 0:
+                    return finish(message=f"Insufficient margin: shortfall {_margin_shortfall(margin)}")
+
+            result["stage"] = "place"
+            stage_start = time.perf_counter()
+            if gtt_type:
+                if not trading_symbol or gtt_value is None:
+                    return finish(message="GTT orders need trading_symbol and gtt_value")
+                placed = await self._call(
+                    "get_place_gtt_order", tradingSymbol=trading_symbol, exchange=exchange,
+                    transactionType=transaction_type, orderType=order_type, product=product, validity=validity,
+                    quantity=quantity, price=price, orderComplexity=order_complexity,
+                    instrumentId=instrument_id, gttType=gtt_type, gttValue=gtt_value)
+            else:
+                placed = await self._call(
+                    "get_place_order", instrument_id=instrument_id, exchange=exchange,
+                    transaction_type=transaction_type, quantity=quantity, order_type=order_type, product=product,
+                    order_complexity=order_complexity, price=price, validity=validity, sl_leg_price=sl_leg_price,
+                    target_leg_price=target_leg_price, sl_trigger_price=sl_trigger_price,
+                    trailing_sl_amount=trailing_sl_amount)
+            timings["place"] = round((time.perf_counter() - stage_start) * 1000, 2)
+            brokerOrderId = find_key(placed, ORDER_ID_KEYS)
+            result["brokerOrderId"] = brokerOrderId
+            if brokerOrderId is None:
+                if gtt_type:
+                    # Without an id no GTT book row can be told apart from the account's other GTTs.
+                    return finish(orderStatus="unconfirmed",
+                                  message=f"GTT placement returned no brokerOrderId; cannot confirm it: {placed}")
+                return finish(message=f"Order not accepted: {placed}")
+
+            result["stage"] = "confirm"
+            stage_start = time.perf_counter()
+            deadline = time.monotonic() + timeout
+            if gtt_type:
+                status, confirmed = await self._wait_for_gtt(brokerOrderId, deadline)
+            else:
+                status, confirmed = await self._wait_for_order(brokerOrderId, wait_for, deadline)
+            timings["confirm"] = round((time.perf_counter() - stage_start) * 1000, 2)
+            result["orderStatus"] = status
+
+            if not confirmed:
+                if cancel_on_timeout and brokerOrderId:
+                    if gtt_type:
+                        await self._call("get_cancel_gtt_order", brokerOrderId=brokerOrderId)
+                    elif order_complexity.upper() == "BO":
+                        await self._call("get_exit_bracket_order", brokerOrderId=brokerOrderId,
+                                         orderComplexity=order_complexity)
+                    else:
+                        await self._call("get_cancel_order", brokerOrderId=brokerOrderId)
+                    return finish(stage="cancelled", message=f"No {wait_for} state within {timeout}s; order cancelled")
+                return finish(message=f"No {wait_for} state within {timeout}s")
+            if status == "rejected":
+                return finish(message="Order rejected")
+            return finish(status="success", stage="done")
+        except Exception as e:
+            return finish(message=str(e))